@@ -0,0 +1,290 @@
+# balance_simulator.py
+# A headless Monte Carlo balance simulator for the Gothic Horror Roguelike.
+#
+# This script plays thousands of complete runs with a simple scripted bot and
+# reports how the hand-tuned SPAWN_RATES, ENTITY_DATA and levelling curve play
+# out in aggregate. It is a development tool and is not bundled with the game.
+#
+# Usage:
+#   python balance_simulator.py --runs 5000 --workers 8 --seed 1 --json report.json
+#   python balance_simulator.py --runs 5000 --telemetry   # Also record every run for telemetry_report.py
+
+import os
+
+# The simulator never opens a window. These must be set before pygame is
+# imported (directly, or through main.py) in this process and in every worker.
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import json
+import multiprocessing
+import random
+import time
+from collections import deque
+
+import main
+
+# ==============================================================================
+# I. Simulation Tuning
+# ==============================================================================
+
+BOT_POTION_THRESHOLD = 0.4  # The bot drinks a potion at or below 40% health.
+BOT_TURN_LIMIT_PER_LEVEL = 2000  # A run that stalls on one level is abandoned.
+ORTHOGONAL_STEPS = [(0, -1), (0, 1), (-1, 0), (1, 0)]
+
+# ==============================================================================
+# II. The Scripted Bot
+# ==============================================================================
+
+class BalanceBot:
+    """
+    A deterministic, greedy player used to stress the game's balance.
+    - Necessity: Balance changes must be judged over thousands of runs, which
+                 no human tester can play.
+    - Function: Each turn it heals when low, fights adjacent monsters, and
+                otherwise walks the shortest path to the nearest item, the
+                stairs, or the Vampire Lord.
+    - Effect: A consistent, repeatable "average player" whose results can be
+              compared before and after a tuning change.
+    """
+
+    def __init__(self, game):
+        self.game = game
+        self.potions_used = 0
+        self.path = []  # The cached route (list of tiles) to the current goal.
+
+    def take_turn(self):
+        """Performs one action. Returns True if the action consumed a turn."""
+        game = self.game
+        player = game.player
+        stats = player.get_component(main.StatsComponent)
+        pos = player.get_component(main.PositionComponent)
+
+        # Equipping is free in the real game (it happens in a menu), so the
+        # bot simply wears anything it has picked up.
+        self.equip_everything()
+
+        # --- 1. Heal when badly hurt ---
+        if stats.current_hp <= stats.max_hp * BOT_POTION_THRESHOLD and self.drink_potion():
+            return True
+
+        # --- 2. Fight anything standing next to us ---
+        for dx, dy in ORTHOGONAL_STEPS:
+            target = game.turn_manager.get_entity_at_location(pos.x + dx, pos.y + dy)
+            if target and target.get_component(main.AIComponent):
+                return game.turn_manager.process_player_turn(dx, dy)
+
+        # --- 3. Descend when standing on the stairs ---
+        if self.is_on_stairs():
+            game.dungeon_manager.next_level()
+            return True
+
+        # --- 4. Walk towards the nearest goal ---
+        step = self.first_step_to_nearest_goal()
+        if step:
+            return game.turn_manager.process_player_turn(*step)
+        return False
+
+    def equip_everything(self):
+        """Equips every piece of gear sitting in the inventory."""
+        inventory = self.game.player.get_component(main.InventoryComponent)
+        for item in inventory.equippables():
+            equipment = self.game.player.get_component(main.EquipmentComponent)
+            if equipment.slots.get(item.get_component(main.EquippableComponent).slot) is None:
+                self.game.equip_item(item)
+
+    def drink_potion(self):
+        """Drinks a Health Potion through its quick-use binding, if one is carried."""
+        if not self.game.quick_use("health_potion"):
+            return False
+        self.potions_used += 1
+        return True
+
+    def is_on_stairs(self):
+        """Checks whether the player is standing on the stairs down."""
+        return self.game.stairs_at_player(1)
+
+    def first_step_to_nearest_goal(self):
+        """
+        Returns the first step of the shortest path to the nearest item, stairs
+        down or boss. The path is cached and followed until its goal disappears or
+        the bot is knocked off it, so the search only runs when plans change.
+        """
+        game = self.game
+        pos = game.player.get_component(main.PositionComponent)
+        goals = set()
+        for entity in game.entities:
+            stairs = entity.get_component(main.StairsComponent)
+            if (entity.get_component(main.ItemComponent) or (stairs and stairs.direction == 1)
+                    or entity.get_component(main.VampireComponent)):
+                goal_pos = entity.get_component(main.PositionComponent)
+                goals.add((goal_pos.x, goal_pos.y))
+
+        if not (self.path and self.path[-1] in goals and
+                abs(self.path[0][0] - pos.x) + abs(self.path[0][1] - pos.y) == 1):
+            self.path = self.find_path((pos.x, pos.y), goals)
+        if not self.path:
+            return None
+        next_x, next_y = self.path.pop(0)
+        return next_x - pos.x, next_y - pos.y
+
+    def find_path(self, start, goals):
+        """
+        Runs a breadth-first search from the start tile and returns the list of
+        tiles leading to the nearest goal. Monsters do not block the search;
+        walking into one simply attacks it.
+        """
+        came_from = {start: None}
+        frontier = deque([start])
+        while frontier:
+            current = frontier.popleft()
+            if current in goals:
+                path = []
+                while current != start:
+                    path.append(current)
+                    current = came_from[current]
+                return path[::-1]
+            x, y = current
+            for dx, dy in ORTHOGONAL_STEPS:
+                nxt = (x + dx, y + dy)
+                if nxt not in came_from and self.game.game_map.is_walkable(*nxt):
+                    came_from[nxt] = current
+                    frontier.append(nxt)
+        return []
+
+# ==============================================================================
+# III. Running a Single Game
+# ==============================================================================
+
+def init_worker():
+    """Prepares a worker process: no log spam and no on-screen output."""
+    main.GameLogger.enabled = False
+
+def play_run(seed):
+    """
+    Plays one complete run with its own seeded RNG and returns its history.
+    Seeding per run (rather than per process) keeps every result reproducible
+    no matter how many workers share the load.
+    """
+    random.seed(seed)
+    game = main.Game()
+    game.events.unsubscribe(game.hud.report)  # Nobody reads the message log, so skip formatting it.
+    game.setup_new_game()
+    game.game_state = main.GameState.PLAYER_TURN
+    bot = BalanceBot(game)
+
+    levels = []
+    outcome = "timeout"
+    while True:
+        dungeon_level = game.dungeon_manager.dungeon_level
+        if not levels or levels[-1]["dungeon_level"] != dungeon_level:
+            exp = game.player.get_component(main.ExperienceComponent)
+            levels.append({"dungeon_level": dungeon_level, "turns": 0, "potions_used": 0,
+                           "player_level": exp.level, "current_xp": exp.current_xp})
+        record = levels[-1]
+
+        if game.game_state == main.GameState.PLAYER_DEAD:
+            outcome = "died"
+            break
+        if game.game_state == main.GameState.VICTORY:
+            outcome = "victory"
+            break
+        if record["turns"] >= BOT_TURN_LIMIT_PER_LEVEL:
+            break
+
+        if game.game_state == main.GameState.DIALOGUE:
+            # The bot skips straight through any dialogue.
+            game.dialogue_viewer.active_entity.get_component(main.DialogueComponent).has_spoken = True
+            game.game_state = main.GameState.PLAYER_TURN
+            continue
+
+        potions_before = bot.potions_used
+        if not bot.take_turn():
+            break  # The bot is stuck (e.g. walled into a sealed pocket).
+        record["turns"] += 1
+        record["potions_used"] += bot.potions_used - potions_before
+
+        # Hand control to the monsters exactly as the real game loop does.
+        if game.game_state != main.GameState.VICTORY:
+            game.game_state = main.GameState.ENEMY_TURN
+        while game.game_state == main.GameState.ENEMY_TURN:
+            game.update(0.0)
+
+    if game.telemetry:
+        game.telemetry.close()
+    return {"seed": seed, "outcome": outcome, "levels": levels}
+
+# ==============================================================================
+# IV. Aggregation and Reporting
+# ==============================================================================
+
+def aggregate(results):
+    """Folds individual run histories into per-dungeon-level statistics."""
+    per_level = {}
+    for result in results:
+        for i, record in enumerate(result["levels"]):
+            row = per_level.setdefault(record["dungeon_level"], {
+                "reached": 0, "deaths": 0, "turns": 0, "potions_used": 0, "player_level": 0, "current_xp": 0})
+            row["reached"] += 1
+            row["turns"] += record["turns"]
+            row["potions_used"] += record["potions_used"]
+            row["player_level"] += record["player_level"]
+            row["current_xp"] += record["current_xp"]
+            if result["outcome"] == "died" and i == len(result["levels"]) - 1:
+                row["deaths"] += 1
+
+    report = {"runs": len(results), "outcomes": {}, "levels": {}}
+    for result in results:
+        report["outcomes"][result["outcome"]] = report["outcomes"].get(result["outcome"], 0) + 1
+    for dungeon_level in sorted(per_level):
+        row = per_level[dungeon_level]
+        reached = row["reached"]
+        report["levels"][dungeon_level] = {
+            "reached": reached,
+            "survival_rate": 1 - row["deaths"] / reached,
+            "mean_turns": row["turns"] / reached,
+            "mean_potions_used": row["potions_used"] / reached,
+            "mean_player_level_on_arrival": row["player_level"] / reached,
+            "mean_xp_on_arrival": row["current_xp"] / reached,
+        }
+    return report
+
+def print_report(report, elapsed):
+    """Prints the aggregated report as a readable table."""
+    print(f"Runs: {report['runs']} in {elapsed:.1f}s  Outcomes: {report['outcomes']}")
+    print(f"{'Depth':>5} {'Reached':>8} {'Survival':>9} {'Turns':>8} {'Potions':>8} {'PlayerLvl':>10} {'XP':>8}")
+    for dungeon_level, row in report["levels"].items():
+        print(f"{dungeon_level:>5} {row['reached']:>8} {row['survival_rate']:>9.1%} {row['mean_turns']:>8.1f} "
+              f"{row['mean_potions_used']:>8.2f} {row['mean_player_level_on_arrival']:>10.2f} "
+              f"{row['mean_xp_on_arrival']:>8.1f}")
+
+# ==============================================================================
+# V. Entry Point
+# ==============================================================================
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Monte Carlo balance simulator for Gothic Rogue.")
+    parser.add_argument("--runs", type=int, default=1000, help="Number of complete runs to play.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Size of the process pool.")
+    parser.add_argument("--seed", type=int, default=0, help="Base seed; run i uses seed + i.")
+    parser.add_argument("--json", help="Optional path to write the full report as JSON.")
+    # Read by main.Game from sys.argv, which the worker processes share.
+    parser.add_argument("--telemetry", action="store_true", help="Record every run for telemetry_report.py.")
+    args = parser.parse_args()
+
+    seeds = range(args.seed, args.seed + args.runs)
+    start = time.perf_counter()
+    # Every run is independent, so the work scales linearly with the pool size.
+    with multiprocessing.Pool(processes=args.workers, initializer=init_worker) as pool:
+        results = list(pool.imap_unordered(play_run, seeds, chunksize=4))
+    report = aggregate(results)
+    print_report(report, time.perf_counter() - start)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,369 @@
+# benchmark.py
+# A fixed-seed performance benchmark suite for the Gothic Horror Roguelike.
+#
+# Each case measures one hot path of main.py with a deterministic seed, so the
+# numbers are comparable between commits. Results are stored as JSON and can
+# be compared against a saved baseline to catch regressions before a build.
+# This is a development tool and is not bundled with the game.
+#
+# Usage:
+#   python benchmark.py --output bench.json                      # Record results
+#   python benchmark.py --baseline bench.json --output new.json  # Compare
+#   python benchmark.py --only procgen                           # Run a subset
+
+import os
+
+# Benchmarks never open a real window. These must be set before pygame is
+# imported (directly, or through main.py).
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import functools
+import gc
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+
+import main
+
+# ==============================================================================
+# I. Benchmark Configuration
+# ==============================================================================
+
+BENCHMARK_SEED = 1337  # Every case reseeds the RNG with this before running.
+REGRESSION_THRESHOLD = 0.15  # A case more than 15% slower than baseline fails.
+
+# ==============================================================================
+# II. Shared Fixtures
+# ==============================================================================
+
+_game = None
+
+def get_game():
+    """Creates (once) a headless Game instance shared by the game-level cases."""
+    global _game
+    if _game is None:
+        main.GameLogger.enabled = False
+        _game = main.Game()
+        _game.setup_new_game()
+        _game.game_state = main.GameState.PLAYER_TURN
+    return _game
+
+def populate_monsters(game, count, kind="rat"):
+    """
+    Replaces the current level's population with `count` monsters of one kind
+    (rats by default) scattered on random floor tiles, then rebuilds the
+    TurnManager around them.
+    """
+    game.entities[:] = [game.player]
+    occupied = set()
+    player_pos = game.player.get_component(main.PositionComponent)
+    occupied.add((player_pos.x, player_pos.y))
+    while len(game.entities) < count + 1:
+        x, y = random.randint(1, game.game_map.width - 2), random.randint(1, game.game_map.height - 2)
+        if game.game_map.is_walkable(x, y) and (x, y) not in occupied:
+            occupied.add((x, y))
+            game.entities.append(main.prefabs.spawn("monster", kind, x, y))
+    game.turn_manager = main.TurnManager(game_object=game)
+
+def enemy_level(monster_count, kind="rat"):
+    """A fresh depth-1 level holding `monster_count` monsters of one kind, with the player unkillable."""
+    game = get_game()
+    game.dungeon_manager.dungeon_level = 1
+    game.generate_new_level()
+    game.god_mode_active = True  # The player must survive the whole measurement.
+    populate_monsters(game, monster_count, kind)
+    return game
+
+# ==============================================================================
+# III. Benchmark Cases
+# Each case is a function taking the case parameter and returning a zero
+# argument callable. Only the callable is timed; everything before it is setup.
+# ==============================================================================
+
+def case_procgen(size):
+    """ProceduralCaveGenerator.generate_map on a size x size grid."""
+    return lambda: main.ProceduralCaveGenerator.generate_map(size, size)
+
+def case_procgen_serial(size):
+    """The same, forced onto one core; procgen_500 runs on a process pool on multi-core machines."""
+    return lambda: main.ProceduralCaveGenerator.generate_map(size, size, workers=1)
+
+def case_map_generator(name):
+    """One level-sized Map (100x100) from a named generator backend, connectivity pass included."""
+    return lambda: main.Map(main.MAP_WIDTH, main.MAP_HEIGHT, name)
+
+def case_dig_tunnel(length, rebuild=False):
+    """
+    Digs a `length` tile tunnel through a baked level that keeps a DistanceMap
+    and a RegionIndex, one Map.set_tile per tile. With rebuild=True every
+    derived structure is rebuilt after each tile instead, for comparison.
+    """
+    game = get_game()
+    game.dungeon_manager.dungeon_level = 1
+    game.generate_new_level()
+    game_map = game.game_map
+    distances, regions = main.DistanceMap(game_map, [game_map.spawn_point]), main.RegionIndex(game_map)
+    y = game_map.spawn_point[1]
+    tunnel = [(x, y) for x in range(1, game_map.width - 1)][:length]
+
+    def run():
+        for x, tunnel_y in tunnel:
+            game_map.set_tile(x, tunnel_y, ',')
+            if rebuild:
+                game_map.bake(game.game_font)
+                distances.rebuild()
+                main.RegionIndex(game_map).release()
+        distances.release()
+        regions.release()
+    return run
+
+def case_dig_tunnel_rebuild(length):
+    """The same tunnel, rebuilding the render layer and indexes after every tile."""
+    return case_dig_tunnel(length, rebuild=True)
+
+def case_chunk_generation(count):
+    """ProceduralCaveGenerator.generate_chunk for `count` endless-cave chunks in a row."""
+    return lambda: [main.ProceduralCaveGenerator.generate_chunk(BENCHMARK_SEED, x, 0, main.CHUNK_SIZE)
+                    for x in range(count)]
+
+def case_level_generation(dungeon_level):
+    """Game.generate_new_level (map + spawn placement) at a given depth."""
+    game = get_game()
+    game.dungeon_manager.dungeon_level = dungeon_level
+    return game.generate_new_level
+
+def case_enemy_turns(monster_count, kind="rat"):
+    """
+    TurnManager.process_enemy_turns with a given number of monsters of one
+    kind: cultists check line of sight every turn, ghouls form packs.
+    """
+    game = enemy_level(monster_count, kind)
+
+    def run():
+        for _ in range(10):
+            game.turn_manager.process_enemy_turns()
+    return run
+
+def case_enemy_phase_sliced(monster_count):
+    """Ten enemy phases run the way the game loop runs them: a frame's budget at a time."""
+    game = enemy_level(monster_count)
+
+    def run():
+        for _ in range(10):
+            while not game.turn_manager.advance_enemy_phase(
+                    time.perf_counter() + main.ENEMY_PHASE_BUDGET_MS / 1000):
+                pass
+    return run
+
+def case_perception(monster_count):
+    """TurnManager.perceive_all (the batched perception stage) with a given number of monsters."""
+    game = enemy_level(monster_count)
+
+    def run():
+        for _ in range(10):
+            game.turn_manager.perceive_all()
+    return run
+
+def case_telemetry(turns):
+    """TelemetryRecorder: a turn's worth of events, the turn row and a frame, `turns` times, then the close."""
+    game = get_game()
+    rat = main.prefabs.spawn("monster", "rat", 0, 0)
+    hit, kill = main.DamageEvent(), main.DeathEvent()
+    hit.fill((game.player, rat, 3, "strikes"))
+    kill.fill((rat, 10))
+
+    def run():
+        recorder = main.TelemetryRecorder(game.player, 1)
+        for _ in range(turns):
+            recorder.record_events((hit, hit, kill))
+            recorder.end_turn(30)
+            recorder.record_frame(16.0)
+        recorder.close()
+        recorder.writer.path.unlink()
+    return run
+
+def case_draw(frames):
+    """Game.draw for a number of full redraws on the dummy SDL video driver."""
+    game = get_game()
+    game.dungeon_manager.dungeon_level = 1
+    game.generate_new_level()
+    game.game_state = main.GameState.PLAYER_TURN
+
+    def run():
+        for _ in range(frames):
+            game.dirty_tracker.request_full_redraw()
+            game.draw()
+    return run
+
+def case_draw_idle(frames):
+    """Game.draw for a number of frames in which nothing changes (dirty-rect path)."""
+    game = get_game()
+    game.dungeon_manager.dungeon_level = 1
+    game.generate_new_level()
+    game.game_state = main.GameState.PLAYER_TURN
+    game.draw()  # The first frame after a new level is always drawn in full.
+
+    def run():
+        for _ in range(frames):
+            game.draw()
+    return run
+
+def case_warm_levels(monster_count):
+    """
+    60 frames of LevelScheduler.run with every warm level crowded and far
+    behind. The time is bounded by the per-frame budget, not by the workload.
+    """
+    game = get_game()
+    scheduler = main.LevelScheduler()
+    for depth in range(main.WARM_LEVEL_COUNT):
+        game.dungeon_manager.dungeon_level = 1
+        game.generate_new_level()
+        populate_monsters(game, monster_count)
+        scheduler.warm_up(main.DungeonLevel(depth, game.game_map, game.entities[1:]))
+    for _ in range(main.WARM_LEVEL_MAX_BACKLOG):
+        scheduler.end_turn()
+
+    def run():
+        for _ in range(60):
+            scheduler.run(main.WARM_LEVEL_BUDGET_MS / 1000)
+    return run
+
+def case_spawn_prefab(count):
+    """Stamping out `count` monsters and items from their prefabs (the game's spawn path)."""
+    archetypes = [("monster", name) for name in main.ENTITY_DATA] + [("item", name) for name in main.ITEM_DATA]
+    for kind, name in archetypes:
+        main.prefabs.get(kind, name)  # Templates are built once per launch, outside the timing.
+    return lambda: [main.prefabs.spawn(kind, name, 1, 1) for _ in range(count // len(archetypes))
+                    for kind, name in archetypes]
+
+def case_spawn_build(count):
+    """The same spawns built component by component from the content blueprints, for comparison."""
+    builders = [(main.build_monster, name) for name in main.ENTITY_DATA] + \
+               [(main.build_item, name) for name in main.ITEM_DATA]
+    return lambda: [build(name) for _ in range(count // len(builders)) for build, name in builders]
+
+def case_cold_start(arguments):
+    """
+    A fresh interpreter running main.py with the given arguments. This is the
+    only way to measure a cold import; the in-process cases share one import.
+    """
+    project_dir = os.path.dirname(os.path.abspath(__file__))
+    return lambda: subprocess.run([sys.executable, *arguments], cwd=project_dir, check=True,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+# The full suite: (case name, case function, parameter, timed repeats). A case
+# with more than one parameter is registered with the others bound by partial().
+# The fastest of the repeats is reported, which filters out scheduler noise.
+BENCHMARKS = [
+    ("procgen_100", case_procgen, 100, 3),
+    ("procgen_250", case_procgen, 250, 2),
+    ("procgen_500", case_procgen, 500, 1),
+    ("procgen_500_serial", case_procgen_serial, 500, 1),
+    ("mapgen_caves", case_map_generator, "caves", 3),
+    ("mapgen_rooms", case_map_generator, "rooms", 3),
+    ("mapgen_drunkard", case_map_generator, "drunkard", 3),
+    ("mapgen_wfc", case_map_generator, "wfc", 3),
+    ("dig_tunnel_60", case_dig_tunnel, 60, 3),
+    ("dig_tunnel_60_rebuild", case_dig_tunnel_rebuild, 60, 1),
+    ("chunk_gen_16", case_chunk_generation, 16, 2),
+    ("level_gen_depth_1", case_level_generation, 1, 3),
+    ("level_gen_depth_5", case_level_generation, 5, 3),
+    ("level_gen_depth_9", case_level_generation, 9, 3),
+    ("enemy_turns_10x10", case_enemy_turns, 10, 3),
+    ("enemy_turns_100x10", case_enemy_turns, 100, 3),
+    ("enemy_turns_1000x10", case_enemy_turns, 1000, 1),
+    ("enemy_turns_casters_1000x10", functools.partial(case_enemy_turns, kind="cultist"), 1000, 1),
+    ("enemy_turns_packs_1000x10", functools.partial(case_enemy_turns, kind="ghoul"), 1000, 1),
+    ("enemy_phase_sliced_1000x10", case_enemy_phase_sliced, 1000, 1),
+    ("perception_1000x10", case_perception, 1000, 3),
+    ("telemetry_10000_turns", case_telemetry, 10000, 3),
+    ("draw_60_frames", case_draw, 60, 3),
+    ("draw_idle_60_frames", case_draw_idle, 60, 3),
+    ("warm_levels_1000x60", case_warm_levels, 1000, 3),
+    ("spawn_prefab_10000", case_spawn_prefab, 10000, 3),
+    ("spawn_build_10000", case_spawn_build, 10000, 3),
+    ("cold_import", case_cold_start, ("-c", "import main"), 3),
+    ("cold_start_first_frame", case_cold_start, ("main.py", "--startup-report"), 3),
+]
+
+# ==============================================================================
+# IV. Runner and Baseline Comparison
+# ==============================================================================
+
+def run_case(case, parameter, repeats):
+    """Times a case `repeats` times from the same seed and returns the fastest run."""
+    timings = []
+    for _ in range(repeats):
+        random.seed(BENCHMARK_SEED)
+        target = case(parameter)
+        # Like timeit, the garbage collector is paused while timing: cases that
+        # allocate many objects otherwise measure mostly when a collection hits.
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            target()
+            timings.append(time.perf_counter() - start)
+        finally:
+            gc.enable()
+    return min(timings)
+
+def run_suite(only=None):
+    """Runs every selected case and returns the results dictionary."""
+    results = {}
+    for name, case, parameter, repeats in BENCHMARKS:
+        if only and not any(name.startswith(prefix) for prefix in only):
+            continue
+        seconds = run_case(case, parameter, repeats)
+        results[name] = {"seconds": seconds, "repeats": repeats}
+        print(f"{name:<24} {seconds * 1000:>10.2f} ms")
+    return results
+
+def compare(results, baseline, threshold):
+    """Prints a comparison table and returns the names of regressed cases."""
+    regressions = []
+    print(f"\n{'Case':<24} {'Baseline':>12} {'Current':>12} {'Change':>9}")
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            print(f"{name:<24} {'-':>12} {result['seconds'] * 1000:>10.2f}ms {'new':>9}")
+            continue
+        change = result["seconds"] / base["seconds"] - 1
+        flag = "  REGRESSION" if change > threshold else ""
+        print(f"{name:<24} {base['seconds'] * 1000:>10.2f}ms {result['seconds'] * 1000:>10.2f}ms "
+              f"{change:>+8.1%}{flag}")
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Fixed-seed benchmark suite for Gothic Rogue.")
+    parser.add_argument("--output", help="Path to write the results as JSON.")
+    parser.add_argument("--baseline", help="A previous results file to compare against.")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="Allowed slowdown before a case counts as a regression (0.15 = 15%%).")
+    parser.add_argument("--only", nargs="*", help="Run only the cases whose names start with these prefixes.")
+    args = parser.parse_args()
+
+    results = run_suite(args.only)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"python": sys.version.split()[0], "platform": platform.platform(),
+                       "seed": BENCHMARK_SEED, "results": results}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main_cli()
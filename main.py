@@ -1,13 +1,30 @@
 # main.py
 # The foundational script for the Gothic Horror Roguelike.
 
+import time
+launch_time = time.perf_counter()  # Taken first, so the startup report includes the imports.
+
 import random
 import pygame
 import sys
+import array
 from enum import Enum, auto
 import json
 import os
 import math
+import concurrent.futures
+import cProfile
+import functools
+import hashlib
+import heapq
+import itertools
+import marshal
+import queue
+import shutil
+import threading
+from collections import Counter
+from collections import deque
+from collections.abc import Mapping
 from typing import Dict, Any, Callable
 from datetime import datetime
 from pathlib import Path
@@ -20,12 +37,12 @@ import platformdirs
 APP_NAME = "GothicRogue"
 APP_AUTHOR = "MichaelBanovac" # Replace with your name or studio name
 
-# This finds the correct user data directory based on the OS
-# e.g., AppData\Roaming on Windows, ~/.config on Linux
-user_data_dir = Path(platformdirs.user_data_path(appname=APP_NAME, appauthor=APP_AUTHOR))
-
-# Ensure the directory exists before we try to write to it
-user_data_dir.mkdir(parents=True, exist_ok=True)
+@functools.lru_cache(maxsize=None)
+def get_user_data_dir():
+    """Returns the user data directory (e.g. AppData\\Roaming on Windows, ~/.config on Linux), created on first use."""
+    user_data_dir = Path(platformdirs.user_data_path(appname=APP_NAME, appauthor=APP_AUTHOR))
+    user_data_dir.mkdir(parents=True, exist_ok=True)
+    return user_data_dir
 
 # ==============================================================================
 # I. Settings Manager (Principle: Preservation Axiom)
@@ -33,43 +50,37 @@ user_data_dir.mkdir(parents=True, exist_ok=True)
 
 def resource_path(relative_path):
     """ Get absolute path to resource, works for dev and for PyInstaller """
-    # noinspection SpellCheckingInspection
-    try:
-        # PyInstaller creates a temp folder and stores path in _MEIPASS
-        # noinspection PyUnresolvedReferences,PyProtectedMember
-        base_path = sys._MEIPASS
-    except AttributeError:
-        base_path = os.path.abspath(".")
-
-    return os.path.join(base_path, relative_path)
+    # PyInstaller unpacks the bundle into a temp folder and stores its path in _MEIPASS.
+    return os.path.join(getattr(sys, "_MEIPASS", os.path.abspath(".")), relative_path)
 
 class SettingsManager:
     """Manages loading and saving game settings to a JSON file."""
 
-    # Add 'resolutions_list' as an argument
     def __init__(self, resolutions_list):
         self.resolutions = resolutions_list # Store the list internally
-        # Build the full, correct path to the settings file
-        self.filepath = user_data_dir / "gothic_rogue_settings.json"
-        self.settings = self.load_settings()
+
+    @functools.cached_property
+    def filepath(self):
+        """The full, correct path to the settings file."""
+        return get_user_data_dir() / "gothic_rogue_settings.json"
+
+    @functools.cached_property
+    def settings(self):
+        """The settings dictionary, loaded from disk the first time it is read."""
+        return self.load_settings()
 
     def load_settings(self):
         """Loads settings from the JSON file, or returns defaults."""
-        if os.path.exists(self.filepath):
-            try:
-                with open(self.filepath, 'r') as f:
-                    settings = json.load(f)
-                    if 'show_fps' not in settings:
-                        settings['show_fps'] = False
-
-                    res_index = settings.get("resolution_index", 0)
-                    # Use the stored list 'self.resolutions'
-                    if not isinstance(res_index, int) or not 0 <= res_index < len(self.resolutions):
-                        settings["resolution_index"] = 0
-                    return settings
-            except (json.JSONDecodeError, FileNotFoundError):
-                return {"resolution_index": 0, "show_fps": False}
-        return {"resolution_index": 0, "show_fps": False}
+        try:
+            with open(self.filepath, 'r') as f:
+                settings = json.load(f)
+        except (json.JSONDecodeError, FileNotFoundError):
+            return {"resolution_index": 0, "show_fps": False}
+        settings.setdefault('show_fps', False)
+        res_index = settings.get("resolution_index", 0)
+        if not isinstance(res_index, int) or not 0 <= res_index < len(self.resolutions):
+            settings["resolution_index"] = 0
+        return settings
 
     def save_settings(self):
         """Saves the current settings to the JSON file."""
@@ -91,48 +102,30 @@ def heal(**kwargs):
     """Heals an entity by a given amount."""
     entity = kwargs.get("entity")
     amount = kwargs.get("amount")
-
-    if not entity or not amount:
-        return
-
-    stats = entity.get_component(StatsComponent)
+    stats = entity.get_component(StatsComponent) if entity and amount else None
     if stats:
-        stats.current_hp += amount
-        # Prevent overhealing.
-        if stats.current_hp > stats.max_hp:
-            stats.current_hp = stats.max_hp
+        stats.current_hp = min(stats.max_hp, stats.current_hp + amount)  # No overhealing.
 
 def teleport(**kwargs):
     """Finds a random, valid, unoccupied tile and moves the entity there."""
     entity = kwargs.get("entity")
     game_map = kwargs.get("game_map")
     entities = kwargs.get("entities")
-
-    # Defensive check to ensure all necessary data is present.
     if not entity or not game_map or not entities:
         return
-
-    # 1. Create a list of all possible floor tiles on the map.
-    possible_locations = []
-    for y, row in enumerate(game_map.tiles):
-        for x, tile in enumerate(row):
-            if tile != '#':  # Any tile that is not a wall is a potential destination.
-                possible_locations.append((x, y))
-
-    # 2. Shuffle the list to ensure the destination is random.
+    # Shuffle every floor tile and take the first one no other entity stands on.
+    possible_locations = list(game_map.floor_tiles())
     random.shuffle(possible_locations)
-
-    # 3. Find the first valid, unoccupied tile from the shuffled list.
-    for loc in possible_locations:
-        x, y = loc
-        # Check if any other entity is already at this location.
+    for x, y in possible_locations:
         if not any(e.get_component(PositionComponent).x == x and e.get_component(PositionComponent).y == y for e in entities if e is not entity):
-            # Found a safe spot. Move the entity.
             pos = entity.get_component(PositionComponent)
             if pos:
-                pos.x = x
-                pos.y = y
-            return  # Exit the function after successfully teleporting.
+                pos.x, pos.y = x, y
+            return
+
+# The item functions content files may name, and the game objects an item's "context" may ask for.
+ITEM_FUNCTIONS = {"heal": heal, "teleport": teleport}
+ITEM_CONTEXT_KEYS = ("game_map", "entities")
 
 # ==============================================================================
 # III. Configuration and Constants (Principle: Adaptable)
@@ -142,24 +135,18 @@ def teleport(**kwargs):
 # A list of all available screen resolutions for the player to choose from.
 resolutions = [(800, 600), (1024, 768), (1280, 960), (1600, 1200), (2048, 1536)]
 
-# Move the creation of settings_manager here and pass 'resolutions' to it
 settings_manager = SettingsManager(resolutions)
 
-# Load the player's previously saved resolution choice.
-current_resolution_index = settings_manager.get("resolution_index")
-
-# Set the initial screen dimensions based on the loaded setting.
+current_resolution_index = 0 # Game.__init__ applies the player's saved choice.
 SCREEN_WIDTH, SCREEN_HEIGHT = resolutions[current_resolution_index]
 
-# The fixed internal resolution. The game is always rendered to this size,
-# and then scaled up to the player's chosen screen resolution. This ensures
-# visual consistency across all display sizes.
+# The fixed internal resolution, scaled up to the player's chosen screen resolution.
 INTERNAL_WIDTH, INTERNAL_HEIGHT = 800, 600
 
-# --- Color Palette ---
-# This palette defines all colors used in the game, allowing for easy
-# aesthetic changes. Each color's name describes its intended use.
+# The title shown on the game window.
+WINDOW_TITLE = "Untitled Gothic Horror Roguelike"
 
+# --- Color Palette ---
 # General UI Colors
 COLOR_NEAR_BLACK = (10, 10, 10)  # Used for the main background of menu screens.
 COLOR_WHITE = (255, 255, 255)  # Default text color, unselected menu items.
@@ -186,13 +173,18 @@ COLOR_HUD_EMPTY_DASH = (50, 50, 50) # Color for depleted health dashes
 # --- HUD Configuration ---
 HUD_HEALTH_BAR_DASHES = 20 # The total number of dashes in the health bar
 
+# --- Dirty-Region Rendering ---
+DIRTY_ENTITY_PADDING = 6 # Pixels added around an entity's tile, as its glyph is taller than the tile.
+DIRTY_RECT_LIMIT = 24 # Above this many changed regions, a full redraw is cheaper.
+
 # --- Item Colors ---
 COLOR_HEALING_RED = (255, 0, 100) # A vibrant red for potions.
 COLOR_SCROLL_BLUE = (100, 100, 255) # A magical blue for scrolls.
 
 # --- Message Log Configuration ---
 HUD_MESSAGE_COUNT = 5 # The maximum number of messages to display at once.
-# Add some default colors for different message types for future use.
+MESSAGE_LOG_CAPACITY = 5000 # Messages kept for scrollback; the oldest are dropped first.
+MESSAGE_LINE_CACHE_SIZE = 64 # Rendered message lines kept between frames.
 COLOR_MESSAGE_DEFAULT = (255, 255, 255) # White for standard messages.
 COLOR_MESSAGE_DAMAGE = (255, 100, 100) # Light red for damage messages.
 COLOR_MESSAGE_HEAL = (100, 255, 100)   # Light green for healing messages.
@@ -203,52 +195,64 @@ BASE_XP_TO_LEVEL = 100 # XP needed for the first level up.
 LEVEL_UP_FACTOR = 1.5  # The scaling exponent for leveling.
 
 # --- Font and Tile Settings ---
-# The name of the monospaced font to be used for all game text.
-# 'Consolas' is chosen for its clarity and classic roguelike feel.
-FONT_NAME = 'Consolas'
+FONT_NAME = 'Consolas' # The monospaced font used for all game text.
 FONT_PATH = resource_path('assets/Consolas.ttf') # Location of Consolas .ttf file
-
-# The pixel dimension of a single map tile. This value is crucial for
-# converting grid-based coordinates (e.g., x=5, y=3) into pixel-based
-# screen positions for rendering.
-TILE_SIZE = 16
+TILE_SIZE = 16 # The pixel size of one map tile, for grid-to-screen conversion.
 
 # --- Game Parameters ---
-# This section centralizes all tunable gameplay values.
 MAP_WIDTH, MAP_HEIGHT = 100, 100
 STAIRS_MIN_DISTANCE_FROM_SPAWN = 20
 
+# --- Off-Screen Levels ---
+WARM_LEVEL_COUNT = 2 # Recently visited levels whose monsters keep moving while the player is away.
+WARM_LEVEL_BUDGET_MS = 1.0 # Time per frame spent advancing warm levels, however many there are.
+WARM_LEVEL_MAX_BACKLOG = 200 # Turns a warm level can fall behind before older ones are dropped.
+
 # --- AI Tuning ---
 AI_SIGHT_RADIUS = 8
 AI_FORGET_PLAYER_TURNS = 5  # Turns until an ACTIVE AI returns to IDLE
 AI_IDLE_ACTION_CHANCE = 5   # Percentage chance for an IDLE AI to do nothing
+PACK_JOIN_RADIUS = 6        # A pack monster joins a pack whose leader is this close
+PACK_LEAVE_RADIUS = 12      # A member this far from its leader leaves the pack
+PACK_MAX_SIZE = 6
+PACK_PATH_LIMIT = 30        # How far a pack's shared path spreads from its target
 
 # --- Procedural Generation Tuning ---
 PROCGEN_INITIAL_WALL_CHANCE = 45  # Percentage
 PROCGEN_SIMULATION_STEPS = 4
 PROCGEN_RUBBLE_CHANCE = 5         # Percentage
+PROCGEN_PARALLEL_MIN_CELLS = 250_000 # Maps this large (500x500) run the automaton on a process pool.
+BSP_MIN_LEAF = 12 # Smallest side of a room-and-corridor partition before it holds a room.
+BSP_MIN_ROOM = 4 # Smallest side of a room.
+DRUNKARD_FLOOR_FRACTION = 0.4 # Share of the map a drunkard's walk carves open.
+DRUNKARD_WALK_LENGTH = 200 # Steps before the walker restarts from a random carved tile.
+# The layout backend used at each depth (see MAP_GENERATORS), repeating past the end; the boss level uses "arena".
+MAP_GENERATOR_ROTATION = ("caves", "caves", "rooms", "drunkard", "caves", "wfc", "rooms", "drunkard", "wfc")
+
+# --- Endless Caverns (--endless) ---
+CHUNK_SIZE = 32 # Tiles per side of one streamed map chunk.
+CHUNK_STREAM_RADIUS = 2 # Chunks kept loaded around the player and every active monster.
+CHUNK_CACHE_LIMIT = 64 # Chunks held in memory; the rest are evicted to disk.
+CHUNK_SURFACE_LIMIT = 12 # Pre-rendered chunk surfaces kept (enough to cover the screen).
+CHUNK_CACHE_DIR = "chunks" # Folder in the user data folder holding evicted chunks.
 
 # --- Boss Configuration ---
 VAMPIRE_LEVEL = 10 # The dungeon level where the Vampire Lord appears.
 VAMPIRE_SPAWN_OFFSET_Y = 10 # How far below the center the player spawns
+VAMPIRE_ARENA_RADIUS = 6 # Half-width of the open floor carved around the boss.
 
 # --- UI Layout & Animation ---
-# Centralizes constants for positioning and animating UI elements.
 TITLE_Y_POS = 150
 TITLE_FLICKER_BASE = 190
 TITLE_FLICKER_AMP = 65
 TITLE_FLICKER_SPEED = 5
-
 MENU_BUTTON_START_Y = 250
 MENU_BUTTON_SPACING = 60
-
 OPTIONS_BUTTON_START_Y = 200
-
 HELP_MENU_MARGIN = 40
 HELP_MENU_LINE_SPACING = 20
 HELP_MENU_WOBBLE_SPEED = 4
 HELP_MENU_WOBBLE_HEIGHT = 3
-
 DIALOGUE_PANEL_HEIGHT = 100
 DIALOGUE_PANEL_MARGIN_X = 50
 DIALOGUE_PANEL_MARGIN_Y = 30
@@ -256,63 +260,194 @@ DIALOGUE_PANEL_MARGIN_Y = 30
 DEATH_FADE_SPEED = 85
 DEATH_TEXT_FADE_THRESHOLD = 200 # Alpha value at which death text appears
 
-# --- Entity Data Definitions ---
-# Centralizes the base stats and properties for all non-player entities.
-# This makes balancing easier and moves data out of the game logic functions.
-ENTITY_DATA = {
-    "rat": {
-        "char": "r", "color": COLOR_ENTITY_WHITE,
-        "stats": {"hp": 5, "power": 2, "defense": 0, "speed": 1, "xp_reward": 40} # Changed from 5
-    },
-    "ghoul": {
-        "char": "g", "color": COLOR_CORPSE_PALE,
-        "stats": {"hp": 12, "power": 4, "defense": 1, "speed": 1, "xp_reward": 80} # Changed from 20
-    },
-    "skeleton": {
-        "char": "s", "color": COLOR_BONE_WHITE,
-        "stats": {"hp": 8, "power": 3, "defense": 2, "speed": 2, "xp_reward": 100} # Changed from 15
-    },
-    "vampire_lord": {
-        "char": "V", "color": COLOR_BLOOD_RED,
-        "stats": {"hp": 100, "power": 10, "defense": 5, "speed": 1, "xp_reward": 1000}
-    }
-}
-
-# --- Item Data Definitions ---
-ITEM_DATA = {
-    "health_potion": {
-        "spawn_key": "potion", # ADD THIS
-        "char": "!", "color": COLOR_HEALING_RED, "name": "Health Potion",
-        "use_function": heal, "kwargs": {"amount": 15}
-    },
-    "teleport_scroll": {
-        "spawn_key": "scroll", # ADD THIS
-        "char": "?", "color": COLOR_SCROLL_BLUE, "name": "Scroll of Teleportation",
-        "use_function": teleport
-    },
-    "rusty_dagger": {
-        "spawn_key": "dagger", # ADD THIS
-        "char": ")", "color": (139, 137, 137), "name": "Rusty Dagger",
-        "equip": {"slot": "weapon", "power_bonus": 2}
-    },
-    "leather_armor": {
-        "spawn_key": "armor", # ADD THIS
-        "char": "[", "color": (139, 69, 19), "name": "Leather Armor",
-        "equip": {"slot": "armor", "defense_bonus": 1}
-    }
-}
+# --- Frame Pacing ---
+TARGET_FPS = 60 # The frame rate while something on screen is animating.
+IDLE_WAIT_TIMEOUT_MS = 1000 # The longest the idle loop sleeps waiting for an event.
+MAX_FRAME_DELTA = 0.1 # Caps delta_time after an idle sleep so timers don't jump.
+SIMULATION_STEP = 1 / 60 # Game.update always advances by this much, whatever the frame rate.
+MAX_SIMULATION_STEPS = 8 # Catch-up steps per frame; any further lag is dropped rather than chased.
+ENEMY_PHASE_BUDGET_MS = 8.0 # Time per frame an enemy phase may take before the rest waits for the next frame.
+
+# --- Development Tools ---
+PROFILER_WINDOW_FRAMES = 300 # Frames kept for rolling percentiles (5 seconds at 60 FPS).
+PROFILER_GRAPH_WIDTH = 150 # Pixel width of the debug frame-time graph (one column per frame).
+PROFILER_GRAPH_HEIGHT = 40 # Pixel height of the debug frame-time graph.
+PROFILER_GRAPH_CEILING_MS = 33.3 # Frame cost that fills the graph's full height.
+PROFILER_BUDGET_MS = 16.7 # The 60 FPS frame budget, drawn as a guide line on the graph.
+PROFILER_SAMPLE_INTERVAL = 0.005 # Seconds between stack samples in the low-overhead sampling mode.
+
+# --- Run Telemetry (--telemetry) ---
+TELEMETRY_DIR = "telemetry" # Inside the user data folder; one file per recorded run.
+TELEMETRY_CHUNK_ROWS = 512 # Rows a table buffers before the chunk is handed to the writer thread.
+TELEMETRY_OUTCOMES = ("abandoned", "died", "victory") # Stored by index in the run table.
+
+# --- Content Packs ---
+# Monsters, items and spawn rates live in JSON files under assets/content.
+CONTENT_DIR = resource_path('assets/content')
+CONTENT_FILES = ("monsters", "items", "spawn_rates", "behaviors") # One <name>.json file per content section.
+CONTENT_CACHE_FILE = "content_cache.bin" # The compiled content, kept in the user data folder.
+CONTENT_FORMAT_VERSION = 3 # Bump when the compiled layout changes, to invalidate old caches.
+QUICK_USE_RESERVED_KEYS = "wasdei" # Keys already bound to movement and menus, unavailable for items.
+
+def content_check(condition, where, message):
+    """Raises a ValueError naming the offending content entry when a check fails."""
+    if not condition:
+        raise ValueError(f"Invalid content in {where}: {message}")
+
+def compile_color(where, color):
+    """Validates an [r, g, b] list and returns it as a tuple."""
+    content_check(isinstance(color, list) and len(color) == 3 and
+                  all(isinstance(c, int) and 0 <= c <= 255 for c in color), where, "'color' must be [r, g, b]")
+    return tuple(color)
+
+def compile_monster(where, data):
+    """Validates one monster definition and fills in every optional field."""
+    unknown = set(data) - {"char", "color", "stats", "ai", "vampire", "dialogue"}
+    content_check(not unknown, where, f"unknown fields {sorted(unknown)}")
+    content_check(isinstance(data.get("char"), str) and len(data["char"]) == 1, where, "'char' must be one character")
+    stats = data.get("stats")
+    content_check(isinstance(stats, dict) and set(stats) <= {"hp", "power", "defense", "speed", "xp_reward"} and
+                  all(isinstance(stats.get(key), int) for key in ("hp", "power", "defense", "speed")),
+                  where, "'stats' needs integer hp, power, defense and speed (and optionally xp_reward)")
+    ai = data.get("ai", {})
+    content_check(isinstance(ai, dict) and
+                  set(ai) <= {"sight_radius", "is_stationary", "behavior", "attack_range", "pack"},
+                  where, "'ai' may only set sight_radius, is_stationary, behavior, attack_range and pack")
+    # Monsters that never move guard their spot; everything else hunts by default.
+    ai = {"behavior": "sentry" if ai.get("is_stationary") else "hunter", **ai}
+    dialogue = data.get("dialogue")
+    content_check(dialogue is None or (isinstance(dialogue, dict) and isinstance(dialogue.get("speaker_name"), str)
+                                       and isinstance(dialogue.get("dialogue_lines"), list)),
+                  where, "'dialogue' needs a speaker_name and dialogue_lines")
+    return {"char": data["char"], "color": compile_color(where, data.get("color")),
+            "stats": {"xp_reward": 0, **stats}, "ai": ai, "vampire": bool(data.get("vampire", False)),
+            "dialogue": dialogue}
+
+def compile_item(where, data):
+    """Validates one item definition and fills in every optional field."""
+    unknown = set(data) - {"spawn_key", "char", "color", "name", "use_function", "kwargs", "context", "equip",
+                           "quick_use"}
+    content_check(not unknown, where, f"unknown fields {sorted(unknown)}")
+    content_check(isinstance(data.get("spawn_key"), str), where, "'spawn_key' must be a string")
+    content_check(isinstance(data.get("char"), str) and len(data["char"]) == 1, where, "'char' must be one character")
+    content_check(isinstance(data.get("name"), str), where, "'name' must be a string")
+    content_check(data.get("use_function") in (None, *ITEM_FUNCTIONS), where,
+                  f"'use_function' must be one of {sorted(ITEM_FUNCTIONS)}")
+    content_check(isinstance(data.get("kwargs", {}), dict), where, "'kwargs' must be an object")
+    context = data.get("context", [])
+    content_check(isinstance(context, list) and set(context) <= set(ITEM_CONTEXT_KEYS), where,
+                  f"'context' may only list {list(ITEM_CONTEXT_KEYS)}")
+    equip = data.get("equip")
+    content_check(equip is None or (isinstance(equip, dict) and equip.get("slot") in ("weapon", "armor") and
+                                    set(equip) <= {"slot", "power_bonus", "defense_bonus", "max_hp_bonus"}),
+                  where, "'equip' needs a weapon or armor slot and only *_bonus fields")
+    quick_use = data.get("quick_use")
+    content_check(quick_use is None or (
+        data.get("use_function") and isinstance(quick_use, dict) and set(quick_use) == {"key", "label", "used", "missing"}
+        and isinstance(quick_use["key"], str) and len(quick_use["key"]) == 1
+        and quick_use["key"] not in QUICK_USE_RESERVED_KEYS), where,
+                  "'quick_use' needs a use_function and key, label, used and missing, with a free one-letter key")
+    return {"spawn_key": data["spawn_key"], "char": data["char"], "color": compile_color(where, data.get("color")),
+            "name": data["name"], "use_function": data.get("use_function"), "kwargs": data.get("kwargs", {}),
+            "context": tuple(context), "equip": equip, "quick_use": quick_use}
+
+def compile_spawn_rates(where, rates, monsters, items):
+    """Validates the spawn table against the monsters and item spawn keys it refers to."""
+    spawn_keys = set(monsters) | {item["spawn_key"] for item in items.values()}
+    for key, rate in rates.items():
+        content_check(key in spawn_keys, f"{where}.{key}", "not a monster name or an item spawn_key")
+        content_check(isinstance(rate, dict) and set(rate) <= {"base", "scaling", "min"} and
+                      all(isinstance(rate.get(field), (int, float)) for field in ("base", "scaling")),
+                      f"{where}.{key}", "needs numeric base and scaling (and optionally min)")
+    return rates
+
+def compile_behaviors(where, behaviors, monsters):
+    """Validates the behavior trees: priority lists of rules, each "if" conditions guarding one "do" action."""
+    for key, rules in behaviors.items():
+        content_check(isinstance(rules, list) and rules, f"{where}.{key}", "must be a non-empty list of rules")
+        for i, rule in enumerate(rules):
+            content_check(isinstance(rule, dict) and set(rule) <= {"if", "do"} and rule.get("do") in AI_ACTIONS and
+                          isinstance(rule.get("if", []), list) and set(rule.get("if", [])) <= set(AI_CONDITIONS),
+                          f"{where}.{key}[{i}]", f"needs a 'do' from {sorted(AI_ACTIONS)} and "
+                                                 f"'if' conditions from {sorted(AI_CONDITIONS)}")
+    for key, monster in monsters.items():
+        content_check(monster["ai"]["behavior"] in behaviors, f"monsters.{key}", "'behavior' is not in behaviors.json")
+    return {key: [[rule.get("if", []), rule["do"]] for rule in rules] for key, rules in behaviors.items()}
+
+class ContentLibrary:
+    """Loads the JSON content files, or their compiled marshal cache while the files' hash is unchanged."""
+    def __init__(self, content_dir):
+        self.content_dir = Path(content_dir)
+        self.sections = None  # Loaded on first use, so importing does no I/O.
+
+    def get(self, section):
+        """Returns one compiled content section, loading the library if needed."""
+        if self.sections is None:
+            self.sections = self.load()
+        return self.sections[section]
+
+    def load(self):
+        """Returns the compiled sections from the cache, or compiles and caches them."""
+        sources = {name: (self.content_dir / f"{name}.json").read_bytes() for name in CONTENT_FILES}
+        digest = hashlib.sha256(f"{CONTENT_FORMAT_VERSION}:{sys.version_info[:2]}".encode())
+        for name, source in sources.items():
+            digest.update(name.encode() + b"\0" + source)
+        header = digest.hexdigest().encode()
+        cache_path = get_user_data_dir() / CONTENT_CACHE_FILE
+        try:
+            cached_header, _, payload = cache_path.read_bytes().partition(b"\n")
+            if cached_header == header:
+                return marshal.loads(payload)
+        except (OSError, EOFError, ValueError, TypeError):
+            pass  # A missing or damaged cache is simply rebuilt.
+        sections = self.compile(sources)
+        try:
+            temp_path = cache_path.with_suffix(".tmp")
+            temp_path.write_bytes(header + b"\n" + marshal.dumps(sections))
+            os.replace(temp_path, cache_path)  # Atomic, so a crash never leaves half a cache.
+        except OSError as e:
+            GameLogger.log(f"Could not write the content cache: {e}", "WARNING")
+        return sections
 
-# --- Spawn Rate Definitions ---
-# Defines the base number and per-level scaling factor for entity spawns.
-SPAWN_RATES = {
-    "rat":      {"base": 5,  "scaling": 1},      # Changed from base:10, scaling:2
-    "ghoul":    {"base": 2,  "scaling": 0.8},    # Changed from base:3, scaling:1
-    "skeleton": {"base": 1,  "scaling": 0.6},    # Changed from base:4, scaling:0.5
-    "potion":   {"base": 4,  "scaling": -0.5, "min": 1},
-    "scroll":   {"base": 0,  "scaling": 0.5},
-    "dagger":   {"base": 1,  "scaling": 0},
-    "armor":    {"base": 1,  "scaling": 0}
-}
+    @staticmethod
+    def compile(sources):
+        """Parses and validates the JSON sources into the compiled sections."""
+        raw = {}
+        for name, source in sources.items():
+            try:
+                raw[name] = json.loads(source)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid content in {name}.json: {e}") from e
+            content_check(isinstance(raw[name], dict), f"{name}.json", "the file must hold a JSON object")
+        monsters = {key: compile_monster(f"monsters.{key}", data) for key, data in raw["monsters"].items()}
+        items = {key: compile_item(f"items.{key}", data) for key, data in raw["items"].items()}
+        quick_use_keys = [item["quick_use"]["key"] for item in items.values() if item["quick_use"]]
+        content_check(len(quick_use_keys) == len(set(quick_use_keys)), "items", "two items share a quick_use key")
+        spawn_rates = compile_spawn_rates("spawn_rates", raw["spawn_rates"], monsters, items)
+        behaviors = compile_behaviors("behaviors", raw["behaviors"], monsters)
+        return {"monsters": monsters, "items": items, "spawn_rates": spawn_rates, "behaviors": behaviors}
+
+class ContentTable(Mapping):
+    """A read-only dict-like view of one content section, loaded on first access."""
+    def __init__(self, library, section):
+        self.library = library
+        self.section = section
+
+    def __getitem__(self, key):
+        return self.library.get(self.section)[key]
+
+    def __iter__(self):
+        return iter(self.library.get(self.section))
+
+    def __len__(self):
+        return len(self.library.get(self.section))
+
+# The single, shared content library and its four sections of compiled, fully populated entries.
+content_library = ContentLibrary(CONTENT_DIR)
+ENTITY_DATA = ContentTable(content_library, "monsters") # Monster name -> blueprint.
+ITEM_DATA = ContentTable(content_library, "items") # Item id -> blueprint.
+SPAWN_RATES = ContentTable(content_library, "spawn_rates") # Spawn key -> base, scaling and optional min.
+BEHAVIORS = ContentTable(content_library, "behaviors") # Behavior name -> [[conditions], action] rules.
 
 # ==============================================================================
 # IV. State Management (Principle: Coherence)
@@ -327,20 +462,34 @@ class GameState(Enum):
     MAIN_MENU = auto()  # State for when the main menu is displayed.
     OPTIONS_ROOT = auto()  # The main options menu (with categories).
     OPTIONS_VIDEO = auto()  # The sub-menu for screen resolution settings.
-    PLAYER_DEAD = auto()  # A new state for when the player has died.
-    EQUIP_MENU = auto() # The new state for the equipment screen.
-    DIALOGUE = auto()  # A new state for displaying dialogue.
-    VICTORY = auto()  # A new state for when the game is won.
-
-    # The original GAME_RUNNING state has been replaced by a more granular
-    # turn-based system to provide more precise control over game flow.
+    PLAYER_DEAD = auto()  # The player has died.
+    EQUIP_MENU = auto() # The equipment screen.
+    DIALOGUE = auto()  # Dialogue is displayed.
+    VICTORY = auto()  # The game is won.
     PLAYER_TURN = auto()  # The game is waiting for the player to act.
     ENEMY_TURN = auto()  # The game is processing the actions of all enemies.
 
+# Every state in which the game world (map, entities and HUD) is drawn.
+GAMEPLAY_STATES = (GameState.PLAYER_TURN, GameState.ENEMY_TURN, GameState.PLAYER_DEAD,
+                   GameState.EQUIP_MENU, GameState.DIALOGUE, GameState.VICTORY)
+
 # ==============================================================================
 # V. UI Classes (Principle: Modularity)
 # ==============================================================================
 
+class FontRegistry:
+    """Loads each bundled font once, on first use, and shares it between all UI classes."""
+    def __init__(self):
+        self.fonts = {}
+
+    def get(self, size, path=FONT_PATH):
+        """Returns the font at `path` in `size` points, loading it if needed."""
+        if (path, size) not in self.fonts:
+            self.fonts[(path, size)] = pygame.font.Font(path, size)
+        return self.fonts[(path, size)]
+
+fonts = FontRegistry() # The single, shared font registry.
+
 class Button:
     """Represents a single, selectable button in a UI menu."""
 
@@ -362,9 +511,8 @@ class Menu:
     """Manages the main menu, its title, and its buttons."""
 
     def __init__(self):
-        self.title_font = pygame.font.Font(FONT_PATH, 50)
-        self.button_font = pygame.font.Font(FONT_PATH, 30)
-
+        self.title_font = fonts.get(50)
+        self.button_font = fonts.get(30)
         self.buttons = [
             Button(MENU_BUTTON_START_Y, "Start Game", self.button_font, GameState.PLAYER_TURN),
             Button(MENU_BUTTON_START_Y + MENU_BUTTON_SPACING, "Options", self.button_font, GameState.OPTIONS_ROOT),
@@ -377,13 +525,10 @@ class Menu:
     def handle_input(self, event):
         """Processes keyboard input for menu navigation."""
         if event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_UP or event.key == pygame.K_w:
-                self.buttons[self.selected_index].is_selected = False
-                self.selected_index = (self.selected_index - 1) % len(self.buttons)
-                self.buttons[self.selected_index].is_selected = True
-            elif event.key == pygame.K_DOWN or event.key == pygame.K_s:
+            step = {pygame.K_UP: -1, pygame.K_w: -1, pygame.K_DOWN: 1, pygame.K_s: 1}.get(event.key)
+            if step:
                 self.buttons[self.selected_index].is_selected = False
-                self.selected_index = (self.selected_index + 1) % len(self.buttons)
+                self.selected_index = (self.selected_index + step) % len(self.buttons)
                 self.buttons[self.selected_index].is_selected = True
             elif event.key == pygame.K_RETURN:
                 return self.buttons[self.selected_index].action
@@ -395,15 +540,10 @@ class Menu:
 
     def draw(self, surface):
         """Draws all elements of the main menu."""
-        # Calculate a flickering color for the title using a sine wave.
-        flicker = TITLE_FLICKER_BASE + TITLE_FLICKER_AMP * math.sin(self.title_flicker_timer * TITLE_FLICKER_SPEED)
-        title_color = (int(flicker), int(flicker), int(flicker))
-
-        title_text = "Gothic Rogue"
-        title_surface = self.title_font.render(title_text, True, title_color)
-        title_rect = title_surface.get_rect(center=(INTERNAL_WIDTH / 2, TITLE_Y_POS))
-        surface.blit(title_surface, title_rect)
-
+        # The title's grey level flickers along a sine wave.
+        flicker = int(TITLE_FLICKER_BASE + TITLE_FLICKER_AMP * math.sin(self.title_flicker_timer * TITLE_FLICKER_SPEED))
+        title_surface = self.title_font.render("Gothic Rogue", True, (flicker, flicker, flicker))
+        surface.blit(title_surface, title_surface.get_rect(center=(INTERNAL_WIDTH / 2, TITLE_Y_POS)))
         for button in self.buttons:
             button.draw(surface)
 
@@ -418,8 +558,8 @@ class OptionsMenu:
     """
 
     def __init__(self):
-        self.title_font = pygame.font.Font(FONT_PATH, 40)
-        self.button_font = pygame.font.Font(FONT_PATH, 28)
+        self.title_font = fonts.get(40)
+        self.button_font = fonts.get(28)
         self.buttons = []
         self.selected_index = 0
 
@@ -427,70 +567,33 @@ class OptionsMenu:
         """Clears and rebuilds the button list based on the current game state."""
         self.buttons.clear()
         y_offset = OPTIONS_BUTTON_START_Y  # Starting Y position for buttons
-
         if game_state == GameState.OPTIONS_ROOT:
-            # --- Main Options Categories ---
+            # --- Main Options Categories: video, the FPS toggle, and back to the main menu ---
             self.buttons.append(Button(y_offset, "Video Settings", self.button_font, GameState.OPTIONS_VIDEO))
-
-            # This is the FPS toggle from our previous work.
-            show_fps = settings_manager.get("show_fps")
-            fps_text = f"FPS Counter: {'ON' if show_fps else 'OFF'}"
+            fps_text = f"FPS Counter: {'ON' if settings_manager.get('show_fps') else 'OFF'}"
             self.buttons.append(Button(y_offset + 60, fps_text, self.button_font, {"type": "toggle_fps"}))
-
-            # The back button now returns to the main menu.
             self.buttons.append(Button(y_offset + 120, "Back", self.button_font, GameState.MAIN_MENU))
-
         elif game_state == GameState.OPTIONS_VIDEO:
-
-            # --- Video Settings Sub-Menu ---
+            # --- Video Settings Sub-Menu: the current resolution is marked with a '<' ---
             for i, (w, h) in enumerate(resolutions):
-                action = {"type": "resolution", "index": i}
-                button_text = f"{w} x {h}"
-                # Add an indicator to the currently selected resolution.
-                if i == current_resolution_index:
-                    button_text += " <"
-                button = Button(y_offset + i * 50, button_text, self.button_font, action)
-                self.buttons.append(button)
-
-            # The back button now returns to the root options menu.
+                button_text = f"{w} x {h}" + (" <" if i == current_resolution_index else "")
+                self.buttons.append(Button(y_offset + i * 50, button_text, self.button_font,
+                                           {"type": "resolution", "index": i}))
             back_y = y_offset + len(resolutions) * 50
             self.buttons.append(Button(back_y, "Back", self.button_font, GameState.OPTIONS_ROOT))
-
-        else:
-            # This menu does not handle other states. By adding this `else`,
-            # we explicitly tell the linter we have considered all other
-            # possibilities from the GameState enum.
-            pass
-
         self.selected_index = 0
         self.buttons[self.selected_index].is_selected = True
 
     def handle_input(self, event):
         """Processes keyboard input for menu navigation and actions."""
-        if event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_UP or event.key == pygame.K_w:
-                self.buttons[self.selected_index].is_selected = False
-                self.selected_index = (self.selected_index - 1) % len(self.buttons)
-                self.buttons[self.selected_index].is_selected = True
-            elif event.key == pygame.K_DOWN or event.key == pygame.K_s:
-                self.buttons[self.selected_index].is_selected = False
-                self.selected_index = (self.selected_index + 1) % len(self.buttons)
-                self.buttons[self.selected_index].is_selected = True
-            elif event.key == pygame.K_RETURN:
-                return self.buttons[self.selected_index].action
-        return None
+        return Menu.handle_input(self, event)  # Same navigation as the main menu.
 
     def draw(self, surface, game_state):
         """Draws the options menu, with a title that changes based on the state."""
-        # --- Dynamic Title ---
-        title_text = "Options"
-        if game_state == GameState.OPTIONS_VIDEO:
-            title_text = "Screen Resolution"
-
+        title_text = "Screen Resolution" if game_state == GameState.OPTIONS_VIDEO else "Options"
         title_surface = self.title_font.render(title_text, True, COLOR_WHITE)
         title_rect = title_surface.get_rect(center=(INTERNAL_WIDTH / 2, 100))
         surface.blit(title_surface, title_rect)
-
         for button in self.buttons:
             button.draw(surface)
 
@@ -507,9 +610,9 @@ class EquipmentMenu:
         """
 
     def __init__(self):
-        self.title_font = pygame.font.Font(pygame.font.match_font(FONT_NAME), 32)
-        self.header_font = pygame.font.Font(pygame.font.match_font(FONT_NAME), 20)
-        self.item_font = pygame.font.Font(pygame.font.match_font(FONT_NAME), 18)
+        self.title_font = fonts.get(32)
+        self.header_font = fonts.get(20)
+        self.item_font = fonts.get(18)
         self.options = []
         self.selected_index = 0
 
@@ -517,16 +620,10 @@ class EquipmentMenu:
         """Clears and rebuilds the list of selectable items from the player's inventory."""
         self.options.clear()
         inventory = player.get_component(InventoryComponent)
-        # noinspection SpellCheckingInspection
         if inventory:
-            # Filter the inventory to only include items that have an EquippableComponent.
-            self.options = [item for item in inventory.items if item.get_component(EquippableComponent)]
-
-        # Ensure selected_index is valid.
-        if self.selected_index >= len(self.options):
-            self.selected_index = len(self.options) - 1
-        if self.selected_index < 0:
-            self.selected_index = 0
+            # Only items that have an EquippableComponent can be chosen here.
+            self.options = inventory.equippables()
+        self.selected_index = max(0, min(self.selected_index, len(self.options) - 1))  # Keep the selection valid.
 
     def handle_input(self, event):
         """Processes keyboard input for menu navigation and actions."""
@@ -536,10 +633,8 @@ class EquipmentMenu:
             elif event.key in (pygame.K_DOWN, pygame.K_s):
                 self.selected_index = (self.selected_index + 1) % len(self.options) if self.options else 0
             elif event.key == pygame.K_RETURN and self.options:
-                # Return the selected item entity to be equipped.
                 return {"type": "equip", "item": self.options[self.selected_index]}
             elif event.key == pygame.K_ESCAPE:
-                # Return an action to close the menu.
                 return {"type": "close"}
         return None
 
@@ -550,16 +645,12 @@ class EquipmentMenu:
         panel_rect = pygame.Rect(50, 50, INTERNAL_WIDTH - 100, INTERNAL_HEIGHT - 100)
         pygame.draw.rect(surface, (20, 20, 30), panel_rect)  # Dark blue panel
         pygame.draw.rect(surface, (100, 100, 120), panel_rect, 2)  # Lighter border
-
         # --- Draw Title ---
         title_surface = self.title_font.render("Character Inventory", True, COLOR_WHITE)
         surface.blit(title_surface, (panel_rect.x + 20, panel_rect.y + 15))
-
         # --- Draw Player Stats ---
         stats_x = panel_rect.x + 30
         stats_y = panel_rect.y + 80
-
-        # Use the new getter methods to display final, calculated stats.
         stats_text = [
             f"Level: {player.get_component(ExperienceComponent).level}",
             f"Health: {player.get_component(StatsComponent).current_hp} / {player.get_max_hp()}",
@@ -569,28 +660,22 @@ class EquipmentMenu:
         for i, text in enumerate(stats_text):
             text_surface = self.item_font.render(text, True, COLOR_WHITE)
             surface.blit(text_surface, (stats_x, stats_y + i * 25))
-
         # --- Draw Currently Equipped Items ---
         equipped_x = panel_rect.x + 250
         equipped_y = panel_rect.y + 80
-
         header_surface = self.header_font.render("Equipped", True, COLOR_WHITE)
         surface.blit(header_surface, (equipped_x, equipped_y))
-
         equipment = player.get_component(EquipmentComponent)
         for i, (slot, item) in enumerate(equipment.slots.items()):
             item_name = item.get_component(ItemComponent).name if item else "None"
             text = f"{slot.capitalize()}: {item_name}"
             text_surface = self.item_font.render(text, True, (200, 200, 200))
             surface.blit(text_surface, (equipped_x + 10, equipped_y + 35 + i * 25))
-
         # --- Draw Equippable Items in Inventory ---
         inventory_x = panel_rect.x + 30
         inventory_y = panel_rect.y + 250
-
         inv_header = self.header_font.render("Inventory (Equippable)", True, COLOR_WHITE)
         surface.blit(inv_header, (inventory_x, inventory_y))
-
         for i, item in enumerate(self.options):
             item_name = item.get_component(ItemComponent).name
             color = COLOR_BLOOD_RED if i == self.selected_index else COLOR_WHITE
@@ -609,35 +694,45 @@ class HelpMenu:
     """
 
     def __init__(self):
-        self.font = pygame.font.Font(pygame.font.match_font(FONT_NAME), 16)
+        self.font = fonts.get(16)
         self.is_open = False
         self.has_been_opened_once = False
         self.animation_timer = 0.0
-        # This list contains the text for the help menu.
         self.keybindings = [
             "[ Gameplay ]",
             "Move / Attack: WASD or Arrows",
             "Descend Stairs: > (Shift + .)",
+            "Climb Stairs: < (Shift + ,)",
             "",  # Spacer
             "[ Actions ]",
-            "Use Health Potion: H",
-            "Read Scroll: R",
+            # One line per item with a quick-use key, taken from the content files.
+            *(f"{data['quick_use']['label']}: {data['quick_use']['key'].upper()}"
+              for data in ITEM_DATA.values() if data["quick_use"]),
             "",  # Spacer
             "[ Menus ]",
             "Equipment / Inventory: E",
             "Advance Dialogue: ENTER", # Add the new keybinding here
             "Close Any Menu: ESC",
+            "Scroll Messages: PgUp / PgDn",
             "",  # Spacer
             "[ System ]",
             "Toggle Debug Info: F12",
+            "Record Frame Timings: F11",
+            "Start/Stop Profiler: F10",
+            "Export Message Log: F9",
         ]
 
+    # The screen region the wobbling '[i]' icon can occupy.
+    ICON_RECT = pygame.Rect(INTERNAL_WIDTH - HELP_MENU_MARGIN - 40, INTERNAL_HEIGHT - HELP_MENU_MARGIN - 30, 44, 36)
+
+    def is_animating(self):
+        """The icon wobbles until the menu has been opened for the first time."""
+        return not self.is_open and not self.has_been_opened_once
+
     def toggle(self):
         """Switches the menu between its open and closed states."""
         self.is_open = not self.is_open
-        # Once opened for the first time, disable the introductory animation.
-        if not self.has_been_opened_once:
-            self.has_been_opened_once = True
+        self.has_been_opened_once = True  # Once opened, the introductory animation stops.
 
     def update(self, delta_time):
         """Updates the animation timer."""
@@ -646,10 +741,8 @@ class HelpMenu:
     def draw(self, surface):
         """Draws the help menu icon or the full list of keybindings."""
         if self.is_open:
-            # --- Draw the full help text ---
-            # Add the instruction to close the menu to the list dynamically.
+            # --- Draw the full help text, and how to close it ---
             full_text_list = self.keybindings + ["", "Close This Menu: i"]
-
             for i, text in enumerate(reversed(full_text_list)):
                 text_surface = self.font.render(text, True, COLOR_WHITE)
                 x_pos = INTERNAL_WIDTH - text_surface.get_width() - HELP_MENU_MARGIN
@@ -658,11 +751,8 @@ class HelpMenu:
                 surface.blit(text_surface, (x_pos, y_pos))
         else:
             # --- Draw the 'i' icon ---
-            y_offset = 0
             # Only apply the wobble animation if the menu has never been opened.
-            if not self.has_been_opened_once:
-                y_offset = int(math.sin(self.animation_timer) * HELP_MENU_WOBBLE_HEIGHT)
-
+            y_offset = 0 if self.has_been_opened_once else int(math.sin(self.animation_timer) * HELP_MENU_WOBBLE_HEIGHT)
             text_surface = self.font.render("[i]", True, COLOR_WHITE)
             x_pos = INTERNAL_WIDTH - text_surface.get_width() - HELP_MENU_MARGIN
             y_pos = INTERNAL_HEIGHT - text_surface.get_height() - HELP_MENU_MARGIN + y_offset
@@ -679,8 +769,8 @@ class DialogueViewer:
     """
 
     def __init__(self):
-        self.font = pygame.font.Font(pygame.font.match_font(FONT_NAME), 18)
-        self.speaker_font = pygame.font.Font(pygame.font.match_font(FONT_NAME), 16)
+        self.font = fonts.get(18)
+        self.speaker_font = fonts.get(16)
         self.active_entity = None
         self.current_line_index = 0
         self.dialogue_lines = []
@@ -691,26 +781,20 @@ class DialogueViewer:
         dialogue_comp = entity.get_component(DialogueComponent)
         if not dialogue_comp:
             return False  # Cannot start dialogue if the entity has none.
-
         self.active_entity = entity
         self.current_line_index = 0
         self.speaker_name = dialogue_comp.speaker_name
-
         # Use subsequent dialogue if the player has already spoken to this entity.
-        if dialogue_comp.has_spoken:
-            self.dialogue_lines = dialogue_comp.subsequent_dialogue_lines
-        else:
-            self.dialogue_lines = dialogue_comp.dialogue_lines
-
+        self.dialogue_lines = (dialogue_comp.subsequent_dialogue_lines if dialogue_comp.has_spoken
+                               else dialogue_comp.dialogue_lines)
         return True
 
     def handle_input(self, event):
         """Listens only for the Enter key to advance or close the dialogue."""
         if event.type == pygame.KEYDOWN and event.key == pygame.K_RETURN:
             self.current_line_index += 1
-            # Check if we have run out of dialogue lines.
+            # Out of lines: mark the dialogue as finished and signal to close.
             if self.current_line_index >= len(self.dialogue_lines):
-                # Mark the dialogue as finished and signal to close.
                 dialogue_comp = self.active_entity.get_component(DialogueComponent)
                 dialogue_comp.has_spoken = True
                 return "finished"
@@ -720,24 +804,19 @@ class DialogueViewer:
         """Draws the dialogue box and the current line of text."""
         if not self.active_entity:
             return
-
         # --- Draw Background Panel ---
         panel_width = INTERNAL_WIDTH - (DIALOGUE_PANEL_MARGIN_X * 2)
         panel_x = DIALOGUE_PANEL_MARGIN_X
         panel_y = INTERNAL_HEIGHT - DIALOGUE_PANEL_HEIGHT - DIALOGUE_PANEL_MARGIN_Y
-
         panel_rect = pygame.Rect(panel_x, panel_y, panel_width, DIALOGUE_PANEL_HEIGHT)
-
         # Create a semi-transparent surface for the panel
         panel_surface = pygame.Surface(panel_rect.size, pygame.SRCALPHA)
         panel_surface.fill((10, 10, 20, 200))  # Dark blue with 200/255 alpha
         surface.blit(panel_surface, panel_rect.topleft)
         pygame.draw.rect(surface, (100, 100, 120), panel_rect, 2)  # Lighter border
-
         # --- Draw Speaker Name ---
         speaker_surface = self.speaker_font.render(f"{self.speaker_name}:", True, (200, 180, 100))
         surface.blit(speaker_surface, (panel_rect.x + 15, panel_rect.y + 10))
-
         # --- Draw Current Dialogue Line ---
         current_line = self.dialogue_lines[self.current_line_index]
         text_surface = self.font.render(current_line, True, COLOR_WHITE)
@@ -751,10 +830,15 @@ class Component:
     """A base class for all components. Does not do anything on its own."""
 
     def __init__(self):
-        # This allows a component to know which entity it belongs to.
-        # It is set automatically when the component is added to an entity.
+        # The entity this component belongs to, set when it is added to one.
         self.owner = None
 
+    def clone(self):
+        """Returns a shallow copy for a new entity (see Prefab); containers are copied by the overrides."""
+        component = object.__new__(type(self))  # Skips __init__; the fields are copied below.
+        component.__dict__ = self.__dict__.copy()
+        return component
+
 class PositionComponent(Component):
     """Stores the grid-based (tile) x, y coordinates of an entity."""
 
@@ -781,48 +865,41 @@ class TurnTakerComponent(Component):
               get a turn, ensuring the game processes actions correctly.
     """
 
-    def __init__(self):
-        super().__init__()
-
 class AIComponent(Component):
     """
     Handles all logic for non-player entities, from movement to combat.
     - Necessity: To give enemies autonomy and make the world interactive.
-    - Function: Contains a state machine (IDLE/ACTIVE) and logic for each state.
+    - Function: Perception drives an IDLE/ACTIVE state machine; the action is
+                then picked by the archetype's behavior tree from behaviors.json,
+                compiled once into a dispatch table of plain functions.
     - Effect: Creates dynamic, responsive enemies that can hunt the player.
     """
 
-    def __init__(self, sight_radius=AI_SIGHT_RADIUS, is_stationary=False):
+    def __init__(self, sight_radius=AI_SIGHT_RADIUS, is_stationary=False, behavior="hunter", attack_range=1,
+                 pack=False):
         super().__init__()
         self.state = 'IDLE'
         self.sight_radius = sight_radius
         self.is_stationary = is_stationary
+        self.attack_range = attack_range
+        self.behavior = compile_behavior(behavior)  # Shared by every monster of the archetype.
+        self.hunts_in_packs = pack
+        self.pack = None  # The Pack this monster hunts with, set by the TurnManager.
         self.turns_since_player_seen = 0
 
-    def take_turn(self, turn_manager, player):
-        """Called by the TurnManager for the enemy's turn. Contains all AI logic."""
-        # Get entity and player positions at the start. This ensures they are always defined.
-        pos = self.owner.get_component(PositionComponent)
-        player_pos = player.get_component(PositionComponent)
-        if not pos or not player_pos: return
-
+    def perceive(self, distance_to_player, turn_manager):
+        """Updates the IDLE/ACTIVE state and starts any first-sight dialogue; False means no further action."""
         # A stationary entity in an IDLE state does nothing until it sees the player.
-        if self.is_stationary and self.state == 'IDLE':
-            distance_to_player = abs(pos.x - player_pos.x) + abs(pos.y - player_pos.y)
-            if distance_to_player > self.sight_radius:
-                return  # If player is out of sight, do nothing.
-
+        if self.is_stationary and self.state == 'IDLE' and distance_to_player > self.sight_radius:
+            return False  # If player is out of sight, do nothing.
         # --- State Transition Logic ---
-        distance_to_player = abs(pos.x - player_pos.x) + abs(pos.y - player_pos.y)
-
         if distance_to_player <= self.sight_radius:
             # --- Dialogue Trigger ---
             dialogue_comp = self.owner.get_component(DialogueComponent)
             if dialogue_comp and not dialogue_comp.has_spoken:
                 if turn_manager.game.dialogue_viewer.start_dialogue(self.owner):
                     turn_manager.game.game_state = GameState.DIALOGUE
-                return
-
+                return False
             if self.state == 'IDLE':
                 turn_manager.game.set_combat_state(True)
             self.state = 'ACTIVE'
@@ -831,60 +908,138 @@ class AIComponent(Component):
             self.turns_since_player_seen += 1
             if self.turns_since_player_seen >= AI_FORGET_PLAYER_TURNS:
                 self.state = 'IDLE'
+        return True
 
-        # --- Action Logic based on State ---
-        # A stationary entity will not enter the 'move_towards' or 'move_randomly' blocks.
-        if self.is_stationary:
-            # If adjacent to the player, attack. Otherwise, do nothing.
-            if distance_to_player <= 1:
-                turn_manager.process_attack(self.owner, player)
-            return  # End turn after attacking or doing nothing.
-
-        if self.state == 'ACTIVE':
-            if random.randint(1, 100) <= AI_IDLE_ACTION_CHANCE:
+    def take_turn(self, turn_manager, player, distance_to_player=None):
+        """Takes the enemy's turn; a distance passed in is this action's perception, already done in bulk."""
+        # Get entity and player positions at the start. This ensures they are always defined.
+        pos = self.owner.get_component(PositionComponent)
+        player_pos = player.get_component(PositionComponent)
+        if not pos or not player_pos: return
+        if distance_to_player is None:
+            distance_to_player = abs(pos.x - player_pos.x) + abs(pos.y - player_pos.y)
+            if not self.perceive(distance_to_player, turn_manager):
                 return
-
-            if distance_to_player <= 1:
-                turn_manager.process_attack(self.owner, player)
+        # --- Action Logic: the first rule of the behavior tree whose conditions all hold ---
+        for conditions, action in self.behavior:
+            for condition in conditions:
+                if not condition(self, distance_to_player, turn_manager, player):
+                    break
             else:
-                self.move_towards(player_pos, turn_manager)
-
-        elif self.state == 'IDLE':
-            self.move_randomly(turn_manager)
+                action(self, distance_to_player, turn_manager, player)
+                return
 
-    def move_towards(self, target_pos, turn_manager):
-        """Moves the entity one step closer to the target position."""
+    def try_step(self, dx, dy, turn_manager):
+        """Moves the entity by (dx, dy) if that tile is walkable and unoccupied."""
         pos = self.owner.get_component(PositionComponent)
-        dx = target_pos.x - pos.x
-        dy = target_pos.y - pos.y
-
-        # Normalize the direction vector to get a single step.
-        if dx > 0:
-            dx = 1
-        elif dx < 0:
-            dx = -1
-        if dy > 0:
-            dy = 1
-        elif dy < 0:
-            dy = -1
-
-        # Check if the intended move is valid before committing.
         next_x, next_y = pos.x + dx, pos.y + dy
         if turn_manager.game_map.is_walkable(next_x, next_y) and not turn_manager.get_entity_at_location(next_x,
                                                                                                          next_y):
-            pos.x = next_x
-            pos.y = next_y
+            pos.x, pos.y = next_x, next_y
+
+    def move_towards(self, target_pos, turn_manager):
+        """Moves the entity one step closer to the target position."""
+        pos = self.owner.get_component(PositionComponent)
+        # The sign of each axis gives a single step (diagonals included).
+        self.try_step((target_pos.x > pos.x) - (target_pos.x < pos.x),
+                      (target_pos.y > pos.y) - (target_pos.y < pos.y), turn_manager)
 
     def move_randomly(self, turn_manager):
         """Moves the entity one step in a random valid direction."""
-        pos = self.owner.get_component(PositionComponent)
         move_options = [(0, -1), (0, 1), (-1, 0), (1, 0)]
-        dx, dy = random.choice(move_options)
-        next_x, next_y = pos.x + dx, pos.y + dy
-        if turn_manager.game_map.is_walkable(next_x, next_y) and not turn_manager.get_entity_at_location(next_x,
-                                                                                                         next_y):
-            pos.x = next_x
-            pos.y = next_y
+        self.try_step(*random.choice(move_options), turn_manager)
+
+    def move_away(self, target_pos, turn_manager):
+        """Takes the free step that puts the most distance between the entity and the target."""
+        pos = self.owner.get_component(PositionComponent)
+        best, best_distance = None, abs(pos.x - target_pos.x) + abs(pos.y - target_pos.y)
+        for dx, dy in [(0, -1), (0, 1), (-1, 0), (1, 0)]:
+            next_x, next_y = pos.x + dx, pos.y + dy
+            distance = abs(next_x - target_pos.x) + abs(next_y - target_pos.y)
+            if distance > best_distance and turn_manager.game_map.is_walkable(next_x, next_y) and \
+                    not turn_manager.get_entity_at_location(next_x, next_y):
+                best, best_distance = (next_x, next_y), distance
+        if best:
+            pos.x, pos.y = best
+
+    def move_with_pack(self, turn_manager):
+        """Steps down the shared path to the flank the pack gave this member."""
+        pos = self.owner.get_component(PositionComponent)
+        path = self.pack.flanks[self.owner]
+        best, best_distance = None, path.get(pos.x, pos.y)
+        for dx, dy in DistanceMap.STEPS:
+            next_x, next_y = pos.x + dx, pos.y + dy
+            distance = path.get(next_x, next_y)
+            if distance is not None and distance < best_distance and \
+                    not turn_manager.get_entity_at_location(next_x, next_y):
+                best, best_distance = (next_x, next_y), distance
+        if best:
+            pos.x, pos.y = best
+
+# --- Behavior Conditions and Actions ---
+# The building blocks named in behaviors.json, each taking (ai, distance to the player, turn_manager, player).
+def has_line_of_sight(game_map, x0, y0, x1, y1):
+    """Checks that no wall lies on the straight (Bresenham) line between two tiles."""
+    dx, dy = abs(x1 - x0), -abs(y1 - y0)
+    step_x, step_y = (1 if x1 > x0 else -1), (1 if y1 > y0 else -1)
+    error = dx + dy
+    while (x0, y0) != (x1, y1):
+        if not game_map.is_walkable(x0, y0):
+            return False
+        doubled = 2 * error
+        if doubled >= dy:
+            error += dy
+            x0 += step_x
+        if doubled <= dx:
+            error += dx
+            y0 += step_y
+    return True
+
+def ai_hesitates(ai, distance, turn_manager, player):
+    """The small chance that a hunting monster loses its action."""
+    return random.randint(1, 100) <= AI_IDLE_ACTION_CHANCE
+
+def ai_is_hurt(ai, distance, turn_manager, player):
+    """True at a third of maximum health or less."""
+    stats = ai.owner.get_component(StatsComponent)
+    return stats.current_hp * 3 <= stats.max_hp
+
+def ai_has_clear_shot(ai, distance, turn_manager, player):
+    """The player is within attack range with no wall in between."""
+    if distance > ai.attack_range:
+        return False
+    pos, player_pos = ai.owner.get_component(PositionComponent), player.get_component(PositionComponent)
+    return has_line_of_sight(turn_manager.game_map, pos.x, pos.y, player_pos.x, player_pos.y)
+
+def ai_is_in_pack(ai, distance, turn_manager, player):
+    """The monster's pack has given it a flank whose path reaches it."""
+    path = ai.pack.flanks.get(ai.owner) if ai.pack else None
+    if path is None:
+        return False
+    pos = ai.owner.get_component(PositionComponent)
+    return path.get(pos.x, pos.y) is not None
+
+# The names behaviors.json may use. A new condition or action must be registered here.
+AI_CONDITIONS = {"active": lambda ai, distance, turn_manager, player: ai.state == 'ACTIVE',
+                 "adjacent": lambda ai, distance, turn_manager, player: distance <= 1,
+                 "hesitates": ai_hesitates, "hurt": ai_is_hurt, "clear_shot": ai_has_clear_shot,
+                 "in_pack": ai_is_in_pack}
+AI_ACTIONS = {
+    "attack": lambda ai, distance, turn_manager, player: turn_manager.process_attack(ai.owner, player),
+    "shoot": lambda ai, distance, turn_manager, player: turn_manager.process_attack(ai.owner, player, verb="blasts"),
+    "chase": lambda ai, distance, turn_manager, player: ai.move_towards(player.get_component(PositionComponent),
+                                                                         turn_manager),
+    "flee": lambda ai, distance, turn_manager, player: ai.move_away(player.get_component(PositionComponent),
+                                                                     turn_manager),
+    "close_in": lambda ai, distance, turn_manager, player: ai.move_with_pack(turn_manager),
+    "wander": lambda ai, distance, turn_manager, player: ai.move_randomly(turn_manager),
+    "wait": lambda ai, distance, turn_manager, player: None}
+
+@functools.lru_cache(maxsize=None)
+def compile_behavior(name):
+    """Compiles a BEHAVIORS tree, once per archetype, into (conditions, action) rules of functions."""
+    return tuple((tuple(AI_CONDITIONS[condition] for condition in conditions), AI_ACTIONS[action])
+                 for conditions, action in BEHAVIORS[name])
 
 class StatsComponent(Component):
     """
@@ -905,23 +1060,65 @@ class StatsComponent(Component):
         self.xp_reward = xp_reward # The amount of XP granted when slain.
 
 class InventoryComponent(Component):
-    """Holds a list of entities that are considered items in an inventory."""
+    """Holds the carried item entities in one stack per kind, so counting and taking one are O(1)."""
     def __init__(self):
         super().__init__()
-        self.items = []
+        self.stacks = {}  # Item name -> list of item entities of that kind.
+
+    def clone(self):
+        component = super().clone()
+        component.stacks = {}
+        return component
+
+    def add(self, item):
+        """Puts an item entity onto the stack of its kind."""
+        self.stacks.setdefault(item.get_component(ItemComponent).name, []).append(item)
+
+    def remove(self, item):
+        """Removes a specific item entity (e.g. one being equipped)."""
+        kind = item.get_component(ItemComponent).name
+        stack = self.stacks[kind]
+        stack.remove(item)
+        if not stack:
+            del self.stacks[kind]
+
+    def take_one(self, kind):
+        """Removes and returns one item of the given kind, or None if there is none."""
+        stack = self.stacks.get(kind)
+        item = stack.pop() if stack else None
+        if stack == []:
+            del self.stacks[kind]
+        return item
+
+    def count(self, kind):
+        """Returns how many items of the given kind are carried."""
+        return len(self.stacks.get(kind, ()))
+
+    def equippables(self):
+        """Returns every carried item that can be equipped, grouped by kind."""
+        return [item for stack in self.stacks.values() if stack[0].get_component(EquippableComponent)
+                for item in stack]
 
 class ItemComponent(Component):
     """
     A component for entities that can be picked up and used.
     - use_function: The function to call when the item is used.
     - kwargs: A dictionary of arguments to pass to the use function.
+    - context: Names of game objects (see ITEM_CONTEXT_KEYS) the use function
+               also needs, supplied by Game.use_item at the moment of use.
     """
-    def __init__(self, name: str, use_function: Callable = None, kwargs: Dict[str, Any] = None):
+    def __init__(self, name: str, use_function: Callable = None, kwargs: Dict[str, Any] = None, context=()):
         super().__init__()
         self.name = name
         self.use_function = use_function
         # Store any additional data the use_function might need.
         self.kwargs = kwargs if kwargs is not None else {}
+        self.context = context
+
+    def clone(self):
+        component = super().clone()
+        component.kwargs = dict(self.kwargs)
+        return component
 
 class ExperienceComponent(Component):
     """
@@ -957,6 +1154,11 @@ class EquipmentComponent(Component):
             "armor": None
         }
 
+    def clone(self):
+        component = super().clone()
+        component.slots = dict(self.slots)
+        return component
+
 # noinspection SpellCheckingInspection
 class EquippableComponent(Component):
     # noinspection SpellCheckingInspection
@@ -983,8 +1185,6 @@ class VampireComponent(Component):
     - Function: Acts as a unique flag for the game's systems to query.
     - Effect: Creates a unique, identifiable boss entity.
     """
-    def __init__(self):
-        super().__init__()
 
 class DialogueComponent(Component):
     """
@@ -1003,15 +1203,17 @@ class DialogueComponent(Component):
         self.has_spoken = False
 
 class StairsComponent(Component):
-    """A marker component for an entity that acts as stairs to the next level."""
-    def __init__(self):
+    """Marks an entity as stairs. A direction of 1 leads down a level, -1 leads back up."""
+    def __init__(self, direction=1):
         super().__init__()
+        self.direction = direction
 
 class Entity:
     """A generic container for components. Represents any object in the game."""
 
-    def __init__(self):
+    def __init__(self, archetype=None):
         self.components = {}
+        self.archetype = archetype  # The ENTITY_DATA or ITEM_DATA key it was built from, if any.
 
     def add_component(self, component):
         """Adds a component to the entity and sets its owner."""
@@ -1022,53 +1224,276 @@ class Entity:
         """Retrieves a component of a specific type from the entity."""
         return self.components.get(component_type)
 
+    def _equipment_bonus(self, bonus):
+        """Sums one bonus attribute (e.g. "power_bonus") over the equippable items worn."""
+        equipment = self.get_component(EquipmentComponent)
+        if not equipment:
+            return 0
+        # noinspection SpellCheckingInspection
+        equippables = (item.get_component(EquippableComponent) for item in equipment.slots.values() if item)
+        return sum(getattr(equippable, bonus) for equippable in equippables if equippable)
+
     def get_max_hp(self):
         """Calculates the entity's total max HP, including bonuses from equipment."""
-        base_hp = self.get_component(StatsComponent).max_hp
-
-        equipment = self.get_component(EquipmentComponent)
-        if equipment:
-            for item in equipment.slots.values():
-                if item:
-                    # noinspection SpellCheckingInspection
-                    equippable = item.get_component(EquippableComponent)
-                    if equippable:
-                        base_hp += equippable.max_hp_bonus
-        return base_hp
+        return self.get_component(StatsComponent).max_hp + self._equipment_bonus("max_hp_bonus")
 
     def get_power(self):
         """Calculates the entity's total power, including bonuses from equipment."""
-        base_power = self.get_component(StatsComponent).power
-
-        equipment = self.get_component(EquipmentComponent)
-        if equipment:
-            for item in equipment.slots.values():
-                if item:
-                    # noinspection SpellCheckingInspection
-                    equippable = item.get_component(EquippableComponent)
-                    if equippable:
-                        base_power += equippable.power_bonus
-        return base_power
+        return self.get_component(StatsComponent).power + self._equipment_bonus("power_bonus")
 
     def get_defense(self):
         """Calculates the entity's total defense, including bonuses from equipment."""
-        base_defense = self.get_component(StatsComponent).defense
+        return self.get_component(StatsComponent).defense + self._equipment_bonus("defense_bonus")
+
+class Prefab:
+    """A built template entity that new instances are stamped out from, one component copy each."""
+    def __init__(self, template):
+        # (type, template component, whether the plain shallow copy suffices) per component.
+        self.components = tuple((component_type, component, type(component).clone is Component.clone)
+                                for component_type, component in template.components.items())
+        self.archetype = template.archetype
+
+    def spawn(self, x, y):
+        """Creates a new, independent entity from the template at (x, y)."""
+        entity = Entity(self.archetype)
+        # add_component and the plain copy are inlined, as this runs for every spawned entity.
+        components = entity.components
+        for component_type, template_component, plain_copy in self.components:
+            if plain_copy:
+                component = object.__new__(component_type)
+                component.__dict__ = template_component.__dict__.copy()
+            else:
+                component = template_component.clone()
+            component.owner = entity
+            components[component_type] = component
+        position = components[PositionComponent]
+        position.x, position.y = x, y
+        return entity
+
+def build_monster(name):
+    """Builds a monster template entity from its compiled blueprint in ENTITY_DATA."""
+    data = ENTITY_DATA[name]
+    monster = Entity(name)
+    monster.add_component(PositionComponent(0, 0))
+    monster.add_component(RenderComponent(data["char"], data["color"]))
+    monster.add_component(StatsComponent(**data["stats"]))
+    monster.add_component(AIComponent(**data["ai"]))
+    if data["vampire"]:
+        monster.add_component(VampireComponent())
+    monster.add_component(TurnTakerComponent())
+    if data["dialogue"]:
+        monster.add_component(DialogueComponent(**data["dialogue"]))
+    return monster
+
+def build_item(name):
+    """Builds an item template entity from its compiled blueprint in ITEM_DATA."""
+    data = ITEM_DATA[name]
+    item = Entity(name)
+    item.add_component(PositionComponent(0, 0))
+    item.add_component(RenderComponent(data["char"], data["color"]))
+    item.add_component(ItemComponent(name=data["name"], use_function=ITEM_FUNCTIONS.get(data["use_function"]),
+                                     kwargs=dict(data["kwargs"]), context=data["context"]))
+    if data["equip"]:
+        item.add_component(EquippableComponent(**data["equip"]))
+    return item
+
+class PrefabLibrary:
+    """Builds each archetype's Prefab on first use and keeps it for later spawns."""
+    BUILDERS = {"monster": build_monster, "item": build_item}
 
-        equipment = self.get_component(EquipmentComponent)
-        if equipment:
-            for item in equipment.slots.values():
-                if item:
-                    # noinspection SpellCheckingInspection
-                    equippable = item.get_component(EquippableComponent)
-                    if equippable:
-                        base_defense += equippable.defense_bonus
-        return base_defense
+    def __init__(self):
+        self.prefabs = {}  # (kind, name) -> Prefab
+
+    def get(self, kind, name):
+        """Returns the Prefab for a "monster" or "item" archetype, building it if needed."""
+        if (kind, name) not in self.prefabs:
+            self.prefabs[(kind, name)] = Prefab(self.BUILDERS[kind](name))
+        return self.prefabs[(kind, name)]
+
+    def spawn(self, kind, name, x, y):
+        """Creates a new entity of the given archetype at (x, y)."""
+        return self.get(kind, name).spawn(x, y)
+
+prefabs = PrefabLibrary() # The single, shared prefab library.
 
 # ==============================================================================
 # VII. Game World (Principle: Scalability)
 # ==============================================================================
 
-class ProceduralCaveGenerator:
+class MapGenerator:
+    """The named layout backends in MAP_GENERATORS: generate_map(width, height) -> rows of '#', '.' and ','."""
+    # Random-walk steps, and the WFC tileset as (pattern, weight) with sockets mid-edge.
+    STEPS = [(0, -1), (0, 1), (-1, 0), (1, 0)]
+    TILESET = [
+        ("###" "###" "###", 6),  # Solid rock
+        ("#.#" "#.#" "#.#", 3), ("###" "..." "###", 3),  # Straight corridors
+        ("#.#" "#.." "###", 2), ("#.#" "..#" "###", 2), ("###" "#.." "#.#", 2), ("###" "..#" "#.#", 2),  # Corners
+        ("#.#" "..." "###", 2), ("###" "..." "#.#", 2), ("#.#" "#.." "#.#", 2), ("#.#" "..#" "#.#", 2),  # Junctions
+        ("#.#" "..." "#.#", 1), ("..." "..." "...", 3),  # Crossing and hall
+        ("#.#" "#.#" "###", 1), ("###" "#.#" "#.#", 1), ("###" "#.." "###", 1), ("###" "..#" "###", 1),  # Dead ends
+    ]
+    # (dx, dy, index of this side's socket tile, index of the facing side's socket tile)
+    SIDES = [(0, -1, 1, 7), (1, 0, 5, 3), (0, 1, 7, 1), (-1, 0, 3, 5)]
+
+    @staticmethod
+    def carve(tiles, x1, y1, x2, y2):
+        """Turns the rectangle between two corners (inclusive) into floor."""
+        for y in range(min(y1, y2), max(y1, y2) + 1):
+            for x in range(min(x1, x2), max(x1, x2) + 1):
+                tiles[y][x] = '.'
+
+    @staticmethod
+    def scatter_rubble(tiles):
+        """Turns a small share of the floor tiles into cosmetic rubble."""
+        for row in tiles:
+            for x, tile in enumerate(row):
+                if tile == '.' and random.randint(1, 100) <= PROCGEN_RUBBLE_CHANCE:
+                    row[x] = ','
+
+    @staticmethod
+    def keep_largest_region(tiles):
+        """Walls off every floor region but the largest, so nothing spawns where the player cannot reach."""
+        height, width = len(tiles), len(tiles[0])
+        seen = [[False] * width for _ in range(height)]
+        regions = []
+        for start_y in range(height):
+            for start_x in range(width):
+                if seen[start_y][start_x] or tiles[start_y][start_x] == '#':
+                    continue
+                seen[start_y][start_x] = True
+                region = [(start_x, start_y)]
+                for x, y in region:  # The list grows while it is walked: a breadth-first fill.
+                    for nx, ny in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+                        if 0 <= nx < width and 0 <= ny < height and not seen[ny][nx] and tiles[ny][nx] != '#':
+                            seen[ny][nx] = True
+                            region.append((nx, ny))
+                regions.append(region)
+        regions.sort(key=len)
+        for region in regions[:-1]:
+            for x, y in region:
+                tiles[y][x] = '#'
+        return tiles
+
+    @staticmethod
+    def generate_rooms(width, height):
+        """Room-and-corridor levels: BSP leaves each get a room, and every split's halves are joined."""
+        tiles = [['#'] * width for _ in range(height)]
+
+        def build(x, y, w, h):
+            """Fills the leaf (x, y, w, h) and returns a floor tile inside it."""
+            can_split_x, can_split_y = w >= 2 * BSP_MIN_LEAF, h >= 2 * BSP_MIN_LEAF
+            if not (can_split_x or can_split_y):
+                room_w = random.randint(BSP_MIN_ROOM, w - 2)
+                room_h = random.randint(BSP_MIN_ROOM, h - 2)
+                room_x = random.randint(x + 1, x + w - room_w - 1)
+                room_y = random.randint(y + 1, y + h - room_h - 1)
+                MapGenerator.carve(tiles, room_x, room_y, room_x + room_w - 1, room_y + room_h - 1)
+                return room_x + room_w // 2, room_y + room_h // 2
+            # Split across the longer side, so leaves stay roughly square.
+            if can_split_x and (w >= h or not can_split_y):
+                cut = random.randint(BSP_MIN_LEAF, w - BSP_MIN_LEAF)
+                first, second = build(x, y, cut, h), build(x + cut, y, w - cut, h)
+            else:
+                cut = random.randint(BSP_MIN_LEAF, h - BSP_MIN_LEAF)
+                first, second = build(x, y, w, cut), build(x, y + cut, w, h - cut)
+            MapGenerator.carve(tiles, first[0], first[1], second[0], first[1])
+            MapGenerator.carve(tiles, second[0], first[1], second[0], second[1])
+            return random.choice((first, second))
+        build(0, 0, width, height)
+        MapGenerator.scatter_rubble(tiles)
+        return tiles
+
+    @staticmethod
+    def generate_drunkard(width, height):
+        """Winding tunnels from a random walk that restarts every DRUNKARD_WALK_LENGTH steps on carved floor."""
+        tiles = [['#'] * width for _ in range(height)]
+        x, y = width // 2, height // 2
+        tiles[y][x] = '.'
+        carved = [(x, y)]
+        target = int((width - 2) * (height - 2) * DRUNKARD_FLOOR_FRACTION)
+        steps = 0
+        while len(carved) < target:
+            steps += 1
+            if steps % DRUNKARD_WALK_LENGTH == 0:
+                x, y = random.choice(carved)
+            dx, dy = random.choice(MapGenerator.STEPS)
+            # The walker never carves the outermost ring, keeping the border solid.
+            x, y = min(max(x + dx, 1), width - 2), min(max(y + dy, 1), height - 2)
+            if tiles[y][x] == '#':
+                tiles[y][x] = '.'
+                carved.append((x, y))
+        MapGenerator.scatter_rubble(tiles)
+        return tiles
+
+    @staticmethod
+    def generate_wfc(width, height):
+        """Corridor-and-hall mazes from the 3x3 TILESET by wave function collapse (every socket combination exists)."""
+        tileset, sides = MapGenerator.TILESET, MapGenerator.SIDES
+        cols, rows = width // 3, height // 3
+        everything = (1 << len(tileset)) - 1
+        # compatible[side][m]: the modules that may sit on that side of module m.
+        compatible = [[sum(1 << n for n, (other, _) in enumerate(tileset) if other[theirs] == pattern[mine])
+                       for pattern, _ in tileset] for _, _, mine, theirs in sides]
+        closed = [sum(1 << m for m, (pattern, _) in enumerate(tileset) if pattern[mine] == '#')
+                  for _, _, mine, _ in sides]
+        wave = []  # Cells on the edge of the grid must be closed towards the outside.
+        for cy in range(rows):
+            for cx in range(cols):
+                options = everything
+                for side, (dx, dy, _, _) in enumerate(sides):
+                    if not (0 <= cx + dx < cols and 0 <= cy + dy < rows):
+                        options &= closed[side]
+                wave.append(options)
+        heap = [(options.bit_count(), random.random(), i) for i, options in enumerate(wave)]
+        heapq.heapify(heap)
+        while heap:
+            count, _, i = heapq.heappop(heap)
+            if count != wave[i].bit_count() or count == 1:
+                continue  # A stale entry, or a cell its neighbours have already decided.
+            options = [m for m in range(len(tileset)) if wave[i] >> m & 1]
+            wave[i] = 1 << random.choices(options, weights=[tileset[m][1] for m in options])[0]
+            # Propagate: narrow the neighbours, and theirs in turn, until nothing changes.
+            stack = [i]
+            while stack:
+                j = stack.pop()
+                allowed_by = [0, 0, 0, 0]
+                for m in range(len(tileset)):
+                    if wave[j] >> m & 1:
+                        for side in range(4):
+                            allowed_by[side] |= compatible[side][m]
+                cx, cy = j % cols, j // cols
+                for side, (dx, dy, _, _) in enumerate(sides):
+                    if 0 <= cx + dx < cols and 0 <= cy + dy < rows:
+                        k = j + dy * cols + dx
+                        narrowed = wave[k] & allowed_by[side]
+                        if narrowed != wave[k]:
+                            wave[k] = narrowed
+                            stack.append(k)
+                            heapq.heappush(heap, (narrowed.bit_count(), random.random(), k))
+        # Stamp the modules; any leftover strip at the right or bottom edge stays rock.
+        tiles = [['#'] * width for _ in range(height)]
+        for i, options in enumerate(wave):
+            pattern = tileset[options.bit_length() - 1][0]
+            left, top = i % cols * 3, i // cols * 3
+            for y in range(3):
+                tiles[top + y][left:left + 3] = pattern[y * 3:y * 3 + 3]
+        MapGenerator.scatter_rubble(tiles)
+        return tiles
+
+    @staticmethod
+    def generate_arena(width, height):
+        """The boss level: caves with the Vampire Lord's arena carved in the centre and joined to the largest cave."""
+        tiles = MapGenerator.keep_largest_region(ProceduralCaveGenerator.generate_map(width, height))
+        cx, cy = width // 2, height // 2
+        floor_x, floor_y = min(((x, y) for y, row in enumerate(tiles) for x, tile in enumerate(row) if tile != '#'),
+                               key=lambda tile: abs(tile[0] - cx) + abs(tile[1] - cy))
+        MapGenerator.carve(tiles, cx, cy, floor_x, cy)
+        MapGenerator.carve(tiles, floor_x, cy, floor_x, floor_y)
+        MapGenerator.carve(tiles, cx - VAMPIRE_ARENA_RADIUS, cy - VAMPIRE_ARENA_RADIUS,
+                           cx + VAMPIRE_ARENA_RADIUS, cy + VAMPIRE_SPAWN_OFFSET_Y + 1)
+        return tiles
+
+class ProceduralCaveGenerator(MapGenerator):
     """
     Handles the creation of organic cave-like maps using a Cellular Automata algorithm.
     This method works by treating each tile as a "cell" that can be either alive (a wall)
@@ -1088,13 +1513,9 @@ class ProceduralCaveGenerator:
         wall_count = 0
         for i in range(y - 1, y + 2):
             for j in range(x - 1, x + 2):
-                # This checks if the neighbor is outside the map's boundaries.
-                if i < 0 or i >= len(tiles) or j < 0 or j >= len(tiles[0]):
-                    # Treating out-of-bounds areas as walls is a crucial step.
-                    # It ensures that the caves are always fully enclosed by the map edge.
-                    wall_count += 1
-                # This checks if the neighbor is a wall tile, ignoring the center cell itself.
-                elif (i, j) != (y, x) and tiles[i][j] == '#':
+                # Out-of-bounds counts as wall, so the caves are always enclosed by the map edge.
+                if i < 0 or i >= len(tiles) or j < 0 or j >= len(tiles[0]) or \
+                        ((i, j) != (y, x) and tiles[i][j] == '#'):
                     wall_count += 1
         return wall_count
 
@@ -1109,67 +1530,102 @@ class ProceduralCaveGenerator:
         """
         width, height = len(old_tiles[0]), len(old_tiles)
         new_tiles = [['.' for _ in range(width)] for _ in range(height)]
-
         for y in range(height):
             for x in range(width):
-                # Get the sensory input for the current cell.
+                # The core rule: more than 4 wall neighbours makes a wall, otherwise a floor. Applied
+                # to all cells at once, isolated walls disappear and open spaces are carved into caves.
                 wall_neighbors = ProceduralCaveGenerator._get_neighbor_wall_count(x, y, old_tiles)
-
-                # --- The Core Rule of the Automaton ---
-                # If a cell has more than 4 wall neighbors, it becomes a wall.
-                # If it has 4 or fewer, it becomes a floor. This simple rule, when applied
-                # to all cells at once, causes isolated walls to disappear and open
-                # spaces to be carved out, forming caves.
-                if wall_neighbors > 4:
-                    new_tiles[y][x] = '#'
-                else:
-                    new_tiles[y][x] = '.'
+                new_tiles[y][x] = '#' if wall_neighbors > 4 else '.'
         return new_tiles
 
     @staticmethod
-    def generate_map(width, height):
+    def noise(seed, x, y):
+        """Returns 0-99 from an integer hash of the seed and coordinates, so every chunk rolls a tile the same."""
+        h = (x * 0x9E3779B1 + y * 0x85EBCA77 + seed * 0xC2B2AE3D) & 0xFFFFFFFF
+        h = ((h ^ (h >> 15)) * 0x2C1B3C6D) & 0xFFFFFFFF
+        h = ((h ^ (h >> 12)) * 0x297A2D39) & 0xFFFFFFFF
+        return (h ^ (h >> 15)) % 100
+
+    @staticmethod
+    def generate_chunk(seed, chunk_x, chunk_y, size):
+        """Generates one seamless chunk of an endless cave, simulating a halo one tile wide per step around it."""
+        halo = PROCGEN_SIMULATION_STEPS
+        left, top = chunk_x * size - halo, chunk_y * size - halo
+        span = size + 2 * halo
+        tiles = [['#' if ProceduralCaveGenerator.noise(seed, left + x, top + y) < PROCGEN_INITIAL_WALL_CHANCE else '.'
+                  for x in range(span)] for y in range(span)]
+        for _ in range(PROCGEN_SIMULATION_STEPS):
+            tiles = ProceduralCaveGenerator._simulation_step(tiles)
+        rubble_seed = seed ^ 0x5BD1E995
+        rows = [row[halo:halo + size] for row in tiles[halo:halo + size]]
+        for y, row in enumerate(rows):
+            for x, tile in enumerate(row):
+                if tile == '.' and ProceduralCaveGenerator.noise(rubble_seed, left + halo + x,
+                                                                 top + halo + y) < PROCGEN_RUBBLE_CHANCE:
+                    row[x] = ','
+        return rows
+
+    @staticmethod
+    def simulate_band(rows, top_halo, bottom_halo):
+        """Runs every simulation step on one band of rows (a process pool job); rows travel as strings."""
+        tiles = [list(row) for row in rows]
+        for _ in range(PROCGEN_SIMULATION_STEPS):
+            tiles = ProceduralCaveGenerator._simulation_step(tiles)
+        return ["".join(row) for row in tiles[top_halo:len(tiles) - bottom_halo]]
+
+    @staticmethod
+    def simulate_parallel(tiles, workers):
+        """Runs the simulation in bands across a process pool, each borrowing a halo of rows, with serial output."""
+        height, halo = len(tiles), PROCGEN_SIMULATION_STEPS
+        rows = ["".join(row) for row in tiles]
+        bounds = [height * i // workers for i in range(workers + 1)]
+        jobs = []
+        for start, end in zip(bounds, bounds[1:]):
+            top, bottom = max(0, start - halo), min(height, end + halo)
+            jobs.append((rows[top:bottom], start - top, bottom - end))
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            bands = pool.map(ProceduralCaveGenerator.simulate_band, *zip(*jobs))
+            return [list(row) for band in bands for row in band]
+
+    @staticmethod
+    def generate_map(width, height, workers=None):
         """
         Generates a complete and playable cave map by orchestrating the entire process.
+        Maps of PROCGEN_PARALLEL_MIN_CELLS or more are simulated on every core
+        unless `workers` says otherwise; the result is the same either way.
         """
-        # --- Step 1: Create Initial Random Noise ---
-        # The map is seeded with a random pattern of walls and floors. This provides
-        # the chaotic starting conditions from which order will emerge. A 45% wall
-        # chance is a well-tested value that produces good results.
+        # --- Step 1: Seed random noise, the chaotic start from which order emerges ---
         tiles = [['.' for _ in range(width)] for _ in range(height)]
         for y in range(height):
             for x in range(width):
                 if random.randint(1, 100) < PROCGEN_INITIAL_WALL_CHANCE:  # Use constant
                     tiles[y][x] = '#'
-
-        # --- Step 2: Run the Simulation to Form Caves ---
-        # The simulation step is run multiple times. Each run smooths the noise
-        # further, connecting walls and opening up caverns. 4-5 iterations is
-        # typically enough to achieve a stable, organic-looking result.
-        for _ in range(PROCGEN_SIMULATION_STEPS):  # Use constant
-            tiles = ProceduralCaveGenerator._simulation_step(tiles)
-
-        # --- Step 3: Enforce a Solid Border ---
-        # To ensure the player can never leave the map area, we manually turn all
-        # tiles at the edges of the map into walls, guaranteeing a sealed level.
-        for y in range(height):
-            tiles[y][0] = '#'
-            tiles[y][width - 1] = '#'
-        for x in range(width):
-            tiles[0][x] = '#'
-            tiles[height - 1][x] = '#'
-
-        # --- Step 4: Add Cosmetic Floor Texture ---
-        # To make the caves feel more natural and less uniform, we iterate through
-        # the final floor tiles and give a small percentage of them a different
-        # character, representing rubble or debris.
-        for y in range(height):
-            for x in range(width):
-                if tiles[y][x] == '.':
-                    if random.randint(1, 100) <= PROCGEN_RUBBLE_CHANCE:  # Use constant
-                        tiles[y][x] = ','
-
+        # --- Step 2: Smooth the noise into caverns, one simulation step at a time ---
+        if workers is None:
+            workers = (os.cpu_count() or 1) if width * height >= PROCGEN_PARALLEL_MIN_CELLS else 1
+        # Each band needs more rows of its own than it borrows from its neighbours.
+        workers = min(workers, height // (2 * PROCGEN_SIMULATION_STEPS) or 1)
+        if workers > 1:
+            tiles = ProceduralCaveGenerator.simulate_parallel(tiles, workers)
+        else:
+            for _ in range(PROCGEN_SIMULATION_STEPS):  # Use constant
+                tiles = ProceduralCaveGenerator._simulation_step(tiles)
+        # --- Step 3: Seal the Border and Scatter Rubble ---
+        for row in tiles:
+            row[0] = row[width - 1] = '#'
+        tiles[0] = ['#'] * width
+        tiles[height - 1] = ['#'] * width
+        MapGenerator.scatter_rubble(tiles)
         return tiles
 
+MAP_GENERATORS = {
+    "caves": ProceduralCaveGenerator.generate_map,
+    "rooms": MapGenerator.generate_rooms,
+    "drunkard": MapGenerator.generate_drunkard,
+    "wfc": MapGenerator.generate_wfc,
+    "arena": MapGenerator.generate_arena,
+}
+
 class Map:
     """
     Manages the game map, including its tiles and rendering.
@@ -1178,17 +1634,53 @@ class Map:
     - Effect: A visible, static game world is created on screen.
     """
 
-    def __init__(self, width, height):
+    def __init__(self, width, height, generator="caves"):
         self.width = width
         self.height = height
-        self.tiles = ProceduralCaveGenerator.generate_map(self.width, self.height)
+        self.generator = generator
+        self.tiles = MapGenerator.keep_largest_region(MAP_GENERATORS[generator](self.width, self.height))
         self.spawn_point = self.find_spawn_point()
+        self.render_layer = None  # The pre-rendered map surface, created by bake().
+        self.glyphs = {}  # Tile character -> rendered glyph, kept by bake() for later re-bakes.
+        self.changed_tiles = []  # Tiles changed since the last frame, for the dirty-region tracker.
+        self.indexes = []  # Derived indexes (DistanceMap, RegionIndex) told about every tile change.
         self.tile_colors = {
             '#': COLOR_DARK_BROWN,
             '.': COLOR_DARK_GREY,
             ',': COLOR_DARKER_BROWN
         }
 
+    def bake(self, font):
+        """Pre-renders every tile of the level onto one surface, so drawing the map is a single blit."""
+        self.render_layer = pygame.Surface((self.width * TILE_SIZE, self.height * TILE_SIZE))
+        self.render_layer.fill(COLOR_MEDIUM_BROWN)
+        self.font = font
+        glyphs = self.glyphs = {}  # Each distinct tile character is rendered only once.
+        for y, row in enumerate(self.tiles):
+            for x, tile_char in enumerate(row):
+                glyph = glyphs.get(tile_char)
+                if glyph is None:
+                    color = self.tile_colors.get(tile_char, COLOR_WHITE)
+                    glyph = glyphs[tile_char] = font.render(tile_char, True, color)
+                self.render_layer.blit(glyph, (x * TILE_SIZE, y * TILE_SIZE))
+
+    def set_tile(self, x, y, tile):
+        """Changes one tile, re-baking its square and telling the dirty tracker and any affected index."""
+        old_tile = self.tiles[y][x]
+        if old_tile == tile:
+            return
+        self.tiles[y][x] = tile
+        if self.render_layer is not None:
+            glyph = self.glyphs.get(tile)
+            if glyph is None:
+                glyph = self.glyphs[tile] = self.font.render(tile, True, self.tile_colors.get(tile, COLOR_WHITE))
+            self.render_layer.fill(COLOR_MEDIUM_BROWN, (x * TILE_SIZE, y * TILE_SIZE, TILE_SIZE, TILE_SIZE))
+            self.render_layer.blit(glyph, (x * TILE_SIZE, y * TILE_SIZE))
+        self.changed_tiles.append((x, y))
+        if (old_tile == '#') != (tile == '#'):
+            for index in self.indexes:
+                index.tile_changed(x, y)
+
     def find_spawn_point(self):
         """Finds the first available floor tile, searching outwards from the center."""
         center_x, center_y = self.width // 2, self.height // 2
@@ -1208,6 +1700,292 @@ class Map:
             return False
         return self.tiles[y][x] != '#'
 
+    def floor_tiles(self):
+        """Yields the (x, y) of every tile that is not a wall, row by row."""
+        for y, row in enumerate(self.tiles):
+            for x, tile in enumerate(row):
+                if tile != '#':
+                    yield x, y
+
+    def draw(self, surface, camera):
+        """Blits the pre-rendered map at the camera's offset."""
+        surface.blit(self.render_layer, camera.rect.topleft)
+
+    def stream(self, focus_points):
+        """A bounded map is always fully loaded; see ChunkedMap.stream."""
+
+class ChunkedMap:
+    """An endless --endless cave with Map's interface, streamed in CHUNK_SIZE chunks evicted to disk."""
+    def __init__(self, seed):
+        self.seed = seed
+        self.chunks = {}  # (chunk_x, chunk_y) -> rows of tiles, oldest first.
+        self.surfaces = {}  # (chunk_x, chunk_y) -> pre-rendered chunk, oldest first.
+        self.font = None
+        self.changed_tiles = []
+        self.indexes = []
+        self.cache_dir = get_user_data_dir() / CHUNK_CACHE_DIR / f"{seed:08x}"
+        self.cache_stats = CacheStats("Map chunks")  # Hits are chunks read back from disk.
+        self.tile_colors = {
+            '#': COLOR_DARK_BROWN,
+            '.': COLOR_DARK_GREY,
+            ',': COLOR_DARKER_BROWN
+        }
+        self.spawn_point = self.find_spawn_point()
+
+    @staticmethod
+    def clear_disk_cache():
+        """Deletes every evicted chunk; called when a new game starts."""
+        shutil.rmtree(get_user_data_dir() / CHUNK_CACHE_DIR, ignore_errors=True)
+
+    def chunk_path(self, chunk_x, chunk_y):
+        return self.cache_dir / f"{chunk_x}_{chunk_y}.bin"
+
+    def load_chunk(self, chunk_x, chunk_y):
+        """Brings a chunk into memory from disk, or generates it if it was never evicted."""
+        path = self.chunk_path(chunk_x, chunk_y)
+        if path.exists():
+            self.cache_stats.hit()
+            rows = marshal.loads(path.read_bytes())
+        else:
+            self.cache_stats.miss()
+            rows = ProceduralCaveGenerator.generate_chunk(self.seed, chunk_x, chunk_y, CHUNK_SIZE)
+        self.chunks[(chunk_x, chunk_y)] = rows
+        return rows
+
+    def evict_chunk(self, key):
+        """Writes a chunk to disk and drops it (and its surface) from memory."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.chunk_path(*key).write_bytes(marshal.dumps(self.chunks.pop(key)))
+        self.surfaces.pop(key, None)
+
+    def tile(self, x, y):
+        """Returns the tile character at world coordinates, loading its chunk if needed."""
+        chunk_x, local_x = divmod(x, CHUNK_SIZE)
+        chunk_y, local_y = divmod(y, CHUNK_SIZE)
+        rows = self.chunks.get((chunk_x, chunk_y)) or self.load_chunk(chunk_x, chunk_y)
+        return rows[local_y][local_x]
+
+    def is_walkable(self, x, y):
+        """Checks if a given tile is walkable (i.e., not a wall). Every coordinate is on the map."""
+        return self.tile(x, y) != '#'
+
+    def set_tile(self, x, y, tile):
+        """Changes one tile as Map.set_tile does; the chunk re-renders on use and its change survives eviction."""
+        old_tile = self.tile(x, y)
+        if old_tile == tile:
+            return
+        chunk_x, local_x = divmod(x, CHUNK_SIZE)
+        chunk_y, local_y = divmod(y, CHUNK_SIZE)
+        self.chunks[(chunk_x, chunk_y)][local_y][local_x] = tile
+        self.surfaces.pop((chunk_x, chunk_y), None)
+        self.changed_tiles.append((x, y))
+        if (old_tile == '#') != (tile == '#'):
+            for index in self.indexes:
+                index.tile_changed(x, y)
+
+    def find_spawn_point(self):
+        """Finds the floor tile nearest the middle of the level's starting area."""
+        center_x, center_y = MAP_WIDTH // 2, MAP_HEIGHT // 2
+        for radius in range(max(center_x, center_y)):
+            for i in range(-radius, radius + 1):
+                for j in range(-radius, radius + 1):
+                    if self.tile(center_x + j, center_y + i) == '.':
+                        return center_x + j, center_y + i
+        return None
+
+    def floor_tiles(self):
+        """Yields the (x, y) of every non-wall tile in the loaded chunks."""
+        for (chunk_x, chunk_y), rows in list(self.chunks.items()):
+            for y, row in enumerate(rows):
+                for x, tile in enumerate(row):
+                    if tile != '#':
+                        yield chunk_x * CHUNK_SIZE + x, chunk_y * CHUNK_SIZE + y
+
+    def stream(self, focus_points):
+        """Loads the chunks near each (x, y) focus point and evicts the oldest others down to CHUNK_CACHE_LIMIT."""
+        wanted = set()
+        for x, y in focus_points:
+            focus_x, focus_y = x // CHUNK_SIZE, y // CHUNK_SIZE
+            for chunk_y in range(focus_y - CHUNK_STREAM_RADIUS, focus_y + CHUNK_STREAM_RADIUS + 1):
+                for chunk_x in range(focus_x - CHUNK_STREAM_RADIUS, focus_x + CHUNK_STREAM_RADIUS + 1):
+                    wanted.add((chunk_x, chunk_y))
+        for key in wanted:
+            if key not in self.chunks:
+                self.load_chunk(*key)
+        for key in [key for key in self.chunks if key not in wanted][:max(0, len(self.chunks) - CHUNK_CACHE_LIMIT)]:
+            self.evict_chunk(key)
+
+    def bake(self, font):
+        """Remembers the tile font; chunks are pre-rendered lazily as they come on screen."""
+        self.font = font
+        self.surfaces.clear()
+
+    def chunk_surface(self, key):
+        """Returns the pre-rendered surface of a chunk, rendering it on first use."""
+        surface = self.surfaces.pop(key, None)
+        if surface is None:
+            if len(self.surfaces) >= CHUNK_SURFACE_LIMIT:
+                del self.surfaces[next(iter(self.surfaces))]
+            rows = self.chunks.get(key) or self.load_chunk(*key)
+            surface = pygame.Surface((CHUNK_SIZE * TILE_SIZE, CHUNK_SIZE * TILE_SIZE))
+            surface.fill(COLOR_MEDIUM_BROWN)
+            glyphs = {}
+            for y, row in enumerate(rows):
+                for x, tile_char in enumerate(row):
+                    glyph = glyphs.get(tile_char)
+                    if glyph is None:
+                        glyph = glyphs[tile_char] = self.font.render(tile_char, True,
+                                                                     self.tile_colors.get(tile_char, COLOR_WHITE))
+                    surface.blit(glyph, (x * TILE_SIZE, y * TILE_SIZE))
+        self.surfaces[key] = surface  # Re-inserted, so the least recently drawn is evicted first.
+        return surface
+
+    def draw(self, surface, camera):
+        """Blits the pre-rendered chunks that overlap the camera's view."""
+        chunk_pixels = CHUNK_SIZE * TILE_SIZE
+        left, top = -camera.rect.x, -camera.rect.y
+        for chunk_y in range(top // chunk_pixels, (top + camera.height) // chunk_pixels + 1):
+            for chunk_x in range(left // chunk_pixels, (left + camera.width) // chunk_pixels + 1):
+                surface.blit(self.chunk_surface((chunk_x, chunk_y)),
+                             (chunk_x * chunk_pixels - left, chunk_y * chunk_pixels - top))
+
+class DistanceMap:
+    """Walking distances to the nearest goal tile by BFS, repaired locally when a tile opens or closes."""
+    STEPS = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+
+    def __init__(self, game_map, goals, limit=None, blocked=()):
+        self.game_map = game_map
+        self.goals = set(goals)
+        self.limit = limit
+        self.blocked = frozenset(blocked)  # Floor tiles paths must go around, as if they were walls.
+        self.distances = {}  # (x, y) -> steps to the nearest goal; unreachable tiles are absent.
+        self.rebuild()
+        game_map.indexes.append(self)
+
+    def release(self):
+        """Stops following the map's changes."""
+        self.game_map.indexes.remove(self)
+
+    def rebuild(self):
+        """Recomputes every distance from scratch."""
+        self.distances = {goal: 0 for goal in self.goals if self.game_map.is_walkable(*goal)}
+        self.relax(list(self.distances))
+
+    def get(self, x, y):
+        """Returns the number of steps from (x, y) to the nearest goal, or None if it is unreachable."""
+        return self.distances.get((x, y))
+
+    def relax(self, frontier):
+        """Spreads shorter distances outwards from the given tiles."""
+        distances, is_walkable, limit, blocked = self.distances, self.game_map.is_walkable, self.limit, self.blocked
+        frontier = deque(sorted(frontier, key=distances.__getitem__))
+        while frontier:
+            x, y = frontier.popleft()
+            distance = distances[(x, y)] + 1
+            if limit is not None and distance > limit:
+                continue
+            for dx, dy in self.STEPS:
+                step = (x + dx, y + dy)
+                if distances.get(step, distance + 1) > distance and is_walkable(*step) and step not in blocked:
+                    distances[step] = distance
+                    frontier.append(step)
+
+    def tile_changed(self, x, y):
+        """Updates the distances after the tile at (x, y) opened or closed."""
+        if (x, y) in self.blocked:
+            return
+        distances = self.distances
+        neighbours = [(x + dx, y + dy) for dx, dy in self.STEPS]
+        if self.game_map.is_walkable(x, y):
+            # An opened tile can only shorten paths: take its best neighbour and spread.
+            known = [distances[n] for n in neighbours if n in distances]
+            if (x, y) in self.goals:
+                distances[(x, y)] = 0
+            elif known and (self.limit is None or min(known) < self.limit):
+                distances[(x, y)] = min(known) + 1
+            else:
+                return
+            self.relax([(x, y)])
+            return
+        distance = distances.pop((x, y), None)
+        if distance is None:
+            return
+        # Clear every tile one step further out than a cleared one: its path may have run through the closed tile.
+        cleared = {(x, y): distance}
+        queue = deque([(x, y)])
+        while queue:
+            cx, cy = queue.popleft()
+            further = cleared[(cx, cy)] + 1
+            for dx, dy in self.STEPS:
+                step = (cx + dx, cy + dy)
+                if distances.get(step) == further:
+                    cleared[step] = distances.pop(step)
+                    queue.append(step)
+        border = {(cx + dx, cy + dy) for cx, cy in cleared for dx, dy in self.STEPS} & distances.keys()
+        self.relax(border)
+
+class RegionIndex:
+    """Labels the connected floor regions of a Map, so connected() is a lookup; changes re-flood locally."""
+    def __init__(self, game_map):
+        self.game_map = game_map
+        self.labels = {}  # (x, y) -> region label.
+        self.regions = {}  # Region label -> set of its tiles.
+        self.next_label = 0
+        for tile in game_map.floor_tiles():
+            if tile not in self.labels:
+                self.fill(tile)
+        game_map.indexes.append(self)
+
+    def release(self):
+        """Stops following the map's changes."""
+        self.game_map.indexes.remove(self)
+
+    def fill(self, start, within=None):
+        """Gives a new label to the region around a tile, optionally staying inside a set of tiles."""
+        label = self.next_label
+        self.next_label += 1
+        region, frontier = {start}, [start]
+        while frontier:
+            x, y = frontier.pop()
+            for step in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+                if step not in region and (step in within if within is not None else self.game_map.is_walkable(*step)):
+                    region.add(step)
+                    frontier.append(step)
+        for tile in region:
+            self.labels[tile] = label
+        self.regions[label] = region
+
+    def connected(self, a, b):
+        """Checks whether a walk exists between two tiles."""
+        label = self.labels.get(a)
+        return label is not None and label == self.labels.get(b)
+
+    def tile_changed(self, x, y):
+        """Updates the regions after the tile at (x, y) opened or closed."""
+        neighbours = [(x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)]
+        if self.game_map.is_walkable(x, y):
+            joined = {self.labels[n] for n in neighbours if n in self.labels}
+            if not joined:
+                self.fill((x, y), within={(x, y)})
+                return
+            largest = max(joined, key=lambda label: len(self.regions[label]))
+            region = self.regions[largest]
+            for label in joined - {largest}:
+                for tile in self.regions.pop(label):
+                    self.labels[tile] = largest
+                    region.add(tile)
+            region.add((x, y))
+            self.labels[(x, y)] = largest
+            return
+        label = self.labels.pop((x, y), None)
+        if label is None:
+            return
+        region = self.regions.pop(label)
+        region.discard((x, y))
+        for n in neighbours:
+            if self.labels.get(n) == label:  # Not yet reached from an earlier neighbour.
+                self.fill(n, within=region)
+
 class Camera:
     """
     Manages the game's viewport.
@@ -1239,6 +2017,106 @@ class Camera:
 # VIII. Dungeon and Turn Management (Principle: Cohesion)
 # ==============================================================================
 
+def profiled(scope):
+    """Marks a method as a RuntimeProfiler scope; while not targeted it costs one attribute check."""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            if not runtime_profiler.active or runtime_profiler.scope != scope:
+                return method(*args, **kwargs)
+            runtime_profiler.enter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                runtime_profiler.leave()
+        return wrapper
+    return decorator
+
+class DungeonLevel:
+    """A level the player has left, with its own RNG and the coarse turns it is owed."""
+    MOVES = [(0, -1), (0, 1), (-1, 0), (1, 0)]
+
+    def __init__(self, depth, game_map, entities, rng=None):
+        self.depth = depth
+        self.game_map = game_map
+        self.entities = entities
+        # The depth's own RNG keeps the frame-rate dependent simulation from disturbing the seeded game.
+        self.rng = rng or random.Random(depth)
+        self.pending_turns = 0
+        self.cursor = 0
+        self.occupied = set()
+        self.movers = []
+
+    def wake(self):
+        """Indexes the population for the coarse simulation. Called when the level is left."""
+        self.occupied = {(pos.x, pos.y) for pos in
+                         (entity.get_component(PositionComponent) for entity in self.entities) if pos}
+        self.movers = [entity for entity in self.entities
+                       if entity.get_component(AIComponent) and not entity.get_component(AIComponent).is_stationary]
+        self.cursor = 0
+
+    def advance(self, deadline):
+        """Continues the current off-screen turn until done or the deadline; True if the turn completed."""
+        rng, game_map, occupied, movers = self.rng, self.game_map, self.occupied, self.movers
+        while self.cursor < len(movers):
+            if time.perf_counter() >= deadline:
+                return False
+            entity = movers[self.cursor]
+            self.cursor += 1
+            entity.get_component(AIComponent).state = 'IDLE'
+            stats = entity.get_component(StatsComponent)
+            if stats and stats.current_hp < stats.max_hp:
+                stats.current_hp += 1
+            pos = entity.get_component(PositionComponent)
+            dx, dy = rng.choice(self.MOVES)
+            next_x, next_y = pos.x + dx, pos.y + dy
+            if game_map.is_walkable(next_x, next_y) and (next_x, next_y) not in occupied:
+                occupied.discard((pos.x, pos.y))
+                occupied.add((next_x, next_y))
+                pos.x, pos.y = next_x, next_y
+        self.cursor = 0
+        return True
+
+class LevelScheduler:
+    """Works off the warm levels' owed coarse turns round-robin within a fixed per-frame budget."""
+    def __init__(self):
+        self.warm = deque(maxlen=WARM_LEVEL_COUNT)
+        self.queue = deque()  # Warm levels that owe turns, in service order.
+
+    def warm_up(self, level):
+        """Makes a just-left level the most recent warm level, cooling the oldest one."""
+        if len(self.warm) == self.warm.maxlen:
+            self.cool(self.warm[-1])
+        level.wake()
+        self.warm.appendleft(level)
+
+    def cool(self, level):
+        """Stops simulating a level (it was re-entered or fell out of the warm set)."""
+        if level in self.warm:
+            self.warm.remove(level)
+        if level in self.queue:
+            self.queue.remove(level)
+        level.pending_turns = 0
+
+    def end_turn(self):
+        """Records one player turn: every warm level owes one more off-screen turn."""
+        for level in self.warm:
+            if level.pending_turns == 0:
+                self.queue.append(level)
+            level.pending_turns = min(level.pending_turns + 1, WARM_LEVEL_MAX_BACKLOG)
+
+    def run(self, budget):
+        """Works off owed turns for up to `budget` seconds."""
+        deadline = time.perf_counter() + budget
+        while self.queue:
+            level = self.queue[0]
+            if not level.advance(deadline):
+                return  # Out of time; the level resumes from its cursor next frame.
+            level.pending_turns -= 1
+            self.queue.popleft()
+            if level.pending_turns:
+                self.queue.append(level)  # Round-robin, so no warm level starves.
+
 class DungeonManager:
     """Manages dungeon levels, progression, and difficulty scaling."""
 
@@ -1246,7 +2124,9 @@ class DungeonManager:
         """Initializes the DungeonManager with a reference to the main Game object."""
         self.game = game_instance
         self.dungeon_level = 1
-
+        self.levels = {}  # Depth -> DungeonLevel, for every level the player has left.
+        self.rngs = {}  # Depth -> the RNG of its off-screen simulation, kept for the whole run.
+        self.scheduler = LevelScheduler()
         # Check for the warp cheat upon creation.
         if "--vampire" in sys.argv:
             self.dungeon_level = 9
@@ -1256,10 +2136,43 @@ class DungeonManager:
 
     def next_level(self):
         """Transitions the game to the next dungeon level."""
-        self.dungeon_level += 1
-        self.game.hud.add_message(f"You descend to level {self.dungeon_level}...", (200, 100, 255))
-        # This will call the method we refactored in Step 1.
-        self.game.generate_new_level()
+        self.game.events.publish(DescendEvent, self.dungeon_level + 1, 1)
+        self.change_level(self.dungeon_level + 1)
+
+    def previous_level(self):
+        """Climbs back up to the level above."""
+        self.game.events.publish(DescendEvent, self.dungeon_level - 1, -1)
+        self.change_level(self.dungeon_level - 1)
+
+    def change_level(self, depth):
+        """Stores the current level and enters another (stored or new), on the stairs leading back."""
+        game = self.game
+        arrival_direction = -1 if depth > self.dungeon_level else 1
+        rng = self.rngs.setdefault(self.dungeon_level, random.Random(self.dungeon_level))
+        left = DungeonLevel(self.dungeon_level, game.game_map,
+                            [entity for entity in game.entities if entity is not game.player], rng)
+        self.levels[self.dungeon_level] = left
+        self.scheduler.warm_up(left)
+        self.dungeon_level = depth
+        level = self.levels.pop(depth, None)
+        if level:
+            self.scheduler.cool(level)
+            game.enter_level(level.game_map, level.entities)
+        else:
+            game.generate_new_level()
+        player_pos = game.player.get_component(PositionComponent)
+        for entity in game.entities:
+            stairs = entity.get_component(StairsComponent)
+            if stairs and stairs.direction == arrival_direction:
+                pos = entity.get_component(PositionComponent)
+                player_pos.x, player_pos.y = pos.x, pos.y
+                break
+
+    def get_map_generator(self):
+        """Returns the name of the map generator backend for the current depth."""
+        if self.dungeon_level == VAMPIRE_LEVEL:
+            return "arena"
+        return MAP_GENERATOR_ROTATION[(self.dungeon_level - 1) % len(MAP_GENERATOR_ROTATION)]
 
     def get_entity_spawn_counts(self):
         """
@@ -1269,29 +2182,119 @@ class DungeonManager:
         - Effect: The game's challenge increases organically and is easily tunable.
         """
         counts = {}
-        # We need to spawn scrolls, daggers, and armor as well, but their spawn
-        # counts are currently handled elsewhere. Let's consolidate.
-        # The keys here must match the keys in the SPAWN_RATES dictionary.
-        items_to_spawn = ["rat", "ghoul", "skeleton", "potion", "scroll", "dagger", "armor"]
+        # Every key of the spawn table is either a monster name or an item's spawn_key.
+        for name, rates in SPAWN_RATES.items():
+            count = math.ceil(rates["base"] + (self.dungeon_level * rates["scaling"]))
+            # Enforce the minimum if specified (e.g. for potions), and never below zero for negative scaling.
+            counts[name] = max(0, rates.get("min", 0), count)
+        return counts
 
-        for name in items_to_spawn:
-            rates = SPAWN_RATES.get(name)
-            if not rates:
-                continue  # Skip if no spawn rate is defined for this name
+# --- Game Events ---
+# The facts the rules publish on the EventBus, with __slots__ in the order publish() takes them.
 
-            count = math.ceil(rates["base"] + (self.dungeon_level * rates["scaling"]))
+class GameEvent:
+    """Base class of the pooled EventBus events; subscribers must not keep one past its batch."""
+    __slots__ = ()
 
-            # Enforce a minimum count if specified (e.g., for potions)
-            min_count = rates.get("min", 0)
-            if count < min_count:
-                count = min_count
+    def fill(self, values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
 
-            # Ensure count doesn't go below zero for items with negative scaling
-            if count < 0:
-                count = 0
+class DamageEvent(GameEvent):
+    """An attack resolved; an amount of 0 means it failed to harm."""
+    __slots__ = ("attacker", "defender", "amount", "verb")
 
-            counts[name] = count
-        return counts
+class DeathEvent(GameEvent):
+    """An entity was slain; xp_reward is what the player gained for it."""
+    __slots__ = ("entity", "xp_reward")
+
+class ExperienceEvent(GameEvent):
+    """An entity gained experience; published before the level-ups it causes."""
+    __slots__ = ("entity", "amount")
+
+class PickupEvent(GameEvent):
+    """An entity picked up an item."""
+    __slots__ = ("entity", "item")
+
+class ItemUseEvent(GameEvent):
+    """An entity used up an item."""
+    __slots__ = ("entity", "item")
+
+class LevelUpEvent(GameEvent):
+    """An entity reached a new experience level."""
+    __slots__ = ("entity", "level")
+
+class DescendEvent(GameEvent):
+    """The player took the stairs to another depth; direction is 1 down, -1 up."""
+    __slots__ = ("depth", "direction")
+
+class EventBus:
+    """Queues published events and, on flush() after each phase, hands each subscriber its types in one batch."""
+    def __init__(self):
+        self.subscribers = []  # (handler, event types), called in subscription order.
+        self.queue = []
+        self.pools = {}  # Event type -> spare instances.
+
+    def subscribe(self, handler, *event_types):
+        """Calls handler(events) at each flush with the queued events of the given types."""
+        self.subscribers.append((handler, event_types))
+
+    def unsubscribe(self, handler):
+        self.subscribers = [subscriber for subscriber in self.subscribers if subscriber[0] != handler]
+
+    def publish(self, event_type, *values):
+        """Queues an event of the given type, filled with its fields in __slots__ order."""
+        pool = self.pools.get(event_type)
+        event = pool.pop() if pool else event_type()
+        event.fill(values)
+        self.queue.append(event)
+
+    def flush(self):
+        """Delivers every queued event to its subscribers, then recycles the event objects."""
+        while self.queue:
+            batch, self.queue = self.queue, []
+            for handler, event_types in self.subscribers:
+                events = [event for event in batch if isinstance(event, event_types)]
+                if events:
+                    handler(events)
+            for event in batch:
+                self.pools.setdefault(type(event), []).append(event)
+
+class Pack:
+    """Monsters hunting together, sharing where the player was last seen and each member's flank."""
+    def __init__(self):
+        self.members = []  # The (entity, AI, position) of each member; the first one leads.
+        self.last_known_player = None  # (x, y) where a member last saw the player.
+        self.flanks = {}  # Member entity -> DistanceMap to its side of the target, for this enemy phase only.
+
+    def observe(self, perceived, player_pos, turn_manager):
+        """Pools the members' perception: one member seeing the player alerts them all."""
+        if any(perceived.get(entity, ai.sight_radius + 1) <= ai.sight_radius for entity, ai, _ in self.members):
+            self.last_known_player = (player_pos.x, player_pos.y)
+            if any(ai.state == 'IDLE' for _, ai, _ in self.members):
+                turn_manager.game.set_combat_state(True)
+            for _, ai, _ in self.members:
+                ai.state = 'ACTIVE'
+                ai.turns_since_player_seen = 0
+        elif all(ai.state == 'IDLE' for _, ai, _ in self.members) or \
+                any((pos.x, pos.y) == self.last_known_player for _, _, pos in self.members):
+            self.last_known_player = None  # The trail has gone cold.
+
+    def plan(self, game_map, path_to):
+        """Gives each member, nearest first, the least crowded open side of the target closest to it."""
+        self.flanks = {}
+        if self.last_known_player is None:
+            return
+        target_x, target_y = self.last_known_player
+        sides = [(target_x + dx, target_y + dy) for dx, dy in DistanceMap.STEPS
+                 if game_map.is_walkable(target_x + dx, target_y + dy)]
+        if not sides:
+            return
+        crowding = dict.fromkeys(sides, 0)
+        for entity, _, pos in sorted(self.members, key=lambda m: abs(m[2].x - target_x) + abs(m[2].y - target_y)):
+            side = min(sides, key=lambda tile: (crowding[tile], abs(tile[0] - pos.x) + abs(tile[1] - pos.y)))
+            crowding[side] += 1
+            self.flanks[entity] = path_to(side, self.last_known_player)
 
 class TurnManager:
     """
@@ -1313,6 +2316,20 @@ class TurnManager:
         self.entities = game_object.entities
         # This creates a list of only the entities that can take a turn.
         self.turn_takers = [e for e in self.entities if e.get_component(TurnTakerComponent)]
+        # The (entity, AI, position) of every monster, for the perception stage.
+        self.perceivers = [(e, e.get_component(AIComponent), e.get_component(PositionComponent))
+                           for e in self.turn_takers
+                           if e.get_component(AIComponent) and e.get_component(PositionComponent)]
+        # The monsters that hunt in packs, and the packs they have formed.
+        self.pack_hunters = [perceiver for perceiver in self.perceivers if perceiver[1].hunts_in_packs]
+        for _, ai, _ in self.pack_hunters:
+            ai.pack = None
+        self.packs = []
+        # The monsters of an enemy phase in progress (None between phases), and how far it has got.
+        self.enemy_phase = None
+        self.phase_cursor = 0
+        self.phase_perceived = {}
+        self.phase_paths = {}
 
     def get_entity_at_location(self, x, y):
         """Checks for and returns an entity at a given location."""
@@ -1323,121 +2340,179 @@ class TurnManager:
         return None
 
     def process_player_turn(self, dx, dy):
-        """Processes the player's intended action, like moving or attacking."""
+        """Processes the player's intended action, then delivers the events it caused."""
+        took_turn = self.resolve_player_action(dx, dy)
+        self.game.events.flush()
+        return took_turn
+
+    def resolve_player_action(self, dx, dy):
+        """Resolves the player's intended action, like moving or attacking."""
         pos = self.player.get_component(PositionComponent)
         if not pos: return False
-
         next_x, next_y = pos.x + dx, pos.y + dy
-
         # Check if the destination is a wall.
         if not self.game_map.is_walkable(next_x, next_y):
             return False
-
         # Check for an entity at the destination.
         target_entity = self.get_entity_at_location(next_x, next_y)
         if target_entity:
-            # First, check if the entity is stairs. If so, do nothing here,
-            # which will allow the movement code below to execute.
+            # Stairs fall through to the movement code below; items are picked up.
             if target_entity.get_component(StairsComponent):
                 pass
-            # Next, check if the entity is an item to be picked up.
             elif target_entity.get_component(ItemComponent):
                 inventory = self.player.get_component(InventoryComponent)
                 item_component = target_entity.get_component(ItemComponent)
-
                 if inventory and item_component:
-                    inventory.items.append(target_entity)
+                    inventory.add(target_entity)
                     self.game.entities.remove(target_entity)
-                    # Use the item's actual name in the message.
-                    item_name = item_component.name
-                    self.game.hud.add_message(f"You pick up the {item_name}.", (200, 200, 255))
+                    self.game.events.publish(PickupEvent, self.player, target_entity)
                     return True  # Picking up an item takes a turn.
-
             # Otherwise, the entity must be an enemy to attack.
             else:
                 self.process_attack(self.player, target_entity)
                 return True  # Attacking takes a turn.
+        pos.x, pos.y = next_x, next_y
+        return True  # Moving takes a turn.
 
-        # If there's no entity at the destination, move there.
-        pos.x = next_x
-        pos.y = next_y
-        return True # Moving takes a turn.
-
-    def process_enemy_turns(self):
-        """Processes turns for all non-player entities."""
-        # We iterate over a copy of the list, as entities might be removed.
-        for entity in list(self.turn_takers):
-            # Skip the player or any entity that might have been killed this turn.
-            if entity is self.player or entity not in self.entities:
+    def perceive_all(self):
+        """Perceives the player for every living monster at once; returns entity -> distance for those that act."""
+        player_pos = self.player.get_component(PositionComponent)
+        player_x, player_y = player_pos.x, player_pos.y
+        alive = set(self.entities)
+        perceivers = [perceiver for perceiver in self.perceivers if perceiver[0] in alive]
+        distances = [abs(pos.x - player_x) + abs(pos.y - player_y) for _, _, pos in perceivers]
+        return {entity: distance for (entity, ai, _), distance in zip(perceivers, distances)
+                if ai.perceive(distance, self)}
+
+    def plan_packs(self, perceived):
+        """Updates pack membership, pools each pack's perception and assigns flanks; returns the paths built."""
+        alive = set(self.entities)
+        for pack in self.packs:
+            members = [member for member in pack.members if member[0] in alive]
+            if members:
+                leader_pos = members[0][2]
+                for member in members[1:]:
+                    if abs(member[2].x - leader_pos.x) + abs(member[2].y - leader_pos.y) > PACK_LEAVE_RADIUS:
+                        member[1].pack = None
+                        members.remove(member)
+            pack.members = members
+        self.packs = [pack for pack in self.packs if pack.members]
+        for member in self.pack_hunters:
+            entity, ai, pos = member
+            if ai.pack is not None or entity not in alive:
                 continue
-
-            # --- NEW: Speed Mechanic Implementation ---
-            # Get the entity's stats to check its speed.
-            stats = entity.get_component(StatsComponent)
-            speed = stats.speed if stats else 1 # Default to 1 if no stats.
-
-            # Loop a number of times equal to the entity's speed.
-            for _ in range(speed):
-                # If the entity was killed by the player during its multi-move
-                # (e.g., from a future "attack of opportunity" mechanic),
-                # it should not get its remaining actions.
-                if entity not in self.entities:
+            for pack in self.packs:
+                leader_pos = pack.members[0][2]
+                if len(pack.members) < PACK_MAX_SIZE and \
+                        abs(pos.x - leader_pos.x) + abs(pos.y - leader_pos.y) <= PACK_JOIN_RADIUS:
                     break
+            else:
+                pack = Pack()
+                self.packs.append(pack)
+            pack.members.append(member)
+            ai.pack = pack
+        player_pos = self.player.get_component(PositionComponent)
+        paths = {}
+        def path_to(side, target):
+            # Paths to a side go around the target itself, where the player stands.
+            if (side, target) not in paths:
+                paths[(side, target)] = DistanceMap(self.game_map, [side], limit=PACK_PATH_LIMIT, blocked=[target])
+            return paths[(side, target)]
+        for pack in self.packs:
+            pack.observe(perceived, player_pos, self)
+            pack.plan(self.game_map, path_to)
+        return paths
 
-                ai = entity.get_component(AIComponent)
-                if ai:
-                    ai.take_turn(self, self.player)
+    def process_enemy_turns(self):
+        """Processes a whole enemy phase at once, however long it takes."""
+        self.advance_enemy_phase()
+
+    @profiled("enemy_turns")
+    def advance_enemy_phase(self, deadline=None):
+        """Runs the enemy phase, started if needed, until done (True) or the perf_counter() deadline passes."""
+        if self.enemy_phase is None:
+            self.phase_perceived = self.perceive_all()
+            self.phase_paths = self.plan_packs(self.phase_perceived)
+            # We iterate over a copy of the list, as entities might be removed.
+            self.enemy_phase = list(self.turn_takers)
+            self.phase_cursor = 0
+            if deadline is not None and time.perf_counter() >= deadline:
+                return False
+        actors = self.enemy_phase
+        while self.phase_cursor < len(actors):
+            entity = actors[self.phase_cursor]
+            self.phase_cursor += 1
+            self.take_enemy_turn(entity, self.phase_perceived)
+            if deadline is not None and self.phase_cursor < len(actors) and time.perf_counter() >= deadline:
+                return False
+        # The shared paths are only valid while the player stands still.
+        for path in self.phase_paths.values():
+            path.release()
+        for pack in self.packs:
+            pack.flanks = {}
+        self.enemy_phase = None
+        self.phase_perceived, self.phase_paths = {}, {}
+        self.game.events.flush()
+        return True
 
-                # --- Vampire Regeneration Mechanic ---
-                if entity.get_component(VampireComponent):
-                    stats = entity.get_component(StatsComponent)
-                    if stats.current_hp < stats.max_hp:
-                        stats.current_hp += 1  # Regenerate 1 HP per action
+    def take_enemy_turn(self, entity, perceived):
+        """Takes all of one monster's actions for this phase."""
+        # Skip the player or any entity that might have been killed this turn.
+        if entity is self.player or entity not in self.entities:
+            return
+        # --- NEW: Speed Mechanic Implementation ---
+        # Get the entity's stats to check its speed.
+        stats = entity.get_component(StatsComponent)
+        speed = stats.speed if stats else 1 # Default to 1 if no stats.
+
+        # Loop a number of times equal to the entity's speed.
+        for action in range(speed):
+            # If the entity was killed by the player during its multi-move
+            # (e.g., from a future "attack of opportunity" mechanic),
+            # it should not get its remaining actions.
+            if entity not in self.entities:
+                break
+
+            ai = entity.get_component(AIComponent)
+            if ai and action == 0:
+                # The first action uses the batched perception; a monster that perceived nothing sits it out.
+                if entity in perceived:
+                    ai.take_turn(self, self.player, perceived[entity])
+            elif ai:
+                # Extra actions of fast monsters perceive again from where they moved.
+                ai.take_turn(self, self.player)
+
+            # --- Vampire Regeneration Mechanic ---
+            if entity.get_component(VampireComponent):
+                stats = entity.get_component(StatsComponent)
+                if stats.current_hp < stats.max_hp:
+                    stats.current_hp += 1  # Regenerate 1 HP per action
 
-    def process_attack(self, attacker, defender):
+    def process_attack(self, attacker, defender, verb="strikes"):
         """Handles the logic for one entity attacking another."""
         # --- God Mode Check ---
         if defender is self.game.player and self.game.god_mode_active:
             return
-
         # Get the defender's stats first, as it's always needed.
         defender_stats = defender.get_component(StatsComponent)
         if not defender_stats: return
-
         # --- Power Mode Cheat Check ---
         if attacker is self.game.player and self.game.power_mode_active:
             damage = 999
         else:
-            # --- Original Damage Calculation ---
-            attacker_power = attacker.get_power()
-            defender_defense = defender.get_defense()
-            damage = attacker_power - defender_defense
-
-        # Ensure damage is at least 0. We don't want attacks to heal the target.
-        if damage < 0:
-            damage = 0
-
+            # Damage is at least 0; attacks never heal the target.
+            damage = max(0, attacker.get_power() - defender.get_defense())
         defender_stats.current_hp -= damage
-
-        attacker_char = attacker.get_component(RenderComponent).char
-        defender_char = defender.get_component(RenderComponent).char
-
-        if damage > 0:
-            self.game.hud.add_message(f"The {attacker_char} strikes the {defender_char} for {damage} damage!",
-                                      COLOR_MESSAGE_DAMAGE)
-        else:
-            self.game.hud.add_message(f"The {attacker_char} fails to harm the {defender_char}.", COLOR_MESSAGE_DEFAULT)
-
+        self.game.events.publish(DamageEvent, attacker, defender, damage, verb)
         # Check if the defender died.
         if defender_stats.current_hp <= 0:
             self.kill_entity(defender)
 
     def kill_entity(self, entity):
-        """Removes a dead entity, grants XP, and checks if combat has ended."""
-        char = entity.get_component(RenderComponent).char
-
+        """Removes a dead entity and grants XP (level-ups before the DeathEvent), then checks if combat ended."""
         # --- XP Gain Logic ---
         # Get the stats of the slain entity to find its XP reward.
+        xp_reward = 0
         entity_stats = entity.get_component(StatsComponent)
         if entity_stats and entity is not self.player:
             xp_reward = entity_stats.xp_reward
@@ -1445,126 +2520,243 @@ class TurnManager:
                 # Get the player's experience component and award the XP.
                 player_exp = self.player.get_component(ExperienceComponent)
                 player_exp.current_xp += xp_reward
-                self.game.hud.add_message(f"You gain {xp_reward} experience.", (100, 150, 255))
-                # Check if this XP gain results in a level up.
-                self.game.check_player_level_up() # We will create this method next.
-
-        self.game.hud.add_message(f"The {char} is slain!", COLOR_MESSAGE_DEFAULT)
-
-        if entity is self.player:
-            GameLogger.log(f"Player died on dungeon level {self.game.dungeon_manager.dungeon_level}.", "EVENT")
-            self.game.game_state = GameState.PLAYER_DEAD
-        else:
-            # --- Victory Condition Check ---
-            if entity.get_component(VampireComponent):
-                self.game.game_state = GameState.VICTORY
-
+                self.game.events.publish(ExperienceEvent, self.player, xp_reward)
+                self.game.check_player_level_up()
+        self.game.events.publish(DeathEvent, entity, xp_reward)
+        if entity is not self.player:
             # Remove the entity from all tracked lists.
             self.game.entities.remove(entity)
             if entity.get_component(TurnTakerComponent):
                 self.turn_takers.remove(entity)
-
-            # --- Check if Combat is Over ---
-            # After killing an enemy, check if any remaining enemies are still active.
-            is_any_enemy_active = False
-            for e in self.turn_takers:
-                if e is self.player: continue
-                ai = e.get_component(AIComponent)
-                if ai and ai.state == 'ACTIVE':
-                    is_any_enemy_active = True
-                    break  # Found an active enemy, no need to check further.
-
-            # If no active enemies are left, turn off combat mode.
-            if not is_any_enemy_active:
+            # --- Combat is over once no remaining enemy is active ---
+            if not any(e is not self.player and getattr(e.get_component(AIComponent), "state", None) == 'ACTIVE'
+                       for e in self.turn_takers):
                 self.game.set_combat_state(False)
 
 # ==============================================================================
 # IX. Main Game Class
 # ==============================================================================
 
+class Presenter:
+    """Puts the internal frame on the window, scaled without allocation (with --gpu, on the graphics card)."""
+    def __init__(self, size, use_gpu=False):
+        self.size = size
+        self.screen = None  # The window surface (software path only).
+        self.window = self.renderer = self.texture = None  # The GPU path's objects.
+        if use_gpu:
+            self.init_gpu(size)
+        if not self.renderer:
+            self.screen = pygame.display.set_mode(size)
+
+    def init_gpu(self, size):
+        """Creates a hardware renderer and texture, falling back to software if unavailable."""
+        try:
+            from pygame._sdl2 import video
+            self.window = video.Window(WINDOW_TITLE, size=size)
+            # SDL falls back to its software renderer only when no graphics driver is available.
+            self.renderer = video.Renderer(self.window)
+            self.texture = video.Texture(self.renderer, (INTERNAL_WIDTH, INTERNAL_HEIGHT), streaming=True)
+        except (ImportError, RuntimeError, pygame.error) as e:
+            GameLogger.log(f"GPU presentation unavailable, using software scaling: {e}", "WARNING")
+            if self.window:
+                self.window.destroy()
+            self.window = self.renderer = self.texture = None
+
+    def resize(self, size):
+        """Applies a new window resolution."""
+        self.size = size
+        if self.renderer:
+            self.window.size = size  # The renderer stretches the texture to fit.
+        else:
+            self.screen = pygame.display.set_mode(size)
+
+    def present(self, surface, rects=None):
+        """Scales and shows the finished frame, or only the given `rects` (in internal coordinates)."""
+        if self.renderer:
+            # Uploading the whole frame is cheap for the GPU path, so it ignores rects.
+            self.texture.update(surface)
+            self.renderer.clear()
+            self.texture.draw()  # With no destination rect, fills the whole window.
+            self.renderer.present()
+            return
+        if rects is not None:
+            window_rects = [self.present_region(surface, rect) for rect in rects]
+            pygame.display.update([rect for rect in window_rects if rect])
+            return
+        if self.size == surface.get_size():
+            self.screen.blit(surface, (0, 0))
+        else:
+            # Scaling directly into the window surface avoids a temporary surface.
+            pygame.transform.scale(surface, self.size, self.screen)
+        pygame.display.flip()
+
+    def present_region(self, surface, rect):
+        """Copies one internal-space region to the window and returns the window rect it covers."""
+        rect = rect.clip(surface.get_rect())
+        if not rect.width or not rect.height:
+            return None
+        if self.size == surface.get_size():
+            self.screen.blit(surface, rect, rect)
+            return rect
+        # Snap outwards to the grid where the scale is an exact integer ratio, to sample as a full-frame scale.
+        width, height = surface.get_size()
+        step_x = width // math.gcd(width, self.size[0])
+        step_y = height // math.gcd(height, self.size[1])
+        left, top = rect.left // step_x * step_x, rect.top // step_y * step_y
+        right, bottom = -(-rect.right // step_x) * step_x, -(-rect.bottom // step_y) * step_y
+        source = pygame.Rect(left, top, right - left, bottom - top)
+        target = pygame.Rect(left * self.size[0] // width, top * self.size[1] // height,
+                             source.width * self.size[0] // width, source.height * self.size[1] // height)
+        pygame.transform.scale(surface.subsurface(source), target.size, self.screen.subsurface(target))
+        return target
+
+class DirtyRegionTracker:
+    """Works out which screen regions changed since the previous frame, so idle frames repaint almost nothing."""
+    def __init__(self):
+        self.full_redraw_requested = True
+        self.last_view = None  # The state, camera offset and help visibility last frame.
+        self.last_glyphs = {}  # Entity id -> (screen rect, char, color) last frame.
+        self.last_hud = {}  # HUD widget name -> the values it displayed last frame.
+
+    def request_full_redraw(self):
+        """Forces the next frame to be drawn and presented in full."""
+        self.full_redraw_requested = True
+
+    def collect(self, game, hud):
+        """Returns None for a full redraw, or the list of rects that changed, given this frame's HUD values."""
+        # Only the two turn states are tracked; menus and animated screens redraw in full.
+        if game.game_state not in (GameState.PLAYER_TURN, GameState.ENEMY_TURN) or game.debug_overlay.enabled:
+            self.full_redraw_requested = True
+            return None
+        screen_rect = game.internal_surface.get_rect()
+        glyphs = {}
+        for entity in game.entities:
+            pos = entity.get_component(PositionComponent)
+            render = entity.get_component(RenderComponent)
+            if pos and render:
+                tile_rect = pygame.Rect(pos.x * TILE_SIZE, pos.y * TILE_SIZE, TILE_SIZE, TILE_SIZE)
+                rect = game.camera.apply(tile_rect).inflate(DIRTY_ENTITY_PADDING, DIRTY_ENTITY_PADDING)
+                glyphs[id(entity)] = (rect, render.char, render.color)
+        view = (game.game_state, game.camera.rect.topleft, game.help_menu.is_open)
+        changed_tiles = [game.camera.apply(pygame.Rect(x * TILE_SIZE, y * TILE_SIZE, TILE_SIZE, TILE_SIZE))
+                         for x, y in game.game_map.changed_tiles]
+        game.game_map.changed_tiles.clear()
+        full = self.full_redraw_requested or view != self.last_view
+        dirty = []
+        if not full:
+            # An entity that moved, changed, appeared or vanished dirties the tiles it left and occupies.
+            for key in self.last_glyphs.keys() | glyphs.keys():
+                old, new = self.last_glyphs.get(key), glyphs.get(key)
+                if old != new:
+                    dirty.extend(glyph[0] for glyph in (old, new) if glyph)
+            dirty.extend(changed_tiles)  # Terrain changed by Map.set_tile.
+            for name, values in hud.items():
+                if values != self.last_hud.get(name):
+                    dirty.append(game.hud.widget_rects[name])
+            # Small, always-animated widgets are repainted every frame.
+            if game.help_menu.is_animating():
+                dirty.append(HelpMenu.ICON_RECT)
+            if settings_manager.get("show_fps"):
+                dirty.append(FPSCounter.RECT)
+            dirty = [rect for rect in dirty if rect.colliderect(screen_rect)]
+
+        self.last_view, self.last_glyphs, self.last_hud = view, glyphs, hud
+        self.full_redraw_requested = False
+        return None if full or len(dirty) > DIRTY_RECT_LIMIT else dirty
+
 # noinspection SpellCheckingInspection
 class Game:
     """The main class that orchestrates the entire game."""
+    # Movement keys and their steps; for held keys the first one listed wins.
+    MOVE_KEYS = {pygame.K_UP: (0, -1), pygame.K_w: (0, -1), pygame.K_DOWN: (0, 1), pygame.K_s: (0, 1),
+                 pygame.K_LEFT: (-1, 0), pygame.K_a: (-1, 0), pygame.K_RIGHT: (1, 0), pygame.K_d: (1, 0)}
 
     # noinspection SpellCheckingInspection
     def __init__(self):
+        # Apply the player's saved resolution, read here so importing the module does no I/O.
+        global SCREEN_WIDTH, SCREEN_HEIGHT, current_resolution_index
+        current_resolution_index = settings_manager.get("resolution_index")
+        SCREEN_WIDTH, SCREEN_HEIGHT = resolutions[current_resolution_index]
+
         # Initialize all Pygame modules.
         pygame.init()
         # Create the main window and the internal rendering surface.
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+        self.presenter = Presenter((SCREEN_WIDTH, SCREEN_HEIGHT), use_gpu="--gpu" in sys.argv)
         self.internal_surface = pygame.Surface((INTERNAL_WIDTH, INTERNAL_HEIGHT))
-
-        pygame.display.set_caption("Untitled Gothic Horror Roguelike")
+        pygame.display.set_caption(WINDOW_TITLE)
         self.clock = pygame.time.Clock()
-        # In class Game, method __init__
         self.game_state: GameState = GameState.MAIN_MENU
-
+        startup_timer.mark("display")
         # --- Menu Initialization ---
-        # We now have dedicated instances for each main menu screen.
+        # Only the screens visible on the first frame are built here; see the cached properties below.
         self.main_menu = Menu()
-        self.options_menu = OptionsMenu()
-        self.equipment_menu = EquipmentMenu()
         self.help_menu = HelpMenu()
-        self.dialogue_viewer = DialogueViewer()  # Add the new dialogue viewer instance.
-        # Give the options menu a reference back to the main game object.
-        # This allows it to know the current game state to rebuild its buttons.
-        self.options_menu.game = self
-
         # --- Font Initialization ---
-        self.game_font = pygame.font.Font(FONT_PATH, 16)
-        self.death_font = pygame.font.Font(FONT_PATH, 60)
-
+        self.game_font = fonts.get(16)
+        self.death_font = fonts.get(60)
         # --- System Initialization ---
         self.camera = Camera(INTERNAL_WIDTH, INTERNAL_HEIGHT)
         self.hud = HUD(self.game_font)
+        # The rules publish what happened; these subscribers react at the end of each phase.
+        self.events = EventBus()
+        self.events.subscribe(self.apply_events, DeathEvent)
+        self.events.subscribe(self.log_events, DeathEvent)
+        self.events.subscribe(self.hud.report, DamageEvent, ExperienceEvent, DeathEvent, PickupEvent, LevelUpEvent,
+                              DescendEvent)
         self.fps_counter = FPSCounter(self.game_font)
-        self.debug_overlay = DebugOverlay()
-
+        self.dirty_tracker = DirtyRegionTracker()
+        self.frame_profiler = FrameProfiler()
+        self.debug_overlay = DebugOverlay(self.frame_profiler)
         # --- Game Over Fade Effect Attributes ---
         self.death_fade_surface = pygame.Surface((INTERNAL_WIDTH, INTERNAL_HEIGHT))
         self.death_fade_surface.fill(COLOR_NEAR_BLACK)
         self.death_fade_alpha = 0
         self.death_fade_speed = 85  # Controls how fast the screen fades (higher is faster)
-
         # --- Fast Movement System Attributes ---
         self.fast_move_intent = {'dx': 0, 'dy': 0}
         self.fast_move_timer = 0.0
         self.FAST_MOVE_INTERVAL = 0.1
+        # --- Fixed-Step Simulation ---
+        self.simulation_lag = 0.0  # Frame time not yet simulated, in seconds.
+        self.enemy_phase_deadline = None  # Set each frame; without one, an enemy phase runs to the end.
         self.is_in_combat = False
-        self.god_mode_active = False
-        self.power_mode_active = False
-
-        # --- Pre-declare Game World Attributes ---
-        # We define these here with default values so the linter knows they will
-        # always exist on a Game instance.
+        # --- Pre-declare Game World Attributes, so the linter knows they always exist ---
         self.game_map = None
         self.player = None
         self.entities = []
         self.turn_manager = None
         self.dungeon_manager = None
-
-        # 1. Run the setup method to create the player and managers.
-        self.setup_new_game()
-
-        # 2. Check for and apply developer cheats to the managers.
-        # Add this block for the god mode cheat
-        if "--godmode" in sys.argv:
-            self.god_mode_active = True
-            GameLogger.log("God Mode cheat activated.", "CHEAT")  # Use the logger
+        self.telemetry = None  # The TelemetryRecorder of the current run, with --telemetry.
+        # The world is created by setup_new_game when a run starts. Developer cheats:
+        # --vampire starts on level 9, --godmode makes you invincible, --power gives you 999 power.
+        self.god_mode_active = "--godmode" in sys.argv
+        if self.god_mode_active:
+            GameLogger.log("God Mode cheat activated.", "CHEAT")
             self.hud.add_message("CHEAT: God Mode Activated.", (255, 215, 0))
-
-        # Add this block for the power mode cheat
-        if "--power" in sys.argv:
-            self.power_mode_active = False  # You will need to add this attribute
-            self.power_mode_active = True
-            GameLogger.log("Power Mode cheat activated.", "CHEAT")  # Use the logger
+        self.power_mode_active = "--power" in sys.argv
+        if self.power_mode_active:
+            GameLogger.log("Power Mode cheat activated.", "CHEAT")
             self.hud.add_message("CHEAT: Power Mode Activated.", (255, 165, 0))
+        startup_timer.mark("game init")
+
+    @functools.cached_property
+    def options_menu(self):
+        """The options screens, built the first time they are opened."""
+        options_menu = OptionsMenu()
+        # Give the options menu a reference back to the main game object.
+        # This allows it to know the current game state to rebuild its buttons.
+        options_menu.game = self
+        return options_menu
+
+    @functools.cached_property
+    def equipment_menu(self):
+        """The equipment screen, built the first time it is opened."""
+        return EquipmentMenu()
 
-        # --- Developer Cheats Command Line Arguments ---
-        # python main.py --vampire (Starts on level 9)
-        # python main.py --godmode (Makes you invincible)
-        # python main.py --vampire --godmode (Starts on level 9 and makes you invincible)
-        # python main.py --vampire --godmode --power (Starts on level 9, makes you invincible, and gives you 999 power)
+    @functools.cached_property
+    def dialogue_viewer(self):
+        """The dialogue viewer, built the first time a dialogue starts."""
+        return DialogueViewer()
 
     def setup_new_game(self):
         """Initializes the game for a new run, creating the player and the first level."""
@@ -1578,103 +2770,86 @@ class Game:
         self.player.add_component(InventoryComponent())
         self.player.add_component(ExperienceComponent(BASE_XP_TO_LEVEL, LEVEL_UP_FACTOR))
         self.player.add_component(EquipmentComponent())
-
         # --- Initialize Core Game Systems ---
         self.dungeon_manager = DungeonManager(self)
-
+        if "--telemetry" in sys.argv:
+            self.start_telemetry()
+        if "--endless" in sys.argv:
+            ChunkedMap.clear_disk_cache()  # Chunks evicted by a previous run are stale.
         # --- Generate the First Level ---
         # This will create the map, place the player, spawn entities, and create the turn manager.
         self.generate_new_level()
 
+    def start_telemetry(self):
+        """Starts recording the new run, closing the previous run's recording."""
+        if self.telemetry:
+            self.events.unsubscribe(self.telemetry.record_events)
+            self.telemetry.close()
+        self.telemetry = TelemetryRecorder(self.player, self.dungeon_manager.dungeon_level)
+        self.events.subscribe(self.telemetry.record_events, DamageEvent, DeathEvent, ItemUseEvent, DescendEvent)
+
+    @functools.cached_property
+    def quick_use_bindings(self):
+        """Maps pygame key codes to the ids of the items with a quick-use key."""
+        return {pygame.key.key_code(data["quick_use"]["key"]): item_id
+                for item_id, data in ITEM_DATA.items() if data["quick_use"]}
+
+    def quick_use(self, item_id):
+        """Uses one carried item of a kind through its quick-use binding; True if one was used (a turn)."""
+        data = ITEM_DATA[item_id]
+        binding = data["quick_use"]
+        inventory = self.player.get_component(InventoryComponent)
+        item = inventory.take_one(data["name"]) if inventory else None
+        if not item:
+            self.hud.add_message(binding["missing"], (255, 255, 100))
+            return False
+        self.use_item(item)
+        self.hud.add_message(binding["used"], data["color"])
+        return True
+
+    def use_item(self, item):
+        """Applies a usable item to the player, with its context (e.g. the map) from the current level."""
+        item_component = item.get_component(ItemComponent)
+        context = {"game_map": self.game_map, "entities": self.entities}
+        item_component.use_function(entity=self.player, **item_component.kwargs,
+                                    **{key: context[key] for key in item_component.context})
+        self.events.publish(ItemUseEvent, self.player, item)
+
+    @profiled("level_gen")
     def generate_new_level(self):
         """Creates a new map, places the player, and spawns entities based on dungeon level."""
         spawn_counts = self.dungeon_manager.get_entity_spawn_counts()
-        self.game_map = Map(MAP_WIDTH, MAP_HEIGHT)
-
+        # --endless streams endless caverns; the population still spawns in the usual starting area.
+        if "--endless" in sys.argv:
+            self.game_map = ChunkedMap(random.getrandbits(32))
+        else:
+            self.game_map = Map(MAP_WIDTH, MAP_HEIGHT, self.dungeon_manager.get_map_generator())
         spawn_x, spawn_y = self.game_map.spawn_point
         player_pos = self.player.get_component(PositionComponent)
         player_pos.x = spawn_x
         player_pos.y = spawn_y
-
         self.entities = [self.player]
-
         if self.dungeon_manager.dungeon_level == VAMPIRE_LEVEL:
             # --- BOSS LEVEL ---
-            v_data = ENTITY_DATA["vampire_lord"]
-            vampire = Entity()
-            vampire.add_component(PositionComponent(MAP_WIDTH // 2, MAP_HEIGHT // 2))
-            vampire.add_component(RenderComponent(v_data["char"], v_data["color"]))
-            vampire.add_component(StatsComponent(**v_data["stats"]))
-            vampire.add_component(AIComponent(is_stationary=True))
-            vampire.add_component(VampireComponent())
-            vampire.add_component(TurnTakerComponent())
-            vampire.add_component(DialogueComponent(
-                speaker_name="Vampire Lord",
-                dialogue_lines=[
-                    "So, another fool arrives to offer their blood.",
-                    "You reek of determination. A tedious flavor.",
-                    "Let us see if your conviction outlasts your life."
-                ],
-                subsequent_dialogue_lines=[
-                    "You again? Your persistence is a monument to your own futility.",
-                    "The abyss has spat you out, but I will send you back."
-                ]
-            ))
-            self.entities.append(vampire)
+            self.entities.append(prefabs.spawn("monster", "vampire_lord", MAP_WIDTH // 2, MAP_HEIGHT // 2))
             player_pos.x = MAP_WIDTH // 2
             player_pos.y = MAP_HEIGHT // 2 + VAMPIRE_SPAWN_OFFSET_Y
         else:
             # --- REGULAR LEVEL ---
-            # --- Spawn Enemies ---
-            for entity_name in ["rat", "ghoul", "skeleton"]:
-                count = spawn_counts.get(entity_name, 0)
-                data = ENTITY_DATA[entity_name]
-                for _ in range(count):
-                    entity = Entity()
-                    while True:
-                        x, y = random.randint(1, MAP_WIDTH - 2), random.randint(1, MAP_HEIGHT - 2)
-                        if self.game_map.is_walkable(x, y) and not any(
-                                e.get_component(PositionComponent).x == x and e.get_component(PositionComponent).y == y
-                                for e in self.entities):
-                            entity.add_component(PositionComponent(x, y))
-                            break
-                    entity.add_component(RenderComponent(data["char"], data["color"]))
-                    entity.add_component(TurnTakerComponent())
-                    entity.add_component(AIComponent())
-                    entity.add_component(StatsComponent(**data["stats"]))
-                    self.entities.append(entity)
-
-            # --- Spawn Items & Equipment ---
-            for item_name, data in ITEM_DATA.items():
-                spawn_key = data["spawn_key"]
-                count = spawn_counts.get(spawn_key, 0)
-                for _ in range(count):
-                    item = Entity()
+            # --- Spawn Enemies, then Items & Equipment ---
+            # Bosses without a spawn rate (the Vampire Lord) are placed by their own level.
+            spawn_plan = [("monster", name, name) for name in ENTITY_DATA if name in SPAWN_RATES]
+            spawn_plan += [("item", name, data["spawn_key"]) for name, data in ITEM_DATA.items()
+                           if data["spawn_key"] in SPAWN_RATES]
+            for kind, name, spawn_key in spawn_plan:
+                for _ in range(spawn_counts.get(spawn_key, 0)):
                     while True:
                         x, y = random.randint(1, MAP_WIDTH - 2), random.randint(1, MAP_HEIGHT - 2)
                         if self.game_map.is_walkable(x, y) and not any(
                                 e.get_component(PositionComponent).x == x and e.get_component(PositionComponent).y == y
                                 for e in self.entities):
-                            item.add_component(PositionComponent(x, y))
                             break
-                    item.add_component(RenderComponent(data["char"], data["color"]))
-
-                    # Build the kwargs dictionary for the ItemComponent
-                    final_kwargs = data.get("kwargs", {}).copy()
-                    if item_name == "teleport_scroll":
-                        # noinspection PyTypeChecker
-                        final_kwargs.update({"game_map": self.game_map, "entities": self.entities})
-
-                    item.add_component(
-                        ItemComponent(name=data["name"], use_function=data.get("use_function"), kwargs=final_kwargs)
-                    )
-
-                    # Add EquippableComponent if it exists
-                    if "equip" in data:
-                        item.add_component(EquippableComponent(**data["equip"]))
-
-                    self.entities.append(item)
-
+                    self.entities.append(prefabs.spawn(kind, name, x, y))
             # --- Spawn Stairs Down ---
             stairs = Entity()
             while True:
@@ -1686,26 +2861,113 @@ class Game:
             stairs.add_component(RenderComponent('>', (255, 165, 0)))
             stairs.add_component(StairsComponent())
             self.entities.append(stairs)
+        # --- Spawn Stairs Up, where the player arrives ---
+        if self.dungeon_manager.dungeon_level > 1:
+            stairs = Entity()
+            stairs.add_component(PositionComponent(player_pos.x, player_pos.y))
+            stairs.add_component(RenderComponent('<', (255, 165, 0)))
+            stairs.add_component(StairsComponent(direction=-1))
+            self.entities.append(stairs)
+        self.enter_level(self.game_map, self.entities[1:])
 
+    def enter_level(self, game_map, entities):
+        """Makes a map and its population (without the player) the current level."""
+        self.game_map = game_map
+        self.entities = [self.player] + entities
         self.turn_manager = TurnManager(game_object=self)
+        self.game_map.bake(self.game_font)
+        self.dirty_tracker.request_full_redraw()
 
     def run(self):
         """The main game loop. Continues until the game state is QUIT."""
+        runtime_profiler.configure_from_argv(sys.argv)
+        # The first frame completes startup; report how long each phase took.
+        self.run_frame()
+        startup_timer.mark("first frame")
+        GameLogger.log(startup_timer.report(), "INFO")
+        if "--startup-report" in sys.argv:
+            self.game_state = GameState.QUIT  # Measure startup only, then exit.
         while self.game_state != GameState.QUIT:
-            # Get the time elapsed since the last frame, in seconds.
-            delta_time = self.clock.tick(60) / 1000.0
-            self.handle_events()
-            self.update(delta_time)
-            self.draw()
+            self.run_frame()
+        if self.telemetry:
+            self.telemetry.close()  # Waits for the writer, so the run's last chunks reach the disk.
+        if runtime_profiler.active:  # Never lose a capture: a profiler still running is dumped now.
+            runtime_profiler.stop()
         pygame.quit()
         sys.exit()
 
+    @profiled("loop")
+    def run_frame(self):
+        """Runs one iteration of the main loop, sleeping in pygame.event.wait while nothing is animating."""
+        if self.is_animating():
+            first_event = None
+            delta_time = self.clock.tick(TARGET_FPS) / 1000.0  # Seconds since the last frame.
+        else:
+            # Block until input arrives or the timeout passes; the time asleep is not simulated.
+            first_event = pygame.event.wait(IDLE_WAIT_TIMEOUT_MS)
+            delta_time = min(self.clock.tick() / 1000.0, MAX_FRAME_DELTA)
+        self.frame_profiler.begin_frame()
+        self.enemy_phase_deadline = time.perf_counter() + ENEMY_PHASE_BUDGET_MS / 1000
+        self.handle_events(first_event)
+        self.frame_profiler.mark("events")
+        self.simulate(delta_time)
+        # Warm off-screen levels get one fixed slice per in-game frame, however many steps ran.
+        if self.game_state in GAMEPLAY_STATES:
+            self.dungeon_manager.scheduler.run(WARM_LEVEL_BUDGET_MS / 1000)
+        self.frame_profiler.mark("update")
+        self.draw()
+        self.frame_profiler.end_frame(self.game_state.name, len(self.entities))
+        if self.telemetry:
+            self.telemetry.record_frame(self.frame_profiler.history[-1][-1])
+
+    def simulate(self, delta_time):
+        """Calls update() once per SIMULATION_STEP of accumulated lag, dropping any beyond MAX_SIMULATION_STEPS."""
+        self.simulation_lag += delta_time
+        for _ in range(MAX_SIMULATION_STEPS):
+            if self.simulation_lag < SIMULATION_STEP:
+                return
+            self.update(SIMULATION_STEP)
+            self.simulation_lag -= SIMULATION_STEP
+        self.simulation_lag = min(self.simulation_lag, SIMULATION_STEP)
+
+    def stairs_at_player(self, direction):
+        """Checks whether the player is standing on stairs leading in a direction (1 down, -1 up)."""
+        player_pos = self.player.get_component(PositionComponent)
+        for entity in self.entities:
+            stairs = entity.get_component(StairsComponent)
+            if stairs and stairs.direction == direction:
+                pos = entity.get_component(PositionComponent)
+                if pos.x == player_pos.x and pos.y == player_pos.y:
+                    return True
+        return False
+
+    def is_animating(self):
+        """Checks whether anything on screen (or an enemy phase or warm level) needs frames without input."""
+        if self.game_state in (GameState.MAIN_MENU, GameState.ENEMY_TURN) or self.debug_overlay.enabled:
+            return True
+        if self.game_state in GAMEPLAY_STATES and (self.dungeon_manager.scheduler.queue or
+                                                   self.turn_manager.enemy_phase is not None):
+            return True
+        if self.help_menu.is_animating():
+            return True
+        if self.game_state == GameState.PLAYER_DEAD:
+            return self.death_fade_alpha < 255
+        return self.game_state == GameState.PLAYER_TURN and self.held_move_direction() != (0, 0)
+
+    def held_move_direction(self):
+        """Returns the (dx, dy) of a held movement key for fast movement, or (0, 0)."""
+        if self.is_in_combat:
+            return 0, 0  # Fast movement is only active when not in combat.
+        keys = pygame.key.get_pressed()
+        return next((step for key, step in Game.MOVE_KEYS.items() if keys[key]), (0, 0))
+
     def change_resolution(self, index):
         """Changes the window size and saves the setting."""
         global SCREEN_WIDTH, SCREEN_HEIGHT, current_resolution_index
         current_resolution_index = index
         SCREEN_WIDTH, SCREEN_HEIGHT = resolutions[current_resolution_index]
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+        self.presenter.resize((SCREEN_WIDTH, SCREEN_HEIGHT))
+        self.dirty_tracker.request_full_redraw()
         settings_manager.set("resolution_index", index)
         settings_manager.save_settings()
 
@@ -1717,27 +2979,31 @@ class Game:
         """Checks if the player has enough XP to level up and processes it."""
         player_exp = self.player.get_component(ExperienceComponent)
         player_stats = self.player.get_component(StatsComponent)
-
         # Use a while loop in case the player gains enough XP for multiple levels at once.
         while player_exp.current_xp >= player_exp.xp_to_next_level:
-            # 1. "Spend" the XP for the level up.
+            # Spend the XP, then recalculate the requirement for the *next* level.
             player_exp.current_xp -= player_exp.xp_to_next_level
-
-            # 2. Increment the player's level.
             player_exp.level += 1
-
-            # 3. Recalculate the XP requirement for the *next* level using our formula.
             player_exp.xp_to_next_level = int(player_exp.base_xp * (player_exp.level ** player_exp.level_factor))
-
-            # 4. Apply the level-up bonuses.
+            # Apply the bonuses, fully heal the player as a reward and announce it.
             player_stats.max_hp += 10
             player_stats.power += 1
-
-            # 5. Fully heal the player as a reward.
             player_stats.current_hp = player_stats.max_hp
-
-            # 6. Announce the level up.
-            self.hud.add_message(f"You feel stronger! You have reached level {player_exp.level}!", (50, 255, 50))
+            self.events.publish(LevelUpEvent, self.player, player_exp.level)
+
+    def apply_events(self, events):
+        """Applies the consequences of deaths: defeat and victory."""
+        for event in events:
+            if event.entity is self.player:
+                self.game_state = GameState.PLAYER_DEAD
+            elif event.entity.get_component(VampireComponent):
+                self.game_state = GameState.VICTORY
+
+    def log_events(self, events):
+        """Writes the player's death to the log file."""
+        for event in events:
+            if event.entity is self.player:
+                GameLogger.log(f"Player died on dungeon level {self.dungeon_manager.dungeon_level}.", "EVENT")
 
     def equip_item(self, item_to_equip):
         """Handles the logic of equipping an item from inventory."""
@@ -1745,32 +3011,25 @@ class Game:
         equipment = self.player.get_component(EquipmentComponent)
         # noinspection SpellCheckingInspection
         equippable = item_to_equip.get_component(EquippableComponent)
-
         if not all([inventory, equipment, equippable]):
             return  # Safety check
-
         slot = equippable.slot
-
-        # --- Unequip Old Item (if any) ---
-        # Check if there is already an item in the target slot.
+        # --- Unequip Old Item (if any), moving it back to the inventory ---
         currently_equipped_item = equipment.slots.get(slot)
         if currently_equipped_item:
-            # Move the currently equipped item back to the inventory list.
-            inventory.items.append(currently_equipped_item)
+            inventory.add(currently_equipped_item)
             item_name = currently_equipped_item.get_component(ItemComponent).name
             self.hud.add_message(f"You unequip the {item_name}.", (255, 255, 100))
-
-        # --- Equip New Item ---
-        # Remove the new item from the inventory list.
-        inventory.items.remove(item_to_equip)
-        # Place the new item into the now-empty slot.
+        # --- Equip New Item, from the inventory into the now-empty slot ---
+        inventory.remove(item_to_equip)
         equipment.slots[slot] = item_to_equip
         item_name = item_to_equip.get_component(ItemComponent).name
         self.hud.add_message(f"You equip the {item_name}.", (100, 255, 100))
 
-    def handle_events(self):
+    def handle_events(self, first_event=None):
         """
-        Processes all pending events from Pygame's event queue.
+        Processes all pending events from Pygame's event queue, preceded by
+        `first_event` if the idle loop already took one off the queue.
 
         This method acts as the central hub for all user input. It is structured
         as a state machine, where the logic applied depends entirely on the current
@@ -1781,80 +3040,66 @@ class Game:
         The method iterates through each event provided by Pygame and routes it
         to the appropriate logic block.
         """
-        for event in pygame.event.get():
-            # ------------------------------------------------------------------
-            # I. Global Event Handling
-            # These events are checked first as they are the highest priority
-            # and can occur regardless of the current game state.
-            # ------------------------------------------------------------------
-
-            # The user clicked the window's close button. This is an explicit
-            # signal to terminate the application immediately.
+        events = pygame.event.get()
+        if first_event is not None and first_event.type != pygame.NOEVENT:
+            events.insert(0, first_event)
+        for event in events:
+            # --- I. Global Event Handling: highest priority, in any game state ---
+            # The user clicked the window's close button: terminate immediately.
             if event.type == pygame.QUIT:
                 self.game_state = GameState.QUIT
                 return  # Exit the method immediately to stop further processing.
-
-            # --- Help Menu Toggle ---
-            # This is checked globally, outside the main state machine, so it's always accessible.
+            # The OS discarded the window's contents (e.g. it was uncovered), so redraw in full.
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                self.dirty_tracker.request_full_redraw()
+            # Global hotkeys, outside the state machine so they are always available.
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_i:
                     self.help_menu.toggle()
-
-            # A key was pressed. We check for global hotkeys here.
-            if event.type == pygame.KEYDOWN:
-                # The F12 key toggles the developer debug overlay. This is a
-                # tool for us and should always be available.
-                if event.key == pygame.K_F12:
+                # F12 toggles the developer debug overlay.
+                elif event.key == pygame.K_F12:
                     self.debug_overlay.toggle()
-
-            # ------------------------------------------------------------------
-            # II. State-Based Event Handling
-            # This is the core of the state machine. An if/elif chain directs
-            # the event to the logic block corresponding to the current game state.
-            # ------------------------------------------------------------------
-
+                # F11 starts or stops recording per-frame timings to a CSV file.
+                elif event.key == pygame.K_F11:
+                    self.frame_profiler.toggle_recording()
+                # F10 starts or stops the runtime profiler (see RuntimeProfiler).
+                elif event.key == pygame.K_F10:
+                    if runtime_profiler.active:
+                        path = runtime_profiler.stop()
+                        self.hud.add_message(f"Profile saved: {path.name}" if path else "Profile failed to save.",
+                                             (255, 255, 0))
+                    else:
+                        runtime_profiler.start()
+                        self.hud.add_message(f"Profiling {runtime_profiler.scope} ({runtime_profiler.mode})...",
+                                             (255, 255, 0))
+                # F9 saves the full message history to a text file.
+                elif event.key == pygame.K_F9:
+                    path = self.hud.export_messages()
+                    self.hud.add_message(f"Messages saved: {path.name}" if path else "Messages failed to save.",
+                                         (255, 255, 0))
+            # --- II. State-Based Event Handling: route the event by the current game state ---
             if self.game_state == GameState.PLAYER_DEAD:
-                # CONTEXT: The player has died.
-                # GOAL: Wait for the player to acknowledge their demise and
-                #       return to the main menu.
-                # We only listen for a single input: the Enter key.
-                # This input is only accepted *after* the fade-to-black
-                # animation has fully completed.
+                # Enter, once the fade-to-black has completed, resets the world and returns to the menu.
                 if self.death_fade_alpha >= 255 and event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_RETURN:
-                        # Reset the game world for a fresh start.
                         self.setup_new_game()
-                        # Transition back to the main menu.
                         self.game_state = GameState.MAIN_MENU
-
             elif self.game_state == GameState.MAIN_MENU:
-                # CONTEXT: The player is at the main title screen.
-                # GOAL: Let the Menu object handle navigation and return an action.
+                # The Menu returns the next state; starting a game sets up a new world first.
                 action = self.main_menu.handle_input(event)
                 if action:
-                    # An action was returned (e.g., "Start Game" or "Options").
-                    # If the player chose to start, we must set up a new game world.
                     if action == GameState.PLAYER_TURN:
                         self.setup_new_game()
-
-                    # Transition to the new state returned by the menu.
                     self.game_state = action
-                    # If the new state is the options menu, we must build its buttons.
                     if self.game_state == GameState.OPTIONS_ROOT:
                         self.options_menu.rebuild_buttons(self.game_state)
-
             elif self.game_state in [GameState.OPTIONS_ROOT, GameState.OPTIONS_VIDEO]:
-                # CONTEXT: The player is in one of the options sub-menus.
-                # GOAL: Let the OptionsMenu object handle navigation and return an action.
+                # The OptionsMenu returns either a state change (e.g. "Back" or a sub-menu) or a command.
                 action = self.options_menu.handle_input(event)
                 if action:
-                    # The action can be either a state change or a command.
                     if isinstance(action, GameState):
-                        # The action is a state change (e.g., going "Back" or
-                        # entering a sub-menu).
                         self.game_state = action
-                        # We must rebuild the menu to show the correct buttons
-                        # for the new options screen.
+                        # Rebuild the menu to show the buttons of the new options screen.
                         if self.game_state in [GameState.OPTIONS_ROOT, GameState.OPTIONS_VIDEO]:
                             self.options_menu.rebuild_buttons(self.game_state)
                     elif isinstance(action, dict):
@@ -1870,10 +3115,7 @@ class Game:
                             settings_manager.save_settings()
                             # noinspection PyTypeChecker
                             self.options_menu.rebuild_buttons(self.game_state)
-
             elif self.game_state == GameState.EQUIP_MENU:
-                # CONTEXT: The player is managing their equipment.
-                # GOAL: Let the EquipmentMenu handle input and return an action.
                 action = self.equipment_menu.handle_input(event)
                 if action:
                     if action["type"] == "close":
@@ -1882,107 +3124,49 @@ class Game:
                         self.equip_item(action["item"])
                         # After equipping, the inventory has changed, so rebuild the options.
                         self.equipment_menu.rebuild_options(self.player)
-
             elif self.game_state == GameState.DIALOGUE:
                 # In this state, pass all input exclusively to the dialogue viewer.
                 action = self.dialogue_viewer.handle_input(event)
                 if action == "finished":
-                    # When dialogue is over, return control to the player.
-                    self.game_state = GameState.PLAYER_TURN
-
+                    # When dialogue is over, the monsters finish the turn it interrupted, if any.
+                    self.game_state = GameState.ENEMY_TURN if self.turn_manager.enemy_phase is not None \
+                        else GameState.PLAYER_TURN
             elif self.game_state == GameState.VICTORY:
                 if event.type == pygame.KEYDOWN and event.key == pygame.K_RETURN:
                     self.setup_new_game()
                     self.game_state = GameState.MAIN_MENU
-
             elif self.game_state == GameState.PLAYER_TURN:
-                # CONTEXT: It is the player's turn to act.
-                # GOAL: Process a single, discrete action from a key press.
+                # Process a single, discrete action from a key press.
                 if event.type == pygame.KEYDOWN:
                     # --- Action: Open Equipment Menu ---
                     if event.key == pygame.K_e:
                         # Rebuild the menu's options before showing it.
                         self.equipment_menu.rebuild_options(self.player)
                         self.game_state = GameState.EQUIP_MENU
-
+                    # --- Message Scrollback (free actions) ---
+                    elif event.key == pygame.K_PAGEUP:
+                        self.hud.scroll(HUD_MESSAGE_COUNT)
+                    elif event.key == pygame.K_PAGEDOWN:
+                        self.hud.scroll(-HUD_MESSAGE_COUNT)
                     action_taken = False
-
-                    # --- Action: Use Health Potion ---
-                    if event.key == pygame.K_h:
-                        inventory = self.player.get_component(InventoryComponent)
-                        if inventory and inventory.items:
-                            # Find the first health potion in the inventory.
-                            potion_to_use = next((item for item in inventory.items if
-                                                  item.get_component(ItemComponent).name == "Health Potion"), None)
-                            if potion_to_use:
-                                inventory.items.remove(potion_to_use)
-                                item_component = potion_to_use.get_component(ItemComponent)
-                                if item_component.use_function:
-                                    item_component.use_function(entity=self.player, **item_component.kwargs)
-                                    self.hud.add_message("You drink a potion and feel better.", COLOR_HEALING_RED)
-                                    action_taken = True
-                            else:
-                                self.hud.add_message("You have no potions to use.", (255, 255, 100))
+                    # --- Action: Quick-Use Items (bound by the items' "quick_use" content entries) ---
+                    if event.key in self.quick_use_bindings:
+                        action_taken = self.quick_use(self.quick_use_bindings[event.key])
+                    # --- Action: Descend or Climb Stairs ---
+                    elif event.key in (pygame.K_PERIOD, pygame.K_COMMA) and (pygame.key.get_mods() & pygame.KMOD_SHIFT):
+                        direction = 1 if event.key == pygame.K_PERIOD else -1
+                        if self.stairs_at_player(direction):
+                            (self.dungeon_manager.next_level if direction == 1 else self.dungeon_manager.previous_level)()
+                            action_taken = True  # Taking the stairs takes a turn.
                         else:
-                            self.hud.add_message("You have no potions to use.", (255, 255, 100))
-
-                    # --- Action: Read Scroll ---
-                    elif event.key == pygame.K_r:
-                        inventory = self.player.get_component(InventoryComponent)
-                        if inventory and inventory.items:
-                            # Find a scroll in the inventory.
-                            scroll_to_use = next((item for item in inventory.items if
-                                                  item.get_component(ItemComponent).name == "Scroll of Teleportation"),
-                                                 None)
-                            if scroll_to_use:
-                                inventory.items.remove(scroll_to_use)
-                                item_component = scroll_to_use.get_component(ItemComponent)
-                                if item_component.use_function:
-                                    item_component.use_function(entity=self.player, **item_component.kwargs)
-                                    self.hud.add_message("You read the scroll and vanish!", COLOR_SCROLL_BLUE)
-                                    action_taken = True
-                            else:
-                                self.hud.add_message("You have no scrolls to read.", (255, 255, 100))
-                        else:
-                            self.hud.add_message("You have no scrolls to read.", (255, 255, 100))
-
-                    # --- Action: Descend Stairs ---
-                    elif event.key == pygame.K_PERIOD and (pygame.key.get_mods() & pygame.KMOD_SHIFT):
-                        player_pos = self.player.get_component(PositionComponent)
-
-                        # Find if a stairs entity exists at the player's current coordinates.
-                        stairs_found = False
-                        for entity in self.entities:
-                            pos = entity.get_component(PositionComponent)
-                            # Check for an entity that is NOT the player, is at the same location, and has a StairsComponent.
-                            if entity is not self.player and pos and pos.x == player_pos.x and pos.y == player_pos.y:
-                                if entity.get_component(StairsComponent):
-                                    stairs_found = True
-                                    break  # Exit the loop once stairs are found.
-
-                        if stairs_found:
-                            self.dungeon_manager.next_level()
-                            action_taken = True  # Descending takes a turn.
-                        else:
-                            # This message provides feedback if the player hits '>' but is not on stairs.
+                            # This message provides feedback if the player hits '>' or '<' but is not on such stairs.
                             self.hud.add_message("There are no stairs here.", (255, 255, 100))
-
                     # --- Action: Movement ---
-                    else:
-                        dx, dy = 0, 0
-                        if event.key in (pygame.K_UP, pygame.K_w):
-                            dy = -1
-                        elif event.key in (pygame.K_DOWN, pygame.K_s):
-                            dy = 1
-                        elif event.key in (pygame.K_LEFT, pygame.K_a):
-                            dx = -1
-                        elif event.key in (pygame.K_RIGHT, pygame.K_d):
-                            dx = 1
-                        if dx != 0 or dy != 0:
-                            if self.turn_manager.process_player_turn(dx, dy):
-                                action_taken = True
-
-                    # If an action was taken AND the game was not won, end the player's turn.
+                    elif event.key in Game.MOVE_KEYS:
+                        action_taken = self.turn_manager.process_player_turn(*Game.MOVE_KEYS[event.key])
+                    # Deliver the action's events, then, if a turn was taken and the game not won, end it.
+                    if action_taken:
+                        self.events.flush()
                     if action_taken and self.game_state != GameState.VICTORY:
                         self.game_state = GameState.ENEMY_TURN
 
@@ -1996,79 +3180,87 @@ class Game:
         # This is a clean if/elif chain, making the state transitions mutually exclusive.
         if self.game_state == GameState.MAIN_MENU:
             self.main_menu.update(delta_time)
-
         elif self.game_state == GameState.PLAYER_TURN:
-            # Fast movement logic is only active when not in combat.
-            if not self.is_in_combat:
-                keys = pygame.key.get_pressed()
-                dx, dy = 0, 0
-                # By explicitly casting the key state to a boolean, we provide a clear
-                # type hint that resolves the linter's confusion with Pygame.
-                # noinspection PyUnresolvedReferences
-                if bool(keys[pygame.K_UP]) or bool(keys[pygame.K_w]):
-                    dy = -1
-                elif bool(keys[pygame.K_DOWN]) or bool(keys[pygame.K_s]):
-                    dy = 1
-                elif bool(keys[pygame.K_LEFT]) or bool(keys[pygame.K_a]):
-                    dx = -1
-                elif bool(keys[pygame.K_RIGHT]) or bool(keys[pygame.K_d]):
-                    dx = 1
-
-                if dx != 0 or dy != 0:
-                    self.fast_move_timer += delta_time
-                    if self.fast_move_timer >= self.FAST_MOVE_INTERVAL:
-                        self.fast_move_timer = 0.0
-                        if self.turn_manager.process_player_turn(dx, dy):
-                            self.game_state = GameState.ENEMY_TURN
-
+            # Fast movement: a held movement key repeats the step on a timer.
+            dx, dy = self.held_move_direction()
+            if dx != 0 or dy != 0:
+                self.fast_move_timer += delta_time
+                if self.fast_move_timer >= self.FAST_MOVE_INTERVAL:
+                    self.fast_move_timer = 0.0
+                    if self.turn_manager.process_player_turn(dx, dy):
+                        self.game_state = GameState.ENEMY_TURN
         elif self.game_state == GameState.ENEMY_TURN:
-            self.turn_manager.process_enemy_turns()
-            # If the player died or dialogue started, the state is handled.
-            # Otherwise, it's now the player's turn.
-            if self.game_state != GameState.PLAYER_DEAD and self.game_state != GameState.DIALOGUE:
-                self.game_state = GameState.PLAYER_TURN
+            self.run_enemy_phase()
 
+        elif self.game_state == GameState.DIALOGUE:
+            # A monster that started talking mid-phase doesn't stop the others' turns.
+            if self.turn_manager.enemy_phase is not None:
+                self.run_enemy_phase()
         elif self.game_state == GameState.EQUIP_MENU:
             pass  # The menu is static and only updates based on key events.
-
         elif self.game_state == GameState.PLAYER_DEAD:
             # If the player is dead, we only update the fade-to-black animation.
-            self.death_fade_alpha += DEATH_FADE_SPEED * delta_time  # Use constant
-            if self.death_fade_alpha > 255:
-                self.death_fade_alpha = 255
+            self.death_fade_alpha = min(255, self.death_fade_alpha + DEATH_FADE_SPEED * delta_time)
 
+    def run_enemy_phase(self):
+        """Advances the enemy phase within this frame's budget and finishes the turn once it is done."""
+        deadline = self.enemy_phase_deadline
+        if deadline is not None and self.turn_manager.enemy_phase is not None and time.perf_counter() >= deadline:
+            return
+        if not self.turn_manager.advance_enemy_phase(deadline):
+            return  # Resumed next frame; input and drawing carry on meanwhile.
+        self.dungeon_manager.scheduler.end_turn()
+        if self.telemetry:
+            self.telemetry.end_turn(self.player.get_component(StatsComponent).current_hp)
+        # Keep the map loaded around the player and every monster hunting them.
+        focus = [self.player.get_component(PositionComponent)]
+        for entity in self.entities:
+            ai = entity.get_component(AIComponent)
+            if ai and ai.state == 'ACTIVE':
+                focus.append(entity.get_component(PositionComponent))
+        self.game_map.stream([(pos.x, pos.y) for pos in focus])
+        # If the player died or dialogue started, the state is handled.
+        # Otherwise, it's now the player's turn.
+        if self.game_state == GameState.ENEMY_TURN:
+            self.game_state = GameState.PLAYER_TURN
+
+    @profiled("draw")
     def draw(self):
-        """Draws everything to the screen, based on the current game state."""
+        """Draws the frame and presents it, repainting only the dirty regions when possible."""
+        hud_values = None
+        if self.game_state in GAMEPLAY_STATES:
+            self.camera.update(self.player)
+            # Read once per frame, for both the dirty-region check and the HUD itself.
+            hud_values = self.hud.widget_values(self.player, self.dungeon_manager)
+        dirty_rects = self.dirty_tracker.collect(self, hud_values)
+        if dirty_rects is None:
+            # A full redraw: camera moved, state changed, or an animation is running.
+            self.draw_scene(hud_values)
+            self.frame_profiler.mark("ui")
+            self.presenter.present(self.internal_surface)
+        elif dirty_rects:
+            # Repaint the scene clipped to the changed regions, then present only them.
+            self.internal_surface.set_clip(dirty_rects[0].unionall(dirty_rects[1:]))
+            self.draw_scene(hud_values)
+            self.internal_surface.set_clip(None)
+            self.frame_profiler.mark("ui")
+            self.presenter.present(self.internal_surface, dirty_rects)
+        # With no dirty regions nothing changed, so the window already shows this frame.
+        self.frame_profiler.mark("present")
+
+    def draw_scene(self, hud_values):
+        """Draws everything onto the internal surface, based on the current game state."""
         self.internal_surface.fill(COLOR_NEAR_BLACK)
-
         # --- State-Based Drawing Logic ---
         if self.game_state == GameState.MAIN_MENU:
             self.main_menu.draw(self.internal_surface)
-
         elif self.game_state in [GameState.OPTIONS_ROOT, GameState.OPTIONS_VIDEO]:
             self.options_menu.draw(self.internal_surface, self.game_state)
-
-        # --- Combined Block for All In-Game States ---
-        # If the state is any of the main gameplay states (including the equip menu),
-        # we always draw the game world first.
-        elif self.game_state in [GameState.PLAYER_TURN, GameState.ENEMY_TURN, GameState.PLAYER_DEAD,
-                                 GameState.EQUIP_MENU, GameState.DIALOGUE, GameState.VICTORY]:
-            self.camera.update(self.player)
-
-            # Draw the game world, entities, and HUD.
-            map_bg_rect = pygame.Rect(0, 0, self.game_map.width * TILE_SIZE, self.game_map.height * TILE_SIZE)
-            visible_bg_rect = self.camera.apply(map_bg_rect)
-            pygame.draw.rect(self.internal_surface, COLOR_MEDIUM_BROWN, visible_bg_rect)
-
-            for y, row in enumerate(self.game_map.tiles):
-                for x, tile_char in enumerate(row):
-                    tile_rect = pygame.Rect(x * TILE_SIZE, y * TILE_SIZE, TILE_SIZE, TILE_SIZE)
-                    visible_rect = self.camera.apply(tile_rect)
-                    if self.internal_surface.get_rect().colliderect(visible_rect):
-                        color = self.game_map.tile_colors.get(tile_char, COLOR_WHITE)
-                        text_surface = self.game_font.render(tile_char, True, color)
-                        self.internal_surface.blit(text_surface, visible_rect)
-
+        # --- Every gameplay state (including the equip menu) draws the game world first ---
+        elif self.game_state in GAMEPLAY_STATES:
+            # Draw the pre-rendered map (one blit, or one per visible chunk), entities, and HUD.
+            self.game_map.draw(self.internal_surface, self.camera)
+            self.frame_profiler.mark("map")
             for entity in self.entities:
                 pos = entity.get_component(PositionComponent)
                 render = entity.get_component(RenderComponent)
@@ -2080,9 +3272,9 @@ class Game:
                         text_surface = self.game_font.render(render.char, True, render.color)
                         text_draw_rect = text_surface.get_rect(center=visible_rect.center)
                         self.internal_surface.blit(text_surface, text_draw_rect)
-
-            self.hud.draw(self.internal_surface, self.player, self.dungeon_manager)
-
+            self.frame_profiler.mark("entities")
+            self.hud.draw(self.internal_surface, self.player, self.dungeon_manager, hud_values)
+            self.frame_profiler.mark("hud")
         # --- Conditional Overlays ---
         # Now, draw specific overlays ON TOP of the game world based on the state.
         if self.game_state == GameState.EQUIP_MENU:
@@ -2090,61 +3282,70 @@ class Game:
         elif self.game_state == GameState.DIALOGUE:
             self.dialogue_viewer.draw(self.internal_surface)
         elif self.game_state == GameState.VICTORY:
-            # Draw a simple victory message.
-            victory_font = self.death_font
-            victory_text = victory_font.render("YOU ARE VICTORIOUS", True, (255, 215, 0))  # Gold color
-            text_rect = victory_text.get_rect(center=(INTERNAL_WIDTH / 2, INTERNAL_HEIGHT / 2 - 30))
-            self.internal_surface.blit(victory_text, text_rect)
-
-            restart_font = self.options_menu.button_font
-            restart_text = restart_font.render("Press Enter to Return to the Menu", True, COLOR_WHITE)
-            restart_rect = restart_text.get_rect(center=(INTERNAL_WIDTH / 2, INTERNAL_HEIGHT / 2 + 40))
-            self.internal_surface.blit(restart_text, restart_rect)
-
+            self.draw_end_screen("YOU ARE VICTORIOUS", (255, 215, 0))  # Gold color
         elif self.game_state == GameState.PLAYER_DEAD:
-            # Set the transparency of our fade surface based on the current alpha.
+            # Draw the black fade surface at its current alpha over the whole screen.
             self.death_fade_surface.set_alpha(int(self.death_fade_alpha))
-            # Draw the semi-transparent black surface over the whole screen.
             self.internal_surface.blit(self.death_fade_surface, (0, 0))
-
             # Only draw the death text and restart prompt after the screen is mostly faded.
             if self.death_fade_alpha > DEATH_TEXT_FADE_THRESHOLD:  # Use constant
-                death_text = self.death_font.render("YOU DIED", True, COLOR_BLOOD_RED)
-                # ...
-                text_rect = death_text.get_rect(center=(INTERNAL_WIDTH / 2, INTERNAL_HEIGHT / 2 - 30))
-                self.internal_surface.blit(death_text, text_rect)
-
-                restart_font = self.options_menu.button_font
-                restart_text = restart_font.render("Press Enter to Return to the Menu", True, COLOR_WHITE)
-                restart_rect = restart_text.get_rect(center=(INTERNAL_WIDTH / 2, INTERNAL_HEIGHT / 2 + 40))
-                self.internal_surface.blit(restart_text, restart_rect)
-
+                self.draw_end_screen("YOU DIED", COLOR_BLOOD_RED)
         # --- Always-on-Top Drawing ---
         # Draw the FPS counter in ANY state, if enabled.
         if settings_manager.get("show_fps"):
             self.fps_counter.draw(self.internal_surface, self.clock)
-
         # Draw the help menu.
         self.help_menu.draw(self.internal_surface)
-
         # Always draw the debug overlay if it's enabled.
-        self.debug_overlay.draw(self.internal_surface,
-                                {"FPS": f"{self.clock.get_fps():.1f}", "State": self.game_state.name})
-
-        # Final scaling and screen update.
-        scaled_surface = pygame.transform.scale(self.internal_surface, (SCREEN_WIDTH, SCREEN_HEIGHT))
-        self.screen.blit(scaled_surface, (0, 0))
-        pygame.display.flip()
-
-        # Final scaling and screen update.
-        scaled_surface = pygame.transform.scale(self.internal_surface, (SCREEN_WIDTH, SCREEN_HEIGHT))
-        self.screen.blit(scaled_surface, (0, 0))
-        pygame.display.flip()
+        if self.debug_overlay.enabled:
+            active_ai = sum(1 for e in self.entities
+                            if e.get_component(AIComponent) and e.get_component(AIComponent).state == 'ACTIVE')
+            self.debug_overlay.draw(self.internal_surface,
+                                    {"FPS": f"{self.clock.get_fps():.1f}", "State": self.game_state.name,
+                                     "Entities": f"{len(self.entities)} ({active_ai} AI active)"})
+
+    def draw_end_screen(self, title, color):
+        """Draws the large title of the death or victory screen above its restart prompt."""
+        title_text = self.death_font.render(title, True, color)
+        self.internal_surface.blit(title_text,
+                                   title_text.get_rect(center=(INTERNAL_WIDTH / 2, INTERNAL_HEIGHT / 2 - 30)))
+        restart_text = self.options_menu.button_font.render("Press Enter to Return to the Menu", True, COLOR_WHITE)
+        restart_rect = restart_text.get_rect(center=(INTERNAL_WIDTH / 2, INTERNAL_HEIGHT / 2 + 40))
+        self.internal_surface.blit(restart_text, restart_rect)
 
 # ==============================================================================
 # X. Heads-Up Display (HUD) System
 # ==============================================================================
 
+class MessageLog:
+    """The run's message history for scrollback, in a ring buffer; repeats bump the newest entry's count."""
+    def __init__(self, capacity=MESSAGE_LOG_CAPACITY):
+        self.entries = deque(maxlen=capacity)
+
+    def add(self, text, color):
+        """Appends a message, coalescing it with the newest one if they match. True if it took a new line."""
+        if self.entries and self.entries[-1][0] == text and self.entries[-1][1] == color:
+            self.entries[-1][2] += 1
+            return False
+        self.entries.append([text, color, 1])
+        return True
+
+    @staticmethod
+    def format(entry):
+        """Returns the display text of an entry, with its repeat counter."""
+        text, _, count = entry
+        return f"{text} x{count}" if count > 1 else text
+
+    def recent(self, count, offset=0):
+        """Returns up to `count` (text, color) lines, newest first, skipping the newest `offset`."""
+        lines = itertools.islice(reversed(self.entries), offset, offset + count)
+        return tuple((self.format(entry), entry[1]) for entry in lines)
+
+    def export(self, path):
+        """Writes the full history, oldest first, to a text file."""
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines(self.format(entry) + "\n" for entry in self.entries)
+
 class HUD:
     """
     Manages the rendering of all persistent on-screen UI elements,
@@ -2157,7 +3358,45 @@ class HUD:
 
     def __init__(self, font):
         self.font = font
-        self.messages = []  # This will hold the game log messages later.
+        self.message_log = MessageLog()
+        self.scroll_offset = 0  # How many messages back the scrollback view is.
+        self.line_cache = {}  # (text, color) -> rendered line surface.
+        self.line_cache_stats = CacheStats("Message lines")
+        # The screen region of each widget; they never overlap, so each repaints alone.
+        line = font.get_height()
+        self.widget_rects = {
+            "health": pygame.Rect(0, 8, 520, 20),
+            "xp": pygame.Rect(0, 28, 420, 36),
+            "messages": pygame.Rect(0, 68, INTERNAL_WIDTH, HUD_MESSAGE_COUNT * (line + 2) + 4),
+            "items": pygame.Rect(0, INTERNAL_HEIGHT - 2 * (line + 5) - 20, 420, 2 * (line + 5) + 20),
+            "dungeon_level": pygame.Rect(INTERNAL_WIDTH - 160, INTERNAL_HEIGHT - line - 20, 160, line + 20),
+        }
+        # --- Cached HUD Layer: widgets are re-rendered only when the values they show change ---
+        self.layer = pygame.Surface((INTERNAL_WIDTH, INTERNAL_HEIGHT), pygame.SRCALPHA)
+        self.layer_values = {}
+        self.content_rects = {}  # Widget name -> the occupied part of its region.
+        self.cache_stats = CacheStats("HUD widgets")
+
+    def widget_values(self, player, dungeon_manager):
+        """Returns the values each widget displays, keyed by widget name."""
+        stats = player.get_component(StatsComponent)
+        exp = player.get_component(ExperienceComponent)
+        return {
+            "health": (stats.current_hp, stats.max_hp),
+            "xp": (exp.level, exp.current_xp, exp.xp_to_next_level),
+            "messages": (self.message_log.recent(HUD_MESSAGE_COUNT, self.scroll_offset), self.scroll_offset),
+            "items": self.count_items(player),
+            "dungeon_level": dungeon_manager.dungeon_level,
+        }
+
+    @staticmethod
+    def count_items(player):
+        """Returns (item name, count, color) for every quick-use item kind the player carries."""
+        inventory = player.get_component(InventoryComponent)
+        if not inventory: return ()
+        counts = ((data["name"], inventory.count(data["name"]), data["color"])
+                  for data in ITEM_DATA.values() if data["quick_use"])
+        return tuple(entry for entry in counts if entry[1])
 
     def add_message(self, text, color=COLOR_MESSAGE_DEFAULT):
         """
@@ -2168,27 +3407,95 @@ class HUD:
                     ensures the list does not exceed a maximum size.
         - Effect: The UI can display a scrolling log of recent game events.
         """
-        self.messages.insert(0, (text, color))
-        if len(self.messages) > HUD_MESSAGE_COUNT:
-            self.messages.pop()
-
-    def draw(self, surface, player, dungeon_manager):
-        """Draws all HUD elements onto the provided surface."""
-        self.draw_health_bar(surface, player)
-        self.draw_xp_bar(surface, player) # Call the new method here.
-        self.draw_message_log(surface)
-        self.draw_item_status(surface, player)
-        self.draw_dungeon_level(surface, dungeon_manager)
+        # A scrolled-back view stays on the same messages; a repeat only bumps a counter.
+        if self.message_log.add(text, color) and self.scroll_offset:
+            self.scroll_offset += 1
+
+    def report(self, events):
+        """Writes a message for each game event; the only place their text is formatted."""
+        for event in events:
+            kind = type(event)
+            if kind is DamageEvent:
+                attacker_char = event.attacker.get_component(RenderComponent).char
+                defender_char = event.defender.get_component(RenderComponent).char
+                if event.amount > 0:
+                    self.add_message(f"The {attacker_char} {event.verb} the {defender_char} for {event.amount} damage!",
+                                     COLOR_MESSAGE_DAMAGE)
+                else:
+                    self.add_message(f"The {attacker_char} fails to harm the {defender_char}.", COLOR_MESSAGE_DEFAULT)
+            elif kind is ExperienceEvent:
+                self.add_message(f"You gain {event.amount} experience.", (100, 150, 255))
+            elif kind is DeathEvent:
+                self.add_message(f"The {event.entity.get_component(RenderComponent).char} is slain!",
+                                 COLOR_MESSAGE_DEFAULT)
+            elif kind is PickupEvent:
+                self.add_message(f"You pick up the {event.item.get_component(ItemComponent).name}.", (200, 200, 255))
+            elif kind is LevelUpEvent:
+                self.add_message(f"You feel stronger! You have reached level {event.level}!", (50, 255, 50))
+            elif kind is DescendEvent:
+                verb = "descend to" if event.direction == 1 else "climb back up to"
+                self.add_message(f"You {verb} level {event.depth}...", (200, 100, 255))
+
+    def scroll(self, lines):
+        """Moves the scrollback view; positive values look further into the past."""
+        newest_page_start = max(0, len(self.message_log.entries) - HUD_MESSAGE_COUNT)
+        self.scroll_offset = max(0, min(self.scroll_offset + lines, newest_page_start))
+
+    def export_messages(self):
+        """Saves the full message history to the user data folder and returns the path."""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = get_user_data_dir() / f"message_log_{timestamp}.txt"
+        try:
+            self.message_log.export(path)
+        except OSError as e:
+            GameLogger.log(f"Could not export the message log: {e}", "ERROR")
+            return None
+        GameLogger.log(f"Message log exported to {path}", "INFO")
+        return path
+
+    def render_line(self, text, color):
+        """Returns the rendered surface of a message line, re-rendering only new lines."""
+        key = (text, color)
+        if key in self.line_cache:
+            self.line_cache_stats.hit()
+        else:
+            self.line_cache_stats.miss()
+            if len(self.line_cache) >= MESSAGE_LINE_CACHE_SIZE:
+                del self.line_cache[next(iter(self.line_cache))]  # Dicts keep insertion order: the oldest.
+            self.line_cache[key] = self.font.render(text, True, color)
+        return self.line_cache[key]
+
+    def draw(self, surface, player, dungeon_manager, values):
+        """Draws all HUD elements, re-rendering only the widgets whose `values` changed into the cached layer."""
+        widgets = {
+            "health": lambda: self.draw_health_bar(self.layer, player),
+            "xp": lambda: self.draw_xp_bar(self.layer, player),
+            "messages": lambda: self.draw_message_log(self.layer),
+            "items": lambda: self.draw_item_status(self.layer, player),
+            "dungeon_level": lambda: self.draw_dungeon_level(self.layer, dungeon_manager),
+        }
+        for name, draw_widget in widgets.items():
+            if self.layer_values.get(name) == values[name]:
+                self.cache_stats.hit()
+                continue
+            self.cache_stats.miss()
+            # Clear the widget's own region and redraw it, clipped to that region.
+            rect = self.widget_rects[name]
+            self.layer.fill((0, 0, 0, 0), rect)
+            self.layer.set_clip(rect)
+            draw_widget()
+            self.layer.set_clip(None)
+            self.content_rects[name] = self.layer.subsurface(rect).get_bounding_rect().move(rect.topleft)
+        self.layer_values = values
+        surface.blits([(self.layer, rect, rect) for rect in self.content_rects.values()], doreturn=False)
 
     def draw_health_bar(self, surface, player):
         """Calculates and draws the player's health bar."""
         player_stats = player.get_component(StatsComponent)
         if not player_stats: return
-
         # --- Health Bar Calculation ---
         health_percentage = player_stats.current_hp / player_stats.max_hp
         num_active_dashes = int(health_percentage * HUD_HEALTH_BAR_DASHES)
-
         # --- Color Determination Logic (The "Pokémon Component") ---
         if num_active_dashes >= 11:
             bar_color = COLOR_HEALTH_GREEN
@@ -2198,66 +3505,31 @@ class HUD:
             bar_color = COLOR_HEALTH_ORANGE
         else:
             bar_color = COLOR_HEALTH_RED
-
-        # --- String Construction ---
-        active_bar_string = "—" * num_active_dashes
-        inactive_bar_string = "—" * (HUD_HEALTH_BAR_DASHES - num_active_dashes)
-        numerical_text = f" HP: {player_stats.current_hp}/{player_stats.max_hp}"
-
-        # --- Rendering ---
-        # Define the starting position for the HUD in the top-left corner.
+        # --- Rendering: filled dashes, empty dashes, then the numbers, left to right from the top-left ---
         x, y = 10, 10
-
-        # Render the active (filled) part of the bar.
-        active_surface = self.font.render(active_bar_string, True, bar_color)
-        surface.blit(active_surface, (x, y))
-
-        # Render the inactive (empty) part of the bar, positioned after the active part.
-        inactive_x = x + active_surface.get_width()
-        inactive_surface = self.font.render(inactive_bar_string, True, COLOR_HUD_EMPTY_DASH)
-        surface.blit(inactive_surface, (inactive_x, y))
-
-        # Render the numerical text, positioned after the full bar.
-        text_x = inactive_x + inactive_surface.get_width()
-        text_surface = self.font.render(numerical_text, True, COLOR_WHITE)
-        surface.blit(text_surface, (text_x, y))
+        for text, color in (("—" * num_active_dashes, bar_color),
+                            ("—" * (HUD_HEALTH_BAR_DASHES - num_active_dashes), COLOR_HUD_EMPTY_DASH),
+                            (f" HP: {player_stats.current_hp}/{player_stats.max_hp}", COLOR_WHITE)):
+            text_surface = self.font.render(text, True, color)
+            surface.blit(text_surface, (x, y))
+            x += text_surface.get_width()
 
     def draw_xp_bar(self, surface, player):
         """Calculates and draws the player's experience bar."""
         player_exp = player.get_component(ExperienceComponent)
         if not player_exp: return
-
-        # --- XP Bar Calculation ---
-        # Prevent division by zero if xp_to_next_level is somehow 0.
-        xp_percentage = 0
-        if player_exp.xp_to_next_level > 0:
-            xp_percentage = player_exp.current_xp / player_exp.xp_to_next_level
-
+        # --- XP Bar Calculation (guarding against an xp_to_next_level of 0) ---
+        xp_percentage = player_exp.current_xp / player_exp.xp_to_next_level if player_exp.xp_to_next_level > 0 else 0
         bar_width = 150  # The total pixel width of the XP bar.
-        current_bar_width = int(bar_width * xp_percentage)
-
-        # --- String Construction ---
-        level_text = f"LVL: {player_exp.level}"
-        xp_text = f"XP: {player_exp.current_xp}/{player_exp.xp_to_next_level}"
-
-        # --- Rendering ---
-        x, y = 10, 30  # Position below the health bar.
-
-        # Render the text labels.
-        level_surface = self.font.render(level_text, True, COLOR_WHITE)
+        # --- Rendering: level and XP labels below the health bar, then the bar's background and fill ---
+        x, y = 10, 30
+        level_surface = self.font.render(f"LVL: {player_exp.level}", True, COLOR_WHITE)
         surface.blit(level_surface, (x, y))
-
-        xp_text_surface = self.font.render(xp_text, True, COLOR_WHITE)
-        # Position the XP text to the right of the level text.
+        xp_text_surface = self.font.render(f"XP: {player_exp.current_xp}/{player_exp.xp_to_next_level}", True,
+                                           COLOR_WHITE)
         surface.blit(xp_text_surface, (x + level_surface.get_width() + 10, y))
-
-        # Render the background of the XP bar.
-        bar_bg_rect = pygame.Rect(x, y + 20, bar_width, 8)
-        pygame.draw.rect(surface, COLOR_HUD_EMPTY_DASH, bar_bg_rect)
-
-        # Render the filled part of the XP bar.
-        bar_fill_rect = pygame.Rect(x, y + 20, current_bar_width, 8)
-        pygame.draw.rect(surface, COLOR_XP_BLUE, bar_fill_rect)
+        pygame.draw.rect(surface, COLOR_HUD_EMPTY_DASH, pygame.Rect(x, y + 20, bar_width, 8))
+        pygame.draw.rect(surface, COLOR_XP_BLUE, pygame.Rect(x, y + 20, int(bar_width * xp_percentage), 8))
 
     def draw_message_log(self, surface):
         """
@@ -2265,67 +3537,259 @@ class HUD:
         """
         x = 10
         y = 70  # Start below the health and XP bars.
-
-        for text, color in self.messages:
-            text_surface = self.font.render(text, True, color)
-            surface.blit(text_surface, (x, y))
+        for text, color in self.message_log.recent(HUD_MESSAGE_COUNT, self.scroll_offset):
+            surface.blit(self.render_line(text, color), (x, y))
             y += self.font.get_height() + 2
+        # While scrolled back, say how far, so the view isn't mistaken for live messages.
+        if self.scroll_offset:
+            marker = self.render_line(f"[-{self.scroll_offset}] PgDn to return", COLOR_HUD_EMPTY_DASH)
+            surface.blit(marker, (INTERNAL_WIDTH - marker.get_width() - 10, 70))
 
     def draw_item_status(self, surface, player):
         """Draws the count of all named items in the player's inventory."""
-        inventory = player.get_component(InventoryComponent)
-        if not inventory: return
-
-        item_counts = {}
-        # Count the occurrences of each named item.
-        for item in inventory.items:
-            item_name = item.get_component(ItemComponent).name
-            item_counts[item_name] = item_counts.get(item_name, 0) + 1
-
-        # Define the display order and colors for items.
-        display_items = {
-            "Health Potion": COLOR_HEALING_RED,
-            "Scroll of Teleportation": COLOR_SCROLL_BLUE
-        }
-
         y_offset = INTERNAL_HEIGHT - self.font.get_height() - 10
-        for item_name, color in display_items.items():
-            count = item_counts.get(item_name, 0)
-            if count > 0:
-                text = f"{item_name}s: {count}"
-                text_surface = self.font.render(text, True, color)
-                surface.blit(text_surface, (10, y_offset))
-                # Move the next item's text up.
-                y_offset -= self.font.get_height() + 5
+        for item_name, count, color in self.count_items(player):
+            surface.blit(self.font.render(f"{item_name}s: {count}", True, color), (10, y_offset))
+            y_offset -= self.font.get_height() + 5  # Move the next item's text up.
 
     def draw_dungeon_level(self, surface, dungeon_manager):
         """Draws the current dungeon level to the bottom-right of the screen."""
         level_text = f"Level: {dungeon_manager.dungeon_level}"
         text_surface = self.font.render(level_text, True, COLOR_WHITE)
-
         # Position in the bottom-right corner with a margin.
         margin = 10
         x_pos = INTERNAL_WIDTH - text_surface.get_width() - margin
         y_pos = INTERNAL_HEIGHT - text_surface.get_height() - margin
-
         surface.blit(text_surface, (x_pos, y_pos))
 
 # ==============================================================================
 # XI. Development Tools
 # ==============================================================================
 
+class CacheStats:
+    """Counts the hits and misses of one named cache, registered by name for the F12 overlay."""
+    registry = {}
+
+    def __init__(self, name):
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        CacheStats.registry[name] = self
+
+    def hit(self):
+        self.hits += 1
+
+    def miss(self):
+        self.misses += 1
+
+    def hit_rate(self):
+        """Returns the fraction of lookups that hit, or 0.0 before any lookup."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+class FrameProfiler:
+    """Measures each phase of every frame, between mark() calls, over a rolling window (F11 records to CSV)."""
+    PHASES = ("events", "update", "map", "entities", "hud", "ui", "present")
+
+    def __init__(self):
+        # Each entry is a tuple of phase timings in milliseconds, then the total.
+        self.history = deque(maxlen=PROFILER_WINDOW_FRAMES)
+        self.current = dict.fromkeys(self.PHASES, 0.0)
+        self.frame_start = self.last_mark = time.perf_counter()
+        self.recording_file = None
+
+    def begin_frame(self):
+        """Starts timing a new frame. Called after the frame-rate limiter sleeps."""
+        self.current = dict.fromkeys(self.PHASES, 0.0)
+        self.frame_start = self.last_mark = time.perf_counter()
+
+    def mark(self, phase):
+        """Charges the time elapsed since the previous mark to the given phase."""
+        now = time.perf_counter()
+        self.current[phase] += (now - self.last_mark) * 1000
+        self.last_mark = now
+
+    def end_frame(self, state_name, entity_count):
+        """Stores the finished frame in the rolling window and the recording."""
+        total = (time.perf_counter() - self.frame_start) * 1000
+        sample = tuple(self.current[phase] for phase in self.PHASES) + (total,)
+        self.history.append(sample)
+        if self.recording_file:
+            timings = ",".join(f"{value:.3f}" for value in sample)
+            self.recording_file.write(f"{timings},{entity_count},{state_name}\n")
+
+    def percentile(self, column, percent):
+        """Returns the given percentile of a timing column over the rolling window."""
+        values = sorted(sample[column] for sample in self.history)
+        return values[min(len(values) - 1, int(len(values) * percent / 100))] if values else 0.0
+
+    def toggle_recording(self):
+        """Starts or stops writing every frame's timings to a CSV file in the user data folder."""
+        if self.recording_file:
+            self.recording_file.close()
+            self.recording_file = None
+            GameLogger.log("Frame profile recording stopped.", "DEBUG")
+            return
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = get_user_data_dir() / f"frame_profile_{timestamp}.csv"
+        try:
+            self.recording_file = open(path, "w")
+        except OSError as e:
+            GameLogger.log(f"Could not start frame profile recording: {e}", "ERROR")
+            return
+        self.recording_file.write(",".join(self.PHASES) + ",total,entities,state\n")
+        GameLogger.log(f"Frame profile recording started: {path}", "DEBUG")
+
+class TelemetryWriter:
+    """Appends finished telemetry chunks (a marshalled header, then the column arrays) on a background thread."""
+
+    def __init__(self, path):
+        self.path = path
+        self.chunks = queue.Queue()
+        self.thread = threading.Thread(target=self.write_loop, daemon=True)
+        self.thread.start()
+
+    def put(self, table, columns):
+        """Queues a chunk: the table name and a tuple of (column, array) pairs. The arrays are handed over."""
+        self.chunks.put((table, columns))
+
+    def close(self):
+        """Writes the remaining chunks and stops the thread."""
+        self.chunks.put(None)
+        self.thread.join()
+
+    def write_loop(self):
+        try:
+            with open(self.path, "ab") as f:
+                while True:
+                    chunk = self.chunks.get()
+                    if chunk is None:
+                        return
+                    table, columns = chunk
+                    marshal.dump((table, len(columns[0][1]), tuple((name, values.typecode)
+                                                                    for name, values in columns)), f)
+                    for _, values in columns:
+                        values.tofile(f)
+        except OSError as e:
+            GameLogger.log(f"Could not write telemetry to {self.path}: {e}", "ERROR")
+
+class TelemetryRecorder:
+    """Records one run's statistics (--telemetry) from the game's events as typed column arrays."""
+    TABLES = {
+        "turns": (("turn", "I"), ("depth", "H"), ("damage_dealt", "I"), ("damage_taken", "I"),
+                  ("kills", "H"), ("items_used", "H"), ("player_hp", "i")),
+        "frames": (("frame_ms", "f"),),
+        "run": (("outcome", "B"), ("max_depth", "H"), ("turns", "I"), ("player_level", "H")),
+    }
+
+    def __init__(self, player, depth):
+        self.player = player
+        self.depth = depth
+        self.max_depth = depth
+        self.turn = 0
+        # The "levels" table has a kill column for every monster archetype.
+        self.tables = dict(self.TABLES, levels=(("depth", "H"), ("turns", "I"), ("damage_dealt", "I"),
+                                                ("damage_taken", "I"), ("items_used", "H"))
+                                               + tuple((f"kills_{name}", "H") for name in ENTITY_DATA))
+        self.columns = {table: tuple(array.array(typecode) for _, typecode in columns)
+                        for table, columns in self.tables.items()}
+        self.turn_counts = [0, 0, 0, 0]  # Damage dealt, damage taken, kills, items used this turn.
+        self.level_counts = [0, 0, 0, 0]  # Turns, damage dealt, damage taken, items used on this level.
+        self.level_kills = Counter()
+        self.pending_depth = None  # Where the stairs taken this turn lead, applied at end_turn.
+        self.outcome = 0
+        self.closed = False
+        directory = get_user_data_dir() / TELEMETRY_DIR
+        directory.mkdir(exist_ok=True)
+        self.writer = TelemetryWriter(directory / f"run_{time.time_ns()}_{os.getpid()}.tlm")
+
+    def append(self, table, row):
+        """Adds a row to a table, handing the table to the writer when its chunk is full."""
+        columns = self.columns[table]
+        for values, value in zip(columns, row):
+            values.append(value)
+        if len(columns[0]) >= TELEMETRY_CHUNK_ROWS:
+            self.flush_table(table)
+
+    def flush_table(self, table):
+        columns = self.columns[table]
+        if columns[0]:
+            self.writer.put(table, tuple(zip((name for name, _ in self.tables[table]), columns)))
+            self.columns[table] = tuple(array.array(values.typecode) for values in columns)
+
+    def record_events(self, events):
+        """The EventBus subscriber: counts damage, kills and item use, and notes level changes."""
+        player, counts = self.player, self.turn_counts
+        for event in events:
+            kind = type(event)
+            if kind is DamageEvent:
+                if event.attacker is player:
+                    counts[0] += event.amount
+                elif event.defender is player:
+                    counts[1] += event.amount
+            elif kind is DeathEvent:
+                if event.entity is player:
+                    self.outcome = 1
+                else:
+                    counts[2] += 1
+                    self.level_kills[event.entity.archetype] += 1
+                    if event.entity.get_component(VampireComponent):
+                        self.outcome = 2
+            elif kind is ItemUseEvent:
+                counts[3] += 1
+            elif kind is DescendEvent:
+                self.pending_depth = event.depth
+
+    def end_turn(self, player_hp):
+        """Stores the finished turn's row after each enemy phase; a stairs turn counts on the level left."""
+        counts, level = self.turn_counts, self.level_counts
+        self.turn += 1
+        self.append("turns", (self.turn, self.depth, *counts, player_hp))
+        self.level_counts = [level[0] + 1, level[1] + counts[0], level[2] + counts[1], level[3] + counts[3]]
+        self.turn_counts = [0, 0, 0, 0]
+        if self.pending_depth is not None:
+            self.end_level()
+            self.depth, self.pending_depth = self.pending_depth, None
+            self.max_depth = max(self.max_depth, self.depth)
+
+    def record_frame(self, frame_ms):
+        self.append("frames", (frame_ms,))
+
+    def end_level(self):
+        """Stores the row of the level being left."""
+        kills = tuple(self.level_kills[name] for name in ENTITY_DATA)
+        self.append("levels", (self.depth, *self.level_counts, *kills))
+        self.level_counts = [0, 0, 0, 0]
+        self.level_kills = Counter()
+
+    def close(self):
+        """Stores the last level and the run's summary, then waits for the writer to finish."""
+        if self.closed:
+            return
+        self.closed = True
+        if any(self.turn_counts) or self.pending_depth is not None:
+            self.end_turn(self.player.get_component(StatsComponent).current_hp)  # A run-ending player turn.
+        self.end_level()
+        level = self.player.get_component(ExperienceComponent).level
+        self.append("run", (self.outcome, self.max_depth, self.turn, level))
+        for table in self.columns:
+            self.flush_table(table)
+        self.writer.close()
+
 class DebugOverlay:
     """
     A toggleable overlay for displaying real-time development information.
     - Necessity: To provide developers with immediate insight into the game's
                  internal state for performance tuning and debugging.
-    - Function: Renders key game data, such as FPS and player coordinates.
+    - Function: Renders key game data, per-phase timings with percentiles,
+                a frame-time graph, and cache hit rates.
     - Effect: A non-intrusive, powerful tool for live diagnostics.
     """
 
-    def __init__(self):
-        self.font = pygame.font.Font(pygame.font.match_font(FONT_NAME), 14)
+    def __init__(self, profiler):
+        self.font = fonts.get(14)
         self.enabled = False
+        self.profiler = profiler
 
     def toggle(self):
         """Switches the overlay's visibility on or off."""
@@ -2334,57 +3798,185 @@ class DebugOverlay:
     def draw(self, surface, data):
         """Draws the debug information onto the provided surface."""
         if not self.enabled: return
-
-        # Start the Y-position near the top.
-        y_offset = 30 # Move down to not overlap with the new FPS counter
-
-        # Define a right-side margin.
-        margin = 10
-
-        for key, value in data.items():
-            text = f"{key}: {value}"
+        # Frame cost percentiles, each phase's last time and 95th percentile, then the cache hit rates.
+        profiler = self.profiler
+        total_column = len(FrameProfiler.PHASES)
+        lines = [f"{key}: {value}" for key, value in data.items()]
+        lines.append("Frame ms p50/p95/p99: " + "/".join(
+            f"{profiler.percentile(total_column, p):.1f}" for p in (50, 95, 99)))
+        last = profiler.history[-1] if profiler.history else (0.0,) * (total_column + 1)
+        for i, phase in enumerate(FrameProfiler.PHASES):
+            lines.append(f"{phase}: {last[i]:.2f} (p95 {profiler.percentile(i, 95):.2f})")
+        for name, stats in CacheStats.registry.items():
+            lines.append(f"{name} cache: {stats.hit_rate():.0%} of {stats.hits + stats.misses}")
+        if profiler.recording_file:
+            lines.append("REC (F11 to stop)")
+        # Right-aligned with a margin, starting below the FPS counter so they don't overlap.
+        y_offset, margin = 30, 10
+        for text in lines:
             text_surface = self.font.render(text, True, (255, 255, 0))
-
-            # Calculate the X-position to right-align the text.
-            x_pos = INTERNAL_WIDTH - text_surface.get_width() - margin
-
-            surface.blit(text_surface, (x_pos, y_offset))
+            surface.blit(text_surface, (INTERNAL_WIDTH - text_surface.get_width() - margin, y_offset))
             y_offset += 15
+        self.draw_frame_graph(surface, INTERNAL_WIDTH - PROFILER_GRAPH_WIDTH - margin, y_offset + 5)
+
+    def draw_frame_graph(self, surface, x, y):
+        """Draws one column per recent frame, with a guide line at the 60 FPS budget."""
+        graph_rect = pygame.Rect(x, y, PROFILER_GRAPH_WIDTH, PROFILER_GRAPH_HEIGHT)
+        pygame.draw.rect(surface, (20, 20, 20), graph_rect)
+        samples = list(self.profiler.history)[-PROFILER_GRAPH_WIDTH:]
+        for i, sample in enumerate(samples):
+            height = min(PROFILER_GRAPH_HEIGHT, int(sample[-1] / PROFILER_GRAPH_CEILING_MS * PROFILER_GRAPH_HEIGHT))
+            color = (255, 255, 0) if sample[-1] <= PROFILER_BUDGET_MS else COLOR_HEALTH_RED
+            column_x = x + PROFILER_GRAPH_WIDTH - len(samples) + i
+            pygame.draw.line(surface, color, (column_x, graph_rect.bottom - 1), (column_x, graph_rect.bottom - height))
+        budget_y = graph_rect.bottom - int(PROFILER_BUDGET_MS / PROFILER_GRAPH_CEILING_MS * PROFILER_GRAPH_HEIGHT)
+        pygame.draw.line(surface, (0, 160, 0), (x, budget_y), (graph_rect.right - 1, budget_y))
+
+class RuntimeProfiler:
+    """A start/stop profiler for shipped builds: stack sampling or cProfile over the loop or a @profiled scope."""
+    SCOPES = ("loop", "enemy_turns", "level_gen", "draw")
+
+    def __init__(self):
+        self.active = False
+        self.scope = "loop"
+        self.mode = "sample"  # "sample" (low overhead) or "cprofile" (exact call counts).
+        self.profile = None  # The cProfile.Profile in "cprofile" mode.
+        self.samples = Counter()  # Collapsed stack string -> number of samples.
+        self.in_scope = False  # Set while the main thread is inside the target scope.
+        self.sampler_thread = None
+        self.main_thread_id = threading.main_thread().ident
+
+    def configure_from_argv(self, argv):
+        """Starts profiling as asked by --profile[=scope] and --cprofile."""
+        if "--cprofile" in argv:
+            self.mode = "cprofile"
+        for arg in argv:
+            if arg == "--profile" or arg.startswith("--profile="):
+                scope = arg.partition("=")[2] or "loop"
+                if scope not in self.SCOPES:
+                    GameLogger.log(f"Unknown profile scope '{scope}', profiling the whole loop.", "WARNING")
+                    scope = "loop"
+                self.scope = scope
+                self.start()
+
+    def start(self):
+        """Begins a new capture using the configured scope and mode."""
+        self.samples.clear()
+        self.in_scope = False
+        if self.mode == "cprofile":
+            self.profile = cProfile.Profile()
+        else:
+            self.sampler_thread = threading.Thread(target=self.sample_loop, daemon=True)
+        self.active = True
+        if self.sampler_thread:
+            self.sampler_thread.start()
+        GameLogger.log(f"Profiler started (scope: {self.scope}, mode: {self.mode}).", "DEBUG")
+
+    def enter(self):
+        """Called by @profiled when the main thread enters the target scope."""
+        self.in_scope = True
+        if self.profile:
+            self.profile.enable()
+
+    def leave(self):
+        """Called by @profiled when the main thread leaves the target scope."""
+        self.in_scope = False
+        if self.profile:
+            self.profile.disable()
+
+    def sample_loop(self):
+        """Runs on a background thread, recording the main thread's stack while in scope."""
+        while self.active:
+            time.sleep(PROFILER_SAMPLE_INTERVAL)
+            if not self.in_scope:
+                continue
+            # noinspection PyProtectedMember
+            frame = sys._current_frames().get(self.main_thread_id)
+            stack = []
+            while frame:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        """Ends the capture and writes it to the user data folder. Returns the file path."""
+        self.active = False
+        self.in_scope = False
+        if self.sampler_thread:
+            self.sampler_thread.join()
+            self.sampler_thread = None
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        profile_dir = get_user_data_dir() / "profiles"
+        try:
+            profile_dir.mkdir(exist_ok=True)
+            if self.profile:
+                path = profile_dir / f"profile_{self.scope}_{timestamp}.pstats"
+                self.profile.dump_stats(path)
+            else:
+                path = profile_dir / f"profile_{self.scope}_{timestamp}.collapsed"
+                with open(path, "w") as f:
+                    for stack, count in self.samples.items():
+                        f.write(f"{stack} {count}\n")
+        except OSError as e:
+            GameLogger.log(f"Could not write profile: {e}", "ERROR")
+            return None
+        finally:
+            self.profile = None
+        GameLogger.log(f"Profile written to {path}", "DEBUG")
+        return path
+
+runtime_profiler = RuntimeProfiler() # The single, shared profiler used by the @profiled hooks.
+
+class StartupTimer:
+    """Times each phase of startup up to the first presented frame, for a one-line log report."""
+    def __init__(self, start):
+        self.last = self.start = start
+        self.phases = []
+
+    def mark(self, phase):
+        """Records the time since the previous mark as `phase`."""
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def report(self):
+        """Returns the phase timings and total as a single readable line."""
+        phases = ", ".join(f"{phase} {seconds * 1000:.0f} ms" for phase, seconds in self.phases)
+        return f"Startup: {phases} (total {(self.last - self.start) * 1000:.0f} ms)"
+
+startup_timer = StartupTimer(launch_time) # The single, shared startup timer.
 
 class FPSCounter:
     """A simple, player-facing class to display the current FPS."""
+    # The screen region the counter can occupy, repainted every frame.
+    RECT = pygame.Rect(INTERNAL_WIDTH - 130, 5, 130, 25)
 
     def __init__(self, font):
         self.font = font
 
     def draw(self, surface, clock):
         """Draws the FPS counter to the top-right of the surface."""
-        # Get the FPS from the game's clock and format it.
-        fps_text = f"FPS: {clock.get_fps():.1f}"
-        text_surface = self.font.render(fps_text, True, COLOR_WHITE)
-
-        # Calculate position for the top-right corner.
-        margin = 10
-        x_pos = INTERNAL_WIDTH - text_surface.get_width() - margin
-        y_pos = 10
-
-        surface.blit(text_surface, (x_pos, y_pos))
+        text_surface = self.font.render(f"FPS: {clock.get_fps():.1f}", True, COLOR_WHITE)
+        # Position it in the top-right corner, with a margin of 10 pixels.
+        surface.blit(text_surface, (INTERNAL_WIDTH - text_surface.get_width() - 10, 10))
 
 class GameLogger:
     """Simple logging system for tracking game events and errors."""
-    # Build the full, correct path to the log file
-    LOG_FILE = user_data_dir / "gothic_rogue_log.txt"
+    LOG_FILE_NAME = "gothic_rogue_log.txt" # Inside the user data folder.
+    enabled = True # Headless tools (the balance simulator) switch this off to spare the real log file.
 
     @staticmethod
     def log(message, level="INFO"):
         """Logs a message to the console and a file."""
+        if not GameLogger.enabled:
+            return
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         log_message = f"[{timestamp}] [{level}] {message}"
-
         print(log_message)  # Continue printing to console for live feedback
-
         try:
-            with open(GameLogger.LOG_FILE, "a") as f:
+            with open(get_user_data_dir() / GameLogger.LOG_FILE_NAME, "a") as f:
                 f.write(log_message + "\n")
         except Exception as e:
             # Don't crash the game if logging fails, just report it
@@ -2395,5 +3987,6 @@ class GameLogger:
 # ==============================================================================
 
 if __name__ == "__main__":
+    startup_timer.mark("imports")
     game = Game()
     game.run()
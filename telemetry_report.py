@@ -0,0 +1,197 @@
+# telemetry_report.py
+# Aggregates the run telemetry recorded by `main.py --telemetry` (or
+# `balance_simulator.py --telemetry`) into a per-dungeon-level report.
+#
+# Each run file is a sequence of columnar chunks (see TelemetryWriter in
+# main.py). Runs are summarised independently on a process pool and the small
+# summaries are merged, so thousands of runs aggregate in seconds.
+#
+# Usage:
+#   python telemetry_report.py --workers 8 --json telemetry_report.json
+
+import os
+
+# Reading telemetry never opens a window; set before main imports pygame.
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import array
+import json
+import marshal
+import multiprocessing
+import time
+from pathlib import Path
+
+import main
+
+# ==============================================================================
+# I. Report Tuning
+# ==============================================================================
+
+FRAME_BUCKET_MS = 0.5  # Frame times are merged as a histogram with buckets this wide.
+FRAME_BUCKET_COUNT = 200  # Frames slower than the last bucket are counted in it.
+
+# ==============================================================================
+# II. Summarising a Single Run
+# ==============================================================================
+
+def read_telemetry(path):
+    """
+    Reads a run file back into {table: {column: array}}, joining its chunks.
+    A chunk cut short (a crash mid-write) ends the read.
+    """
+    tables = {}
+    with open(path, "rb") as f:
+        while True:
+            try:
+                table, rows, columns = marshal.load(f)
+                chunk = []
+                for name, typecode in columns:
+                    values = array.array(typecode)
+                    values.fromfile(f, rows)
+                    chunk.append((name, values))
+            except (EOFError, ValueError, TypeError):
+                return tables
+            stored = tables.setdefault(table, {})
+            for name, values in chunk:
+                if name in stored:
+                    stored[name].extend(values)
+                else:
+                    stored[name] = values
+
+def summarize_run(path):
+    """
+    Reads one run file and reduces it to a small, mergeable summary: the
+    run's outcome, per-level totals and a histogram of its frame times.
+    """
+    tables = read_telemetry(path)
+    run = tables.get("run")
+    summary = {"outcome": "incomplete", "max_depth": 0, "turns": 0, "player_level": 0, "levels": {},
+               "frame_histogram": [0] * FRAME_BUCKET_COUNT}
+    if run:
+        summary.update(outcome=main.TELEMETRY_OUTCOMES[run["outcome"][0]], max_depth=run["max_depth"][0],
+                       turns=run["turns"][0], player_level=run["player_level"][0])
+
+    levels = tables.get("levels", {})
+    kill_columns = [name for name in levels if name.startswith("kills_")]
+    for i, depth in enumerate(levels.get("depth", ())):
+        row = summary["levels"].setdefault(depth, {"visits": 0, "turns": 0, "damage_dealt": 0, "damage_taken": 0,
+                                                   "items_used": 0, "worst_turn": 0, "kills": {}})
+        row["visits"] += 1
+        for column in ("turns", "damage_dealt", "damage_taken", "items_used"):
+            row[column] += levels[column][i]
+        for column in kill_columns:
+            if levels[column][i]:
+                name = column[len("kills_"):]
+                row["kills"][name] = row["kills"].get(name, 0) + levels[column][i]
+
+    # The most damage the player took in a single turn, per level.
+    turns = tables.get("turns", {})
+    for depth, taken in zip(turns.get("depth", ()), turns.get("damage_taken", ())):
+        row = summary["levels"].get(depth)
+        if row and taken > row["worst_turn"]:
+            row["worst_turn"] = taken
+
+    histogram = summary["frame_histogram"]
+    for frame_ms in tables.get("frames", {}).get("frame_ms", ()):
+        histogram[min(int(frame_ms / FRAME_BUCKET_MS), FRAME_BUCKET_COUNT - 1)] += 1
+    return summary
+
+# ==============================================================================
+# III. Aggregation and Reporting
+# ==============================================================================
+
+def histogram_percentile(histogram, percent):
+    """Returns the upper edge of the bucket holding the given percentile, in milliseconds."""
+    total = sum(histogram)
+    if not total:
+        return 0.0
+    target, seen = total * percent / 100, 0
+    for bucket, count in enumerate(histogram):
+        seen += count
+        if seen >= target:
+            return (bucket + 1) * FRAME_BUCKET_MS
+    return FRAME_BUCKET_COUNT * FRAME_BUCKET_MS
+
+def aggregate(summaries):
+    """Folds run summaries into per-dungeon-level statistics."""
+    report = {"runs": len(summaries), "outcomes": {}, "levels": {}, "frames": {}}
+    per_level = {}
+    histogram = [0] * FRAME_BUCKET_COUNT
+    for summary in summaries:
+        report["outcomes"][summary["outcome"]] = report["outcomes"].get(summary["outcome"], 0) + 1
+        for depth, row in summary["levels"].items():
+            total = per_level.setdefault(depth, {"reached": 0, "turns": 0, "damage_dealt": 0, "damage_taken": 0,
+                                                 "items_used": 0, "worst_turn": 0, "kills": {}})
+            total["reached"] += 1
+            for column in ("turns", "damage_dealt", "damage_taken", "items_used"):
+                total[column] += row[column]
+            total["worst_turn"] = max(total["worst_turn"], row["worst_turn"])
+            for name, count in row["kills"].items():
+                total["kills"][name] = total["kills"].get(name, 0) + count
+        for bucket, count in enumerate(summary["frame_histogram"]):
+            histogram[bucket] += count
+
+    if summaries:
+        report["mean_turns"] = sum(summary["turns"] for summary in summaries) / len(summaries)
+        report["mean_max_depth"] = sum(summary["max_depth"] for summary in summaries) / len(summaries)
+    for depth in sorted(per_level):
+        total = per_level[depth]
+        reached = total["reached"]
+        report["levels"][depth] = {
+            "reached": reached,
+            "mean_turns": total["turns"] / reached,
+            "mean_damage_dealt": total["damage_dealt"] / reached,
+            "mean_damage_taken": total["damage_taken"] / reached,
+            "damage_taken_per_turn": total["damage_taken"] / max(1, total["turns"]),
+            "mean_items_used": total["items_used"] / reached,
+            "worst_turn_damage": total["worst_turn"],
+            "kills": dict(sorted(total["kills"].items())),
+        }
+    report["frames"] = {"count": sum(histogram), "p50_ms": histogram_percentile(histogram, 50),
+                        "p95_ms": histogram_percentile(histogram, 95), "p99_ms": histogram_percentile(histogram, 99)}
+    return report
+
+def print_report(report, elapsed):
+    """Prints the aggregated report as a readable table."""
+    print(f"Runs: {report['runs']} in {elapsed:.1f}s  Outcomes: {report['outcomes']}")
+    print(f"{'Depth':>5} {'Reached':>8} {'Turns':>8} {'Dealt':>8} {'Taken':>8} {'Taken/T':>8} "
+          f"{'Worst':>6} {'Items':>6}  Kills")
+    for depth, row in report["levels"].items():
+        kills = ", ".join(f"{name} {count}" for name, count in row["kills"].items())
+        print(f"{depth:>5} {row['reached']:>8} {row['mean_turns']:>8.1f} {row['mean_damage_dealt']:>8.1f} "
+              f"{row['mean_damage_taken']:>8.1f} {row['damage_taken_per_turn']:>8.2f} "
+              f"{row['worst_turn_damage']:>6} {row['mean_items_used']:>6.2f}  {kills}")
+    frames = report["frames"]
+    if frames["count"]:
+        print(f"Frames: {frames['count']}  p50 {frames['p50_ms']:.1f} ms  p95 {frames['p95_ms']:.1f} ms  "
+              f"p99 {frames['p99_ms']:.1f} ms")
+
+# ==============================================================================
+# IV. Entry Point
+# ==============================================================================
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Aggregates recorded Gothic Rogue run telemetry.")
+    parser.add_argument("--dir", help="Folder of run files (default: the telemetry folder in the user data folder).")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Size of the process pool.")
+    parser.add_argument("--json", help="Optional path to write the full report as JSON.")
+    args = parser.parse_args()
+
+    directory = Path(args.dir) if args.dir else main.get_user_data_dir() / main.TELEMETRY_DIR
+    paths = sorted(directory.glob("*.tlm"))
+    start = time.perf_counter()
+    # Every run is summarised on its own, so the work scales with the pool size.
+    with multiprocessing.Pool(processes=args.workers) as pool:
+        summaries = list(pool.imap_unordered(summarize_run, paths, chunksize=16))
+    report = aggregate(summaries)
+    print_report(report, time.perf_counter() - start)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main_cli()